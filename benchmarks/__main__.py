@@ -0,0 +1,49 @@
+"""Runs the hot-path benchmarks headless, without opening a window.
+
+    python -m benchmarks --save baseline.json
+    python -m benchmarks --compare baseline.json --threshold 0.15
+
+Comparing exits with status 1 if any case's median got slower than the threshold allows."""
+import argparse
+import fnmatch
+import sys
+from .cases import CASES
+from . import runner
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Hot-path benchmarks")
+    parser.add_argument("--save", metavar="PATH", help="Write the results to a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Compare the results against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Slowdown, as a fraction of the baseline median, counted as a regression")
+    parser.add_argument("--filter", metavar="PATTERN", default="*", help="Only run cases matching a glob")
+    parser.add_argument("--repeat", type=int, default=7, help="Samples to take of each case")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per sample")
+    parser.add_argument("--list", action="store_true", help="List the cases and exit")
+    args = parser.parse_args(argv)
+
+    names = [name for name in CASES if fnmatch.fnmatch(name, args.filter)]
+    if args.list:
+        print("\n".join(names))
+        return 0
+    if not names:
+        parser.error("No cases match {}".format(args.filter))
+
+    results = runner.run(names, repeat=args.repeat, min_time=args.min_time)
+
+    if args.save:
+        runner.save(results, args.save)
+
+    if args.compare:
+        print()
+        regressions = runner.compare(results, runner.load(args.compare), threshold=args.threshold)
+        if regressions:
+            print("\n{} case(s) regressed past the {:.0%} threshold.".format(len(regressions), args.threshold))
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""The benchmark cases. Each one is a setup function, registered with @benchmark,
+which builds whatever it needs and returns a zero-argument callable to be timed.
+A case that leaves something behind, such as files, gives that callable a .cleanup
+attribute, which is called once timing is done."""
+import tempfile
+import numpy as np
+from typing import Callable, Dict
+from src.interface import Interface
+from src.interface.game_log import GameLog
+from src.playfield import PlayField
+from src.entity.entities import Mobile
+from src.entity.landscape import WalkableTerrain
+from src.animation import Animation, AnimationFrame
+from src.menus import Menu, MenuOption
+from src.modifiers import AdditiveModifier, MultiplicativeModifier, BaseAdditiveModifier
+from src.sigil import Sigil
+from src.layers import BitLayer
+from src.map_generation import LevelCache
+from src.map_generation.cellulose import composite
+from src.map_generation.sampling import sample_centroids
+from src.map_generation.smoothing import cellular_automata, walls_of
+from src.map_generation.connectivity import label_components, connect
+from src.map_generation.spawn_index import SpawnIndex, distance_from_walls
+from src.map_generation.cellulose.hallway import HallwayCellulose
+from content.entities import FooForm
+
+Case = Callable[[], Callable[[], object]]
+
+# Every registered case, by name, in registration order
+CASES: Dict[str, Case] = {}
+
+
+def benchmark(name: str) -> Callable[[Case], Case]:
+    """Registers a setup function under a name."""
+    def register(setup: Case) -> Case:
+        if name in CASES:
+            raise ValueError("A benchmark named {} is already registered".format(name))
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def _playfield(width: int, height: int) -> PlayField:
+    """A headless playfield with a floor under every tile and a player character in the top-left corner."""
+    interface = Interface(None)
+    pf = PlayField(width, height, interface=interface)
+    for y in range(height):
+        for x in range(width):
+            WalkableTerrain().introduce_at(x, y, pf)
+
+    pc = Mobile(size=4, sigil=Sigil("@", priority=3), name="Player Character")
+    pc.introduce_at(1, 1, pf)
+    pf.player_character = pc
+    return pf
+
+
+def _caves(width: int, height: int) -> np.ndarray:
+    """A smoothed noise field with plenty of separate pockets."""
+    return cellular_automata(np.random.default_rng(0).random((height, width)) < .55, iterations=4)
+
+
+def _register_playfield_from_layers(width: int, height: int) -> None:
+    @benchmark("playfield_from_layers[{}x{}]".format(width, height))
+    def setup():
+        field = _caves(width, height)
+        walls = walls_of(field)
+        return lambda: PlayField.from_layers(Interface(None), walls, field)
+
+
+def _register_playfield_init(width: int, height: int) -> None:
+    @benchmark("playfield_init[{}x{}]".format(width, height))
+    def setup():
+        return lambda: PlayField(width, height, interface=Interface(None))
+
+
+for _size in ((40, 30), (100, 60), (200, 80)):
+    _register_playfield_init(*_size)
+_register_playfield_from_layers(300, 300)
+
+
+@benchmark("playfield_drawables[80x50]")
+def setup_drawables():
+    pf = _playfield(120, 80)
+    pf.origin = (1, 1)
+    pf.window = (80, 50)
+    return lambda: pf.drawables(center_on=(40, 25))
+
+
+def _register_playfield_tick(mobiles: int) -> None:
+    @benchmark("playfield_tick[{} mobiles]".format(mobiles))
+    def setup():
+        pf = _playfield(60, 40)
+        for i in range(mobiles - 1):
+            Mobile(size=2, sigil=Sigil("m", priority=3)).introduce_at(i % 60, 2 + i // 60, pf)
+        return pf.tick
+
+
+for _mobiles in (10, 100):
+    _register_playfield_tick(_mobiles)
+
+
+@benchmark("cell_sigils")
+def setup_cell_sigils():
+    pf = _playfield(4, 4)
+    for character in "abc":
+        Mobile(size=2, sigil=Sigil(character, priority=3)).introduce_at(2, 2, pf)
+    cell = pf.get_cell(2, 2)
+    return lambda: cell.sigils
+
+
+class _BenchForm(FooForm):
+    """A FooForm with a single modifiable stat."""
+    def __init__(self):
+        super().__init__(size=3, sigil=Sigil("f"), name="Bench Form")
+        self.modifiers = {"speed": []}
+        self._speed = 10.0
+
+    @property
+    def speed(self) -> float:
+        return self._apply_modifiers_to("speed")
+
+
+@benchmark("fooform_apply_modifiers")
+def setup_apply_modifiers():
+    form = _BenchForm()
+    form.modifiers["speed"] = [BaseAdditiveModifier(form, "speed", 2),
+                               MultiplicativeModifier(form, "speed", 1.5),
+                               AdditiveModifier(form, "speed", 3)]
+    return lambda: form.speed
+
+
+@benchmark("animation_tick")
+def setup_animation_tick():
+    anim = Animation(frames=[AnimationFrame(Sigil(c), 5) for c in "\\|/-"],
+                     repeating=True)
+    return anim.tick
+
+
+@benchmark("game_log_as_drawables")
+def setup_game_log():
+    log = GameLog(width=60, height=12, interface=None)
+    for i in range(200):
+        log.add_entry("Log entry number {}, long enough to wrap onto a second row of the panel.".format(i))
+
+    def run():
+        # Invalidate first so every call pays for a full redraw, as it does after a new entry.
+        log.invalidate()
+        return log.as_drawables(0, 0)
+    return run
+
+
+@benchmark("menu_render_menu")
+def setup_menu():
+    menu = Menu(width=40, height=48, interface=None, spacing=1)
+    for i in range(12):
+        menu.add_option(MenuOption(text="Option {}".format(i),
+                                   width=24, height=5,
+                                   on_select=lambda event: None))
+    return lambda: menu.render_menu(0, 0)
+
+
+@benchmark("level_cache_hit[80x60]")
+def setup_level_cache():
+    directory = tempfile.TemporaryDirectory(prefix="buffer-jack-bench-")
+    cache = LevelCache(directory.name)
+    rng = np.random.default_rng(0)
+    key = cache.key(LevelCache, {"width": 80, "height": 60}, 0)
+    cache.put(key, {"walls": rng.random((60, 80)) < .3,
+                    "field": rng.random((60, 80)) < .25})
+
+    def hit():
+        return cache.get(key)
+    hit.cleanup = directory.cleanup
+    return hit
+
+
+@benchmark("composite_rooms[20x20 grid]")
+def setup_composite():
+    # A 300x300 level tiled with 100 medium (2x2 cell) rooms
+    rng = np.random.default_rng(0)
+    level = np.zeros((300, 300), dtype=bool)
+    rooms = [(30 * x, 30 * y, rng.random((30, 30)) < .5) for y in range(10) for x in range(10)]
+
+    def run():
+        for x0, y0, field in rooms:
+            composite(field, level, x0, y0)
+    return run
+
+
+@benchmark("link_hallways[500 on 300x300]")
+def setup_hallways():
+    # Door pairs up to two grid cells apart, as between neighboring rooms
+    rng = np.random.default_rng(0)
+    origins = rng.integers(30, 270, size=(500, 2))
+    doors = np.hstack((origins, origins + rng.integers(-30, 31, size=(500, 2))))
+    mask = np.zeros((300, 300), dtype=bool)
+
+    def run():
+        for x0, y0, x1, y1 in doors:
+            HallwayCellulose((x0, y0), (x1, y1), rng=rng).carve_into(mask)
+    return run
+
+
+@benchmark("sample_centroids[500 on 300x300]")
+def setup_centroids():
+    rng = np.random.default_rng(0)
+    return lambda: sample_centroids(300, 300, 500, rng)
+
+
+@benchmark("label_components[500x500]")
+def setup_label_components():
+    field = _caves(500, 500)
+    return lambda: label_components(field)
+
+
+@benchmark("connect[500x500]")
+def setup_connect():
+    field = _caves(500, 500)
+    rng = np.random.default_rng(0)
+    return lambda: connect(field, rng=rng)
+
+
+@benchmark("spawn_spaced[2000 on 300x300]")
+def setup_spawn_spaced():
+    field = _caves(300, 300)
+    index = SpawnIndex(field).weighted(distance_from_walls(field))
+    rng = np.random.default_rng(0)
+    return lambda: index.sample_spaced(2000, 3, rng)
+
+
+@benchmark("bit_layer_walls[500x500]")
+def setup_bit_layer_walls():
+    field = BitLayer.from_array(_caves(500, 500))
+    return lambda: walls_of(field)
+
+
+@benchmark("bit_layer_neighbor_counts[500x500]")
+def setup_bit_layer_neighbor_counts():
+    field = BitLayer.from_array(_caves(500, 500))
+    return lambda: field.neighbor_counts()
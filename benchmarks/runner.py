@@ -0,0 +1,79 @@
+import json
+import platform
+import timeit
+from statistics import median
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import tcod
+from .cases import CASES
+
+Results = Dict[str, Dict[str, float]]
+
+
+def run_case(name: str, repeat: int = 7, min_time: float = 0.2) -> Dict[str, float]:
+    """Times one registered case. The number of calls per sample is picked by timeit's autorange,
+    then scaled up until each sample takes at least min_time seconds. Afterward the case's
+    .cleanup, if it has one, is called."""
+    case = CASES[name]()
+    try:
+        timer = timeit.Timer(case)
+        number, elapsed = timer.autorange()
+        if elapsed < min_time:
+            number = max(int(number * min_time / max(elapsed, 1e-9)), 1)
+
+        per_call_us = [t / number * 1e6 for t in timer.repeat(repeat=repeat, number=number)]
+    finally:
+        if hasattr(case, "cleanup"):
+            case.cleanup()
+    return {"median_us": median(per_call_us),
+            "min_us": min(per_call_us),
+            "number": number,
+            "repeat": repeat}
+
+
+def run(names: Optional[Iterable[str]] = None, repeat: int = 7, min_time: float = 0.2) -> Results:
+    """Runs the named cases, or every case if none are named, printing each result as it finishes."""
+    results: Results = {}
+    for name in names or CASES.keys():
+        results[name] = run_case(name, repeat=repeat, min_time=min_time)
+        print("{:<36} median {:>12.2f} us   min {:>12.2f} us"
+              .format(name, results[name]["median_us"], results[name]["min_us"]))
+    return results
+
+
+def save(results: Results, path: str) -> None:
+    """Writes results to a JSON baseline file, along with the versions they were measured under."""
+    baseline = {"meta": {"python": platform.python_version(),
+                         "platform": platform.platform(),
+                         "numpy": np.__version__,
+                         "tcod": tcod.__version__},
+                "results": results}
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def load(path: str) -> Results:
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def compare(results: Results, baseline: Results, threshold: float = 0.1) -> List[Tuple[str, float]]:
+    """Prints each case's median against the baseline's and returns (name, ratio) for every case
+    that got slower by more than threshold (0.1 being 10%). Cases missing from either side are skipped."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            print("{:<36} (no baseline)".format(name))
+            continue
+
+        ratio = result["median_us"] / baseline[name]["median_us"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append((name, ratio))
+        elif ratio < 1 - threshold:
+            flag = "  improved"
+        print("{:<36} {:>12.2f} -> {:>12.2f} us  x{:.2f}{}"
+              .format(name, baseline[name]["median_us"], result["median_us"], ratio, flag))
+
+    return regressions
@@ -3,6 +3,7 @@ import src.modifiers.modifier as mod
 from content.entities.mobs import MindForm, CogForm
 from content.entities.mobs.fooform import FooForm
 from src.pf_event_logger.logger import PFEventLogger
+from src.instrumentation import tracing
 
 
 class Ability:
@@ -102,14 +103,15 @@ class Ability:
         """Selects and calls the appropriate vs_ method based on the target. Also logs it."""
 
         # Determine which vs_ method to call, then call it.
-        if target is self.user:
-            self.vs_self()
-        elif self._is_or_is_child(target, CogForm):
-            self.vs_cogform(target)
-        elif self._is_or_is_child(target, MindForm):
-            self.vs_mindform(target)
-        else:
-            raise ValueError("Target ({}) must be a MindForm, a CogForm, or the user of this ability!")
+        with tracing.span("Ability.use_on", "sim", args={"ability": self.name}):
+            if target is self.user:
+                self.vs_self()
+            elif self._is_or_is_child(target, CogForm):
+                self.vs_cogform(target)
+            elif self._is_or_is_child(target, MindForm):
+                self.vs_mindform(target)
+            else:
+                raise ValueError("Target ({}) must be a MindForm, a CogForm, or the user of this ability!")
 
         # If nothing went wrong engine-wise, log an ability_used with the user's playfield's event logger
         self.user.playfield.logger.add_ability_used(ability_id=self.ability_id,
@@ -8,7 +8,8 @@ class FooForm(Mobile):
     ent_id = None
 
     def _apply_modifiers_to(self, stat: str):
-        if not hasattr(self, stat):
+        # Check for the base stat rather than the stat itself, whose property usually calls this method.
+        if not hasattr(self, "_" + stat):
             raise ValueError("Entity does not have a stat called '{}'!".format(stat))
 
         if stat not in self.modifiers.keys():
@@ -27,7 +28,7 @@ class FooForm(Mobile):
                  if isinstance(m, MultiplicativeModifier) or issubclass(m.__class__, MultiplicativeModifier)]
 
         # Initialize the result as the base stat
-        result: float = getattr(self, name="_" + stat)
+        result: float = getattr(self, "_" + stat)
 
         # Apply base additive, before multiplicative, before additive
         for mod in base_adds:
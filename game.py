@@ -1,12 +1,18 @@
+import argparse
+import random
 import tcod
+import numpy as np
 from src.interface import Interface
 from src.animation import Animation, AnimationFrame
 from src.entity.entities import Mobile
 from src.entity.landscape import WalkableTerrain, Wall
+from src.playfield import FLOOR, WALL
 from src.menus import Menu, MenuOption
 from src.sigil import Sigil
+from src.replay import InputRecorder, InputReplayer
+from src.instrumentation import metrics, tracing
 from math import floor
-from time import time_ns
+from time import time_ns, perf_counter_ns
 import multiprocessing as mp
 
 # TODO: Move these to a config file
@@ -16,6 +22,9 @@ GAMELOG_HEIGHT = 12
 READOUT_WIDTH = 24
 #MIN_ROWS, MIN_COLUMNS = 55, 75
 
+# Parameters for the level built by "Start Game". Stored in recordings so replays build the same level.
+LEVEL_PARAMS = {"width": 200, "height": 80}
+
 
 #FLAGS = tcod.context.SDL_WINDOW_RESIZABLE | tcod.context.SDL_WINDOW_MAXIMIZED
 FLAGS = tcod.context.SDL_WINDOW_FULLSCREEN_DESKTOP
@@ -26,19 +35,114 @@ def __time_ms():
     return int(time_ns()/1000000)
 
 
-def main():
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="BUFFER.JACK()")
+    parser.add_argument("--record", metavar="PATH",
+                        help="Record inputs, the RNG seed and the level parameters to a file")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="Replay a file made with --record as fast as possible, then print tick and frame times")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run a --replay without opening a window")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Time each tick and frame phase, and print p50/p95/max per phase on exit. "
+                             "F3 shows the same figures in-game")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="Write a Chrome/Perfetto trace of the session to a file. F4 starts and stops one in-game")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed for the random number generators. Ignored by --replay, which uses the recorded one")
+    args = parser.parse_args(argv)
+
+    if args.headless and not args.replay:
+        parser.error("--headless requires --replay")
+    if args.record and args.replay:
+        parser.error("--record and --replay can't be used together")
+
+    return args
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def print_metrics_summary() -> None:
+    print("{:<24} {:>8} {:>8} {:>8} {:>8}".format("span (ms)", "count", "p50", "p95", "max"))
+    for name, stats in metrics.summary().items():
+        print("{:<24} {:>8} {:>8.3f} {:>8.3f} {:>8.3f}"
+              .format(name, stats["count"], stats["p50"], stats["p95"], stats["max"]))
+
+
+def run_replay(interface: Interface, replayer: InputReplayer) -> None:
+    """Runs the main loop without waiting between ticks until the recording runs out,
+    then prints how long ticks and frames took."""
+    tick_times, frame_times = [], []
+    start = perf_counter_ns()
+    try:
+        while not replayer.finished:
+            t0 = perf_counter_ns()
+            interface.tick()
+            t1 = perf_counter_ns()
+            interface.print_self()
+            t2 = perf_counter_ns()
+
+            tick_times.append((t1 - t0) / 1000000)
+            frame_times.append((t2 - t1) / 1000000)
+    except SystemExit:
+        # A recorded quit event ends the replay just like it ended the session.
+        pass
+    total_s = (perf_counter_ns() - start) / 1000000000
+
+    print("Replayed {} ticks in {:.3f}s".format(len(tick_times), total_s))
+    for label, times in (("tick", sorted(tick_times)), ("frame", sorted(frame_times))):
+        if times:
+            print("{:>5} ms: mean {:.3f}, p50 {:.3f}, p95 {:.3f}, max {:.3f}"
+                  .format(label,
+                          sum(times) / len(times),
+                          _percentile(times, 0.5),
+                          _percentile(times, 0.95),
+                          times[-1]))
+
+
+def main(argv=None):
     # Make the multiprocessing logic used in the modules happy.
     mp.freeze_support()
 
-    # Load the tileset and context
-    tileset = tcod.tileset.load_tilesheet("tilesets/yayo_c64_16x16.png", 16, 16,
-                                          charmap=tcod.tileset.CHARMAP_CP437)
-    context = tcod.context.new(width=WIDTH,
-                               height=HEIGHT,
-                               tileset=tileset,
-                               sdl_window_flags=FLAGS)
+    args = parse_args(argv)
+
+    # Work out the seed and level, from the recording if we're replaying one
+    replayer = InputReplayer(args.replay) if args.replay else None
+    if replayer:
+        seed, level_params = replayer.seed, replayer.level_params
+    else:
+        seed = args.seed if args.seed is not None else time_ns() % 2**32
+        level_params = LEVEL_PARAMS
+
+    random.seed(seed)
+    np.random.seed(seed)
+
+    metrics.enabled = args.metrics
+    if args.trace:
+        tracing.start(args.trace)
 
-    interface = Interface(context)
+    recorder = InputRecorder(args.record, seed, level_params) if args.record else None
+    if replayer:
+        event_source = replayer.next_events
+    elif recorder:
+        event_source = recorder.wrap(tcod.event.get)
+    else:
+        event_source = tcod.event.get
+
+    if args.headless:
+        context = None
+    else:
+        # Load the tileset and context
+        tileset = tcod.tileset.load_tilesheet("tilesets/yayo_c64_16x16.png", 16, 16,
+                                              charmap=tcod.tileset.CHARMAP_CP437)
+        context = tcod.context.new(width=WIDTH,
+                                   height=HEIGHT,
+                                   tileset=tileset,
+                                   sdl_window_flags=FLAGS)
+
+    interface = Interface(context, event_source=event_source)
 
     # Mock-up of generating the main menu, which should be its own class, I think
     menu = Menu(width=floor(WIDTH/(2*TILESET_SIZE)),
@@ -47,22 +151,14 @@ def main():
                 spacing=1)
 
     def launch_the_game(event):
-        interface.new_playfield(width=200,
-                                height=80)
-
-        floors = []
-        for y in range(0, 40):
-            floors.append([(x, y, WalkableTerrain())
-                           for x in range(0, 60)])
-
-        for f in sum(floors, []):
-            x, y, ent = f
-            ent.introduce_at(x, y, interface.playfield)
-
-        walls = [(x, 20, Wall()) for x in range(0, 11)]
-        for w in walls:
-            x, y, ent = w
-            ent.introduce_at(x, y, interface.playfield)
+        # Floor a 60x40 patch with a short wall across it, laid out as terrain all at once
+        field = np.zeros((level_params["height"], level_params["width"]), dtype=bool)
+        field[0:40, 0:60] = True
+        walls = np.zeros_like(field)
+        walls[20, 0:11] = True
+        interface.new_playfield_from_layers(walls=walls,
+                                            field=field,
+                                            terrain_palette={FLOOR: WalkableTerrain(), WALL: Wall()})
 
         player_char = Mobile(size=4,
                              sigil=Sigil("@", priority=3),
@@ -110,7 +206,7 @@ def main():
     menu.add_option(MenuOption(text="Because we, ah...",
                                width=24, height=5,
                                on_select=lambda x: print("Did more nothing!")))
-    menu.add_option(MenuOption(text="Need to tests something",
+    menu.add_option(MenuOption(text="Need to test something",
                                width=24, height=5,
                                on_select=lambda x: print("Did more nothing!")))
     menu.add_option(MenuOption(text="You know, uh...",
@@ -127,23 +223,38 @@ def main():
                                on_select=lambda x: print("Did more nothing!")))
     interface.open_menu(menu)
 
+    if replayer:
+        run_replay(interface, replayer)
+        tracing.stop()
+        if args.metrics:
+            print_metrics_summary()
+        return
+
     last_tick = __time_ms()  # In epoch milliseconds
     tick_length = 50         # Milliseconds per engine tick
-    while True:
-        now_ms = __time_ms()
-
-        # Only run the main loop logic if we've reached the next clock increment
-        if now_ms - last_tick >= tick_length:
-            if interface.playfield:
-                win_width, win_height = context.recommended_console_size(min_columns=50,
-                                                                         min_rows=40)
-                interface.playfield.window = (win_width - READOUT_WIDTH,
-                                              win_height - GAMELOG_HEIGHT)
-            interface.tick()
-            interface.print_self()
+    try:
+        while True:
+            now_ms = __time_ms()
+
+            # Only run the main loop logic if we've reached the next clock increment
+            if now_ms - last_tick >= tick_length:
+                if interface.playfield:
+                    win_width, win_height = context.recommended_console_size(min_columns=50,
+                                                                             min_rows=40)
+                    interface.playfield.window = (win_width - READOUT_WIDTH,
+                                                  win_height - GAMELOG_HEIGHT)
+                interface.tick()
+                interface.print_self()
 
-            # Forward the reference time to the time at which we started this batch of logic
-            last_tick = now_ms
+                # Forward the reference time to the time at which we started this batch of logic
+                last_tick = now_ms
+    finally:
+        # Make sure the recording is flushed however the session ends.
+        if recorder:
+            recorder.close()
+        tracing.stop()
+        if args.metrics:
+            print_metrics_summary()
 
 if __name__ == "__main__":
     main()
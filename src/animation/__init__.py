@@ -1,4 +1,3 @@
-__all__ = ["AnimationFrame", "Animation", "OverlappingSigilAnimation"]
+__all__ = ["AnimationFrame", "Animation"]
 
-from .animation_ import AnimationFrame, Animation
-from .overlapping_sigil_animation import OverlappingSigilAnimation
\ No newline at end of file
+from .animation_ import AnimationFrame, Animation
\ No newline at end of file
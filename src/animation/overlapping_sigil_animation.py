@@ -1,5 +0,0 @@
-from .animation_ import Animation
-
-
-class OverlappingSigilAnimation(Animation):
-    pass
\ No newline at end of file
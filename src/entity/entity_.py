@@ -1,5 +1,6 @@
 from typing import Optional, Tuple
 from src.sigil import Sigil
+from src.instrumentation import tracing
 
 
 class CannotMoveException(Exception):
@@ -150,15 +151,16 @@ class Entity:
             raise ValueError("Move-to destination (x:{}, y:{}) for entity {} is out of bounds!"
                              .format(str(x), str(y), str(self.name)))
 
-        new_cell = self.playfield.get_cell(x, y)
+        with tracing.span("Entity.move_to", "sim"):
+            new_cell = self.playfield.get_cell(x, y)
 
-        if new_cell.passable:
-            self.cell.remove_entity(self)
-            new_cell.add_entity(self)
-            self.cell = new_cell
-        else:
-            # Usually, fail quietly--but is overridable if we find reason.
-            self.__on_destination_impassable()
+            if new_cell.passable:
+                self.cell.remove_entity(self)
+                new_cell.add_entity(self)
+                self.cell = new_cell
+            else:
+                # Usually, fail quietly--but is overridable if we find reason.
+                self.__on_destination_impassable()
 
     def introduce_at(self, x, y, playfield) -> None:
         """As per move_to, but assumes the Entity doesn't already have a playfield.
@@ -1,8 +1,7 @@
 import tcod
 #from src.playfield import PlayField, Cell
-from src.animation import OverlappingSigilAnimation
 from .position_delta import PositionDelta
-from math import floor
+from src.instrumentation import latency
 
 def _is_movement_key(event: tcod.event.Event) -> bool:
     """Returns true IIF event is a keydown event whose sym corresponds to a movement key."""
@@ -117,15 +116,20 @@ class GameplayHandler(tcod.event.EventDispatch[None]):
             cell = self.interface.playfield.get_cell(x=x_i, y=y_i)
             if cell.passable:
                 pc.move_to(x=x_i, y=y_i)
+                latency.mark("move_pc")
 
-                # We can be sure that the window shifted if the new window position corresponds to the tipping point.
-                win_moved_along_x = x_i >= floor(self.interface.playfield.window[0] / 2)
-                win_moved_along_y = y_i >= floor(self.interface.playfield.window[1] / 2)
-                if win_moved_along_x or win_moved_along_y:
-                    # Clear OverlappingSigilAnimations whenever the window shifts so that they can be refreshed.
-                    [self.interface.clear_animation(anim)
-                     for x, y, anim in self.interface.animations
-                     if isinstance(anim, OverlappingSigilAnimation)]
+    def cmd_scroll_log(self, entries: int) -> None:
+        """Scrolls the game log back (positive) or forward (negative) by a number of entries."""
+        if self.interface.game_log is not None:
+            self.interface.game_log.scroll(entries)
+
+    def cmd_toggle_metrics(self) -> None:
+        """Shows or hides the timing overlay in the readout column."""
+        self.interface.toggle_metrics()
+
+    def cmd_toggle_trace(self) -> None:
+        """Starts or stops writing a trace file."""
+        self.interface.toggle_trace()
 
     def cmd_wait(self, ticks=10) -> None:
         """Called when a player briefly waits. Runs another 10 (default) ticks."""
@@ -141,3 +145,11 @@ class GameplayHandler(tcod.event.EventDispatch[None]):
             self.cmd_move_pc(event)
         elif _is_wait_action(event):
             self.cmd_wait()
+        elif event.sym == tcod.event.K_PAGEUP:
+            self.cmd_scroll_log(1)
+        elif event.sym == tcod.event.K_PAGEDOWN:
+            self.cmd_scroll_log(-1)
+        elif event.sym == tcod.event.K_F3:
+            self.cmd_toggle_metrics()
+        elif event.sym == tcod.event.K_F4:
+            self.cmd_toggle_trace()
@@ -0,0 +1,6 @@
+__all__ = ["Metrics", "RollingHistogram", "metrics", "TraceRecorder", "Tracing", "tracing",
+           "LatencyTracker", "latency"]
+
+from .metrics import Metrics, RollingHistogram, metrics
+from .trace import TraceRecorder, Tracing, tracing
+from .latency import LatencyTracker, latency
@@ -0,0 +1,84 @@
+from time import perf_counter_ns
+from typing import List, Optional, Tuple
+import tcod
+from .metrics import Metrics, metrics
+
+# SDL's clock, which event.timestamp_ns is measured against, where this version of tcod exposes both.
+try:
+    from tcod.cffi import lib as _sdl
+    _sdl_ticks_ns = _sdl.SDL_GetTicksNS
+except (ImportError, AttributeError):
+    _sdl_ticks_ns = None
+
+
+def _queue_age_ns(event: tcod.event.Event) -> int:
+    """How long ago SDL queued an event, or 0 if it can't be told (including for replayed events)."""
+    queued_at = getattr(event, "timestamp_ns", 0)
+    if not queued_at or _sdl_ticks_ns is None:
+        return 0
+    return max(_sdl_ticks_ns() - queued_at, 0)
+
+
+class _NullHandling:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_HANDLING = _NullHandling()
+
+
+class _Handling:
+    def __init__(self, tracker: "LatencyTracker", received_ns: int):
+        self._tracker = tracker
+        self._received_ns = received_ns
+
+    def __enter__(self):
+        self._tracker._current = self._received_ns
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._tracker._current = None
+        return False
+
+
+class LatencyTracker:
+    """Measures input-to-photon latency: from an input event arriving to the first frame presented
+    after the state change it caused.
+
+    The interface wraps each event's dispatch in .handling(event), the code which changes state in response
+    calls .mark(tag), and the interface calls .presented() once the next frame is on screen. Latencies go into
+    the metrics histograms "latency.input" and "latency.<tag>", in milliseconds, only while metrics are enabled."""
+    def __init__(self, parent: Metrics):
+        self._parent = parent
+        self._current: Optional[int] = None
+        self._pending: List[Tuple[str, int]] = []
+
+    def handling(self, event: tcod.event.Event):
+        """Returns a context manager to wrap an event's dispatch in, so .mark() knows when the event arrived."""
+        if not self._parent.enabled:
+            return _NULL_HANDLING
+        return _Handling(self, perf_counter_ns() - _queue_age_ns(event))
+
+    def mark(self, tag: str) -> None:
+        """Notes that the event being dispatched changed visible state. Does nothing outside of .handling()."""
+        if self._current is not None:
+            self._pending.append((tag, self._current))
+
+    def presented(self) -> None:
+        """Records the latency of every state change marked since the last presented frame."""
+        if not self._pending:
+            return
+
+        now = perf_counter_ns()
+        for tag, received_ns in self._pending:
+            ms = (now - received_ns) / 1000000
+            self._parent.record("latency.input", ms)
+            self._parent.record("latency." + tag, ms)
+        self._pending = []
+
+
+# Reports to the process-wide metrics.
+latency = LatencyTracker(metrics)
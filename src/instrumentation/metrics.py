@@ -0,0 +1,130 @@
+from time import perf_counter_ns
+from typing import Dict, List
+import numpy as np
+from .trace import tracing
+
+
+class RollingHistogram:
+    """Keeps the most recent samples of a timing, in milliseconds, in a fixed-size ring buffer."""
+    def __init__(self, size: int = 512):
+        if size < 1:
+            raise ValueError("size must be at least 1, given {}".format(str(size)))
+
+        self._samples = np.zeros(size, dtype=np.float64)
+        self._next: int = 0    # Index the next sample is written to
+        self._count: int = 0   # Total samples ever added
+
+    def add(self, ms: float) -> None:
+        self._samples[self._next] = ms
+        self._next = (self._next + 1) % len(self._samples)
+        self._count += 1
+
+    @property
+    def count(self) -> int:
+        """How many samples have been added, including those since rolled out of the buffer."""
+        return self._count
+
+    @property
+    def samples(self) -> np.ndarray:
+        """The samples currently held, oldest first."""
+        if self._count < len(self._samples):
+            return self._samples[:self._count]
+        return np.roll(self._samples, -self._next)
+
+    @property
+    def last(self) -> float:
+        return float(self._samples[self._next - 1]) if self._count else 0.0
+
+    def percentile(self, q: float) -> float:
+        return float(np.percentile(self.samples, q)) if self._count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        """Returns the count, last sample, p50, p95 and max of the samples held."""
+        held = self.samples
+        if not len(held):
+            return {"count": 0, "last": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+
+        p50, p95 = np.percentile(held, (50, 95))
+        return {"count": self._count,
+                "last": self.last,
+                "p50": float(p50),
+                "p95": float(p95),
+                "max": float(held.max())}
+
+
+class _NullSpan:
+    """Handed out by Metrics.span while disabled, so a disabled span costs one attribute check."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, parent: "Metrics", name: str):
+        self._parent = parent
+        self._name = name
+
+    def __enter__(self):
+        self._start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end = perf_counter_ns()
+        if self._parent.enabled:
+            self._parent.record(self._name, (end - self._start) / 1000000)
+
+        # While a trace is running, the same span also goes into it
+        recorder = tracing.recorder
+        if recorder is not None:
+            recorder.complete(self._name, "phase", self._start, end)
+        return False
+
+
+class Metrics:
+    """A set of named rolling timing histograms, filled in by span()s around the phases of interest.
+
+    Usage:
+        with metrics.span("tick.simulate"):
+            playfield.tick()"""
+    def __init__(self, histogram_size: int = 512, enabled: bool = False):
+        self._histogram_size = histogram_size
+        self._histograms: Dict[str, RollingHistogram] = {}
+        self.enabled = enabled
+
+    def span(self, name: str):
+        """Returns a context manager which times its body into the named histogram, if metrics are enabled,
+        and into the running trace, if there is one."""
+        if not self.enabled and tracing.recorder is None:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name: str, ms: float) -> None:
+        """Adds a sample, in milliseconds, to the named histogram, creating it if necessary."""
+        hist = self._histograms.get(name)
+        if hist is None:
+            hist = self._histograms[name] = RollingHistogram(self._histogram_size)
+        hist.add(ms)
+
+    def histogram(self, name: str) -> RollingHistogram:
+        return self._histograms[name]
+
+    @property
+    def names(self) -> List[str]:
+        return sorted(self._histograms.keys())
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Returns each histogram's summary by name."""
+        return {name: self._histograms[name].summary() for name in self.names}
+
+    def reset(self) -> None:
+        """Drops every histogram."""
+        self._histograms = {}
+
+
+# The process-wide metrics the engine's spans report to. Disabled until something turns it on.
+metrics = Metrics()
@@ -0,0 +1,164 @@
+import json
+import os
+import queue
+import threading
+from time import perf_counter_ns
+from typing import List, Optional
+
+
+class TraceRecorder:
+    """Writes complete ("X") events to a file in Chrome's JSON array trace format,
+    which chrome://tracing and Perfetto both load.
+
+    Events are buffered in memory and handed off in batches to a background thread which does the writing,
+    so the thread being traced only pays for building a dict. Once max_events have been recorded,
+    further events are dropped (and counted) so a forgotten trace can't grow without bound."""
+    def __init__(self, path: str, max_events: int = 1000000, batch_size: int = 2048):
+        if max_events < 1 or batch_size < 1:
+            raise ValueError("max_events and batch_size must both be at least 1, given {} and {}"
+                             .format(str(max_events), str(batch_size)))
+
+        self._path = path
+        self._max_events = max_events
+        self._batch_size = batch_size
+        self._batch: List[dict] = []
+        self._recorded: int = 0
+        self._dropped: int = 0
+        self._pid = os.getpid()
+
+        self._queue: queue.Queue = queue.Queue()
+        self._file = open(path, "w")
+        self._file.write("[\n")
+        self._writer = threading.Thread(target=self._write_batches,
+                                        name="TraceRecorder writer",
+                                        daemon=True)
+        self._writer.start()
+        self._closed = False
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def recorded(self) -> int:
+        return self._recorded
+
+    @property
+    def dropped(self) -> int:
+        """How many events were discarded for going over max_events."""
+        return self._dropped
+
+    def complete(self, name: str, category: str, start_ns: int, end_ns: int, args: Optional[dict] = None) -> None:
+        """Records an event spanning start_ns to end_ns, as measured by time.perf_counter_ns."""
+        if self._recorded >= self._max_events:
+            self._dropped += 1
+            return
+
+        event = {"name": name,
+                 "cat": category,
+                 "ph": "X",
+                 "ts": start_ns / 1000,
+                 "dur": (end_ns - start_ns) / 1000,
+                 "pid": self._pid,
+                 "tid": threading.get_ident()}
+        if args:
+            event["args"] = args
+
+        self._batch.append(event)
+        self._recorded += 1
+        if len(self._batch) >= self._batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Hands the current batch to the writer thread."""
+        if self._batch:
+            self._queue.put(self._batch)
+            self._batch = []
+
+    def close(self) -> None:
+        """Flushes, waits for the writer to finish and closes the file. Safe to call more than once."""
+        if self._closed:
+            return
+        self._closed = True
+
+        self.flush()
+        self._queue.put(None)
+        self._writer.join()
+
+        # Every written event ends in a comma, so close the array on a final instant event.
+        self._file.write(json.dumps({"name": "trace_end", "ph": "i", "s": "g",
+                                     "ts": perf_counter_ns() / 1000, "pid": self._pid,
+                                     "args": {"recorded": self._recorded, "dropped": self._dropped}}))
+        self._file.write("\n]\n")
+        self._file.close()
+
+    def _write_batches(self) -> None:
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            self._file.write("".join(json.dumps(e) + ",\n" for e in batch))
+
+
+class _NullTraceSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_TRACE_SPAN = _NullTraceSpan()
+
+
+class _TraceSpan:
+    def __init__(self, recorder: TraceRecorder, name: str, category: str, args: Optional[dict]):
+        self._recorder = recorder
+        self._name = name
+        self._category = category
+        self._args = args
+
+    def __enter__(self):
+        self._start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._recorder.complete(self._name, self._category, self._start, perf_counter_ns(), self._args)
+        return False
+
+
+class Tracing:
+    """Switches a TraceRecorder on and off at runtime, and hands out spans which record to it while it's on.
+
+    Usage:
+        with tracing.span("Mobile.tick", "sim"):
+            mob.tick()"""
+    def __init__(self):
+        self.recorder: Optional[TraceRecorder] = None
+
+    @property
+    def active(self) -> bool:
+        return self.recorder is not None
+
+    def start(self, path: str, max_events: int = 1000000) -> TraceRecorder:
+        """Starts recording to a new file, stopping any trace already running."""
+        self.stop()
+        self.recorder = TraceRecorder(path, max_events=max_events)
+        return self.recorder
+
+    def stop(self) -> Optional[TraceRecorder]:
+        """Stops and closes the running trace, if there is one, and returns it."""
+        recorder, self.recorder = self.recorder, None
+        if recorder:
+            recorder.close()
+        return recorder
+
+    def span(self, name: str, category: str = "", args: Optional[dict] = None):
+        """Returns a context manager which records its body as one event, if a trace is running."""
+        if self.recorder is None:
+            return _NULL_TRACE_SPAN
+        return _TraceSpan(self.recorder, name, category, args)
+
+
+# The process-wide tracing switch. Nothing is recorded until something calls tracing.start().
+tracing = Tracing()
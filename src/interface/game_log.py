@@ -1,8 +1,18 @@
-from copy import deepcopy
-from typing import List, Tuple, Optional
+import json
+import tempfile
+import numpy as np
+from array import array
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Tuple, Optional
 
 RGBTuple = Tuple[int, int, int]
 
+# Byte offsets into the archive file are indexed once per this many archived entries.
+ARCHIVE_INDEX_STRIDE = 64
+
+# How many archived entries to page back into memory at a time while scrolled back.
+ARCHIVE_PAGE_SIZE = 32
+
 
 class LogEntry:
     """A class representing a single chunk of text to be printed to the in-game console, as well as its color."""
@@ -15,6 +25,9 @@ class LogEntry:
         self._text = text
         self._color = color
 
+        # Wrapped rows of .text, keyed by the width they were wrapped to.
+        self._rows_cache: Dict[int, List[str]] = {}
+
     @property
     def text(self) -> str:
         """Returns the text of this LogEntry as a single string."""
@@ -25,6 +38,7 @@ class LogEntry:
         """Assigns a new value of .text, assuming it's a string of length > 0."""
         if isinstance(t, str) and len(t) > 0:
             self._text = t
+            self._rows_cache = {}
         else:
             raise ValueError(".text attribute of {} must be a string of length at least 0, got: {}"
                              .format(str(self),
@@ -48,20 +62,12 @@ class LogEntry:
                              .format(str(c)))
 
     def as_rows(self, width) -> List[str]:
-        """Returns a list of strings representing this LogEntry's .text, split into lengths of 'width'."""
-        def row_gen():
-            i = 0
-            di = width
-
-            while i < len(self.text):
-                if i + di < len(self.text):
-                    t = self.text[i:i+di]
-                else:
-                    t = self.text[i:]
-                i += di
-                yield(t)
-
-        return [r for r in row_gen()]
+        """Returns a list of strings representing this LogEntry's .text, split into lengths of 'width'.
+        The result is cached per width, so don't mutate the returned list."""
+        if width not in self._rows_cache:
+            self._rows_cache[width] = [self.text[i:i + width]
+                                       for i in range(0, len(self.text), width)]
+        return self._rows_cache[width]
 
     def as_drawables(self, x0: int, y0: int, width: int) -> List[Tuple[int, int, str, Tuple[int, int, int]]]:
         """Given a top-left corner (x0, y0), return a list of [(x, y, character, (r, g, b))]"""
@@ -80,60 +86,236 @@ class LogEntry:
 
 class GameLog:
     """Keeps a running log of text to be printed for the player during gameplay,
-    as well as holds methods to render it into console-printable lines given a specified width."""
+    as well as holds methods to render it into console-printable lines given a specified width.
+
+    Only the most recent `capacity` entries are held in memory. Older ones are streamed to an
+    append-only archive file--a temporary file unless archive_path is given--and are paged back
+    in lazily when the player scrolls back far enough to see them.
+
+    The visible panel is kept pre-rendered as a glyph/color buffer, which is only rebuilt
+    when an entry is added or removed, the view is scrolled or the panel is resized."""
     def __init__(self, width: int, height: int, interface,
-                 initial_log: Optional[List[LogEntry]] = []):
+                 initial_log: Optional[List[LogEntry]] = None,
+                 capacity: int = 256,
+                 archive_path: Optional[str] = None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1, got {}".format(str(capacity)))
+
         self._width = width
         self._height = height
-        self._log = initial_log
+        self._capacity = capacity
         self._interface = interface
 
+        # Ring buffer of the most recent entries
+        self._log: Deque[LogEntry] = deque()
+
+        # The archive file is only opened once something is first evicted into it.
+        self._archive_path = archive_path
+        self._archive = None
+        self._archived = 0                       # Number of entries written to the archive
+        self._archive_index = array("q")         # Byte offset of every ARCHIVE_INDEX_STRIDE-th entry
+        self._archive_end = 0                    # Byte offset at which the next record will be written
+        self._closed = False                     # Whether close() has been called, after which nothing is archived
+        self._page: Tuple[int, List[LogEntry]] = (0, [])  # (first archive index, entries) paged into memory
+
+        # How many entries back from the newest the view is scrolled. 0 is the live view.
+        self._scroll = 0
+
+        # Pre-rendered panel contents in [y][x] order. A glyph of 0 means "draw nothing here."
+        self._glyphs: np.ndarray = np.zeros(shape=(height, width), dtype=np.int32)
+        self._colors: np.ndarray = np.zeros(shape=(height, width, 3), dtype=np.uint8)
+        self._dirty = True
+
+        for e in initial_log or ():
+            self._append(e)
+
     @property
-    def log(self):
-        return self._log
+    def log(self) -> List[LogEntry]:
+        """Returns the entries still held in memory, oldest first."""
+        return list(self._log)
+
+    @property
+    def capacity(self) -> int:
+        """The maximum number of entries held in memory before older ones are archived."""
+        return self._capacity
+
+    def __len__(self) -> int:
+        """The total number of entries in this log, including archived ones while the archive is open."""
+        return len(self._log) if self._closed else self._archived + len(self._log)
+
+    @property
+    def width(self) -> int:
+        return self._width
+
+    @property
+    def height(self) -> int:
+        return self._height
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """Returns the dimensions of the log panel as (width, height)."""
+        return self._width, self._height
+
+    @shape.setter
+    def shape(self, new_shape: Tuple[int, int]) -> None:
+        """Resizes the log panel, given a tuple of (width, height) that are both greater than zero."""
+        w, h = new_shape
+        if w <= 0 or h <= 0:
+            raise ValueError("Both width and height must be greater than zero. Got ({}, {})"
+                             .format(str(w), str(h)))
+        if (w, h) != (self._width, self._height):
+            self._width, self._height = w, h
+            self._glyphs = np.zeros(shape=(h, w), dtype=np.int32)
+            self._colors = np.zeros(shape=(h, w, 3), dtype=np.uint8)
+            self._dirty = True
+
+    def invalidate(self) -> None:
+        """Marks the pre-rendered panel as stale. Call after mutating an entry that's already in the log."""
+        self._dirty = True
+
+    def _append(self, entry: LogEntry) -> None:
+        """Pushes an entry onto the ring buffer, archiving the oldest one if it's full."""
+        if len(self._log) >= self._capacity:
+            self._archive_entry(self._log.popleft())
+        self._log.append(entry)
+
+        # Keep a scrolled-back view anchored on the same entries.
+        if self._scroll:
+            self._scroll += 1
+        self._dirty = True
 
     def add_entry(self, text: str,
                   color: RGBTuple = (255, 255, 255)) -> None:
         """Add a new LogEntry to this GameLog, given valid values of text and optionally color."""
-        self._log.append(LogEntry(text=text,
-                                  color=color))
+        self._append(LogEntry(text=text,
+                              color=color))
 
     def remove_entry(self, entry: LogEntry):
-        """Removes a specified entry from this log, if it exists in it. Fails quietly if it does not."""
+        """Removes a specified entry from this log, if it's still in memory. Fails quietly if it is not.
+        Archived entries are never removed."""
         if entry in self._log:
             self._log.remove(entry)
+            self._scroll = min(self._scroll, max(len(self) - 1, 0))
+            self._dirty = True
 
-    def as_drawables(self, x0: int, y0: int) -> List[Tuple[int, int, str, Tuple[int, int, int]]]:
-        """Returns a list of tuples containing [x, y, character, (r, g, b)] from which to draw the
-        contents of this interface element. Assumes that the range ends at x0+width, y0+height.
+    def _archive_entry(self, entry: LogEntry) -> None:
+        """Appends one entry to the archive file as a single JSON line of [r, g, b, text].
+        Once the log is closed, evicted entries are dropped rather than reopening, and truncating, the archive."""
+        if self._closed:
+            return
+        if self._archive is None:
+            self._archive = open(self._archive_path, "w+b") if self._archive_path \
+                else tempfile.TemporaryFile()
 
-        :param x0 The x value of the top-left most point from which to render the menu.
-        :param y0 The y value of the top-left most point from which to render the menu."""
+        if self._archived % ARCHIVE_INDEX_STRIDE == 0:
+            self._archive_index.append(self._archive_end)
 
-        # Iterate through our available height in increments of each shown entry's height plus one margin row.
-        yi = deepcopy(y0)  # The y offset
-        i = -1             # The index--relative to the end of ._log-- that we wish to reference next.
-        drawables = []     # A list to hold the drawable tuples we wish to return
+        record = (json.dumps([*entry.color, entry.text], separators=(",", ":")) + "\n").encode("utf-8")
+        self._archive.seek(self._archive_end)
+        self._archive.write(record)
+        self._archive_end += len(record)
+        self._archived += 1
 
-        # While yi is between our origin point and origin + height,
-        # and while we ALSO have more LogEntries left to render...
-        while yi <= y0 + self._height and -i <= len(self._log):
-            # Render it on column dx and row yi, then append it to drawables.
-            entry = self._log[i]
-            drawables += entry.as_drawables(x0=x0,
-                                            y0=yi,
-                                            width=self._width)
+    def archived_entries(self, start: int, count: int) -> List[LogEntry]:
+        """Reads up to `count` archived entries back from disk, starting at archive index `start`
+        (0 being the oldest entry ever evicted from memory). Returns nothing once the log is closed."""
+        if self._closed or start < 0 or count <= 0 or start >= self._archived:
+            return []
 
-            # Set the next top-left corner, adding an extra row between statements as a margin.
-            yi += len(entry.as_rows(self._width)) + 1
+        self._archive.flush()
+        self._archive.seek(self._archive_index[start // ARCHIVE_INDEX_STRIDE])
+        for i in range(start % ARCHIVE_INDEX_STRIDE):
+            self._archive.readline()
 
-            # Set the index back by one more element from the last
-            i -= 1
+        entries = []
+        for i in range(min(count, self._archived - start)):
+            r, g, b, text = json.loads(self._archive.readline())
+            entries.append(LogEntry(text, color=(r, g, b)))
+        return entries
 
-        return drawables
+    def _archived_entry(self, i: int) -> LogEntry:
+        """Returns archived entry i, paging in the block of entries around it if necessary."""
+        page_start, page = self._page
+        if not page_start <= i < page_start + len(page):
+            page_start = max(i - ARCHIVE_PAGE_SIZE + 1, 0)
+            self._page = (page_start, self.archived_entries(page_start, ARCHIVE_PAGE_SIZE))
+            page_start, page = self._page
+        return page[i - page_start]
+
+    def _entries_newest_first(self, skip: int = 0) -> Iterator[LogEntry]:
+        """Yields entries from newest to oldest, skipping the `skip` newest, continuing into the archive."""
+        for i in range(len(self._log) - 1 - skip, -1, -1):
+            yield self._log[i]
+        if self._closed:
+            return
+        for i in range(min(self._archived - 1, len(self) - 1 - skip), -1, -1):
+            yield self._archived_entry(i)
+
+    @property
+    def scroll_offset(self) -> int:
+        """How many entries back from the newest the view is scrolled. 0 is the live view."""
+        return self._scroll
+
+    def scroll(self, entries: int) -> None:
+        """Scrolls the view back (positive) or forward (negative) by a number of entries."""
+        new_scroll = min(max(self._scroll + entries, 0), max(len(self) - 1, 0))
+        if new_scroll != self._scroll:
+            self._scroll = new_scroll
+            self._dirty = True
+
+    def close(self) -> None:
+        """Closes the archive file. A temporary archive is deleted when closed.
+        The log keeps working afterward, but only with the entries still in memory."""
+        self._closed = True
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+
+    def _render(self) -> None:
+        """Redraws the glyph and color buffers, newest entry at the top and older entries below it,
+        with an empty margin row between entries."""
+        self._glyphs[:] = 0
+        self._colors[:] = 0
+
+        y = 0  # The next buffer row to draw into
+        for entry in self._entries_newest_first(skip=self._scroll):
+            if y >= self._height:
+                break
+            for row in entry.as_rows(self._width):
+                if y >= self._height:
+                    break
+                codepoints = np.frombuffer(row.encode("utf-32-le"), dtype=np.uint32)
+                self._glyphs[y, :len(codepoints)] = codepoints
+                self._colors[y, :len(codepoints)] = entry.color
+                y += 1
+
+            # Add an extra row between statements as a margin.
+            y += 1
+
+        self._dirty = False
+
+    def render_buffer(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the pre-rendered panel as (glyphs, colors), arrays in [y][x] order of
+        shape (height, width) and (height, width, 3). Only redraws if something has changed."""
+        if self._dirty:
+            self._render()
+        return self._glyphs, self._colors
+
+    def as_drawables(self, x0: int, y0: int) -> List[Tuple[int, int, str, Tuple[int, int, int]]]:
+        """Returns a list of tuples containing [x, y, character, (r, g, b)] from which to draw the
+        contents of this interface element. Assumes that the range ends at x0+width, y0+height.
+
+        :param x0 The x value of the top-left most point from which to render the menu.
+        :param y0 The y value of the top-left most point from which to render the menu."""
+        glyphs, colors = self.render_buffer()
+        ys, xs = np.nonzero(glyphs)
+        return [(int(x) + x0,
+                 int(y) + y0,
+                 chr(glyphs[y, x]),
+                 tuple(int(c) for c in colors[y, x]))
+                for y, x in zip(ys, xs)]
 
     @property
     def interface(self):
         """Returns the parent interface for this GameLog."""
         return self._interface
-
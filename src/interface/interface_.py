@@ -1,15 +1,42 @@
 import tcod
-from typing import List, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from src.playfield import PlayField
+from src.layers import LayerStore
 from src.menus import Menu
 from src.entity import Entity
 from src.animation import Animation
 from src.entity.entities import Mobile
+from src.instrumentation import metrics, tracing, latency
 from .game_log import LogEntry, GameLog
 from math import floor
+from time import strftime
+import numpy as np
+
+
+def _blit(console: tcod.console.Console, x0: int, y0: int,
+          glyphs: np.ndarray, colors: np.ndarray) -> None:
+    """Copies a pre-rendered block of glyphs and foreground colors, given in [y][x] order,
+    onto an x-major console with its top-left corner at (x0, y0).
+    Tiles with a glyph of 0 are left untouched, and anything past the console edge is clipped."""
+    height, width = glyphs.shape
+    cx0, cy0 = max(x0, 0), max(y0, 0)
+    cx1, cy1 = min(x0 + width, console.width), min(y0 + height, console.height)
+    if cx1 <= cx0 or cy1 <= cy0:
+        return
+
+    # Transpose the clipped block into the console's (x, y) order
+    block_glyphs = glyphs[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0].T
+    block_colors = colors[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0].transpose(1, 0, 2)
+    mask = block_glyphs != 0
+
+    console.ch[cx0:cx1, cy0:cy1][mask] = block_glyphs[mask]
+    console.fg[cx0:cx1, cy0:cy1][mask] = block_colors[mask]
 
 
 class Interface:
+    # Width of the readout column along the right edge of the screen, in tiles
+    readout_width: int = 24
+
     def open_menu(self, menu: Menu):
         """Menus can have their own on_open and on_close callbacks,
         so generally only override for purposes of interface screw."""
@@ -45,10 +72,32 @@ class Interface:
                        pc_spawn_point=player_spawn)
         self._pf = pf
 
+    def new_playfield_from_layers(self, walls: np.ndarray, field: np.ndarray,
+                                  terrain_palette: Optional[Dict[int, Entity]] = None,
+                                  contents: Optional[List[Tuple[int, int, Entity]]] = (),
+                                  player_character: Optional[Entity] = None,
+                                  player_spawn: Optional[Tuple[int, int]] = None,
+                                  layer_store: Optional[LayerStore] = None):
+        """As per new_playfield, but laying out the terrain of a whole level at once. See PlayField.from_layers.
+        Given a layer store, the terrain is kept there memory-mapped instead of in memory."""
+        self._pf = PlayField.from_layers(interface=self,
+                                         walls=walls,
+                                         field=field,
+                                         terrain_palette=terrain_palette,
+                                         contents=contents,
+                                         player_character=player_character,
+                                         pc_spawn_point=player_spawn,
+                                         layer_store=layer_store)
+
     def new_console(self,
                     min_width: int = 48,
                     min_height: int = 36) -> tcod.console.Console:
-        """Returns a new console from self._context based on a specified minimum width and height."""
+        """Returns a new console from self._context based on a specified minimum width and height.
+        Headless interfaces, which have no context, get a plain console of their fixed headless size instead."""
+        if self._context is None:
+            width, height = self._headless_size
+            return tcod.console.Console(width, height, order="F")
+
         return self._context.new_console(min_columns=min_height,
                                          min_rows=min_width,
                                          order="F")  # Specifies that the console is in x-major order (x, y)
@@ -71,7 +120,8 @@ class Interface:
                        self.playfield.player_character.position[1]) if not center_on else center_on[1]
 
         drawables = self.playfield.drawables(center_on=(center_x,
-                                                        center_y))
+                                                        center_y),
+                                             frame=self._frame)
         for d in drawables:
             self.console.print(x=d["x"],
                                y=d["y"],
@@ -79,13 +129,8 @@ class Interface:
                                fg=d["rgb"])
 
     def _print_game_log(self, x0, y0):
-        drawables = self._game_log.as_drawables(x0, y0)
-        for d in drawables:
-            x, y, char, color = d
-            self.console.print(x=x,
-                               y=y,
-                               string=char,
-                               fg=color)
+        glyphs, colors = self._game_log.render_buffer()
+        _blit(self.console, x0, y0, glyphs, colors)
 
     def _print_menus(self):
         for m in self._menus:
@@ -93,20 +138,66 @@ class Interface:
             if m.is_full_screen:
                 self.console.clear()
 
-            # Fetch a list of drawables from the menu in question
+            # Blit each visible option's pre-rendered tiles where the menu lays it out
             m_width, m_height = m.shape
-            drawables = m.render_menu(x0=floor(self.console.width / 2 - m_width / 2),
-                                      y0=floor(self.console.height / 2 - m_height / 2))
+            layout = m.layout(x0=floor(self.console.width / 2 - m_width / 2),
+                              y0=floor(self.console.height / 2 - m_height / 2))
+            for x, y, opt in layout:
+                glyphs, colors = opt.tiles
+                _blit(self.console, x, y, glyphs, colors)
+
+    def _print_metrics(self, x0: int, y0: int, width: int, height: int) -> None:
+        """Prints a table of p50, p95 and max milliseconds for each instrumented span."""
+        rows = ["{:<8.8} {:>4} {:>4} {:>4}".format("ms", "p50", "p95", "max")]
+        summary = metrics.summary()
+        group = None
+        for name, stats in summary.items():
+            # Spans named "parent.phase" are listed under their parent, indented by a space.
+            # Parents without timings of their own, like "latency", get a bare header row.
+            parent = name.split(".")[0]
+            if parent != group and "." in name and parent not in summary:
+                rows.append(parent)
+            group = parent
+
+            label = " " + name.split(".")[-1] if "." in name else name
+            rows.append("{:<8.8} {:>4.1f} {:>4.1f} {:>4.1f}".format(label,
+                                                                   stats["p50"],
+                                                                   stats["p95"],
+                                                                   stats["max"]))
+
+        for i, row in enumerate(rows[:height]):
+            self.console.print(x=x0, y=y0 + i, string=row[:width], fg=(180, 180, 180))
+
+    @property
+    def show_metrics(self) -> bool:
+        """Whether the timing overlay is drawn in the readout column."""
+        return self._show_metrics
+
+    def toggle_metrics(self) -> None:
+        """Shows or hides the timing overlay. Showing it also turns on metric collection."""
+        self._show_metrics = not self._show_metrics
+        if self._show_metrics:
+            metrics.enabled = True
+
+    def toggle_trace(self) -> None:
+        """Starts a trace to a new timestamped file in the working directory, or stops the running one."""
+        if tracing.active:
+            recorder = tracing.stop()
+            message = "Trace saved to {} ({} events, {} dropped)".format(recorder.path,
+                                                                         str(recorder.recorded),
+                                                                         str(recorder.dropped))
+        else:
+            recorder = tracing.start(strftime("trace-%Y%m%d-%H%M%S.json"))
+            message = "Tracing to {}".format(recorder.path)
 
-            # Render the drawables for this menu
-            for d in drawables:
-                x, y, sigil = d
-                self.console.print(x=x,
-                                   y=y,
-                                   string=sigil.character,
-                                   fg=sigil.color)
+        if self._game_log is not None:
+            self.print_to_log(message, color=(180, 180, 180))
 
     def print_self(self):
+        with metrics.span("frame"):
+            self._print_self()
+
+    def _print_self(self):
         # TODO: Render other interface elements like stats and UI console
         # Draw the game window border
         self.console.draw_frame(x=0, y=0,
@@ -117,7 +208,7 @@ class Interface:
         # Tell the playfield its current origin point and window size
         if self.playfield:
             self.playfield.origin = 1, 1
-            self.playfield.window = (self.console.width - 24 - 1,
+            self.playfield.window = (self.console.width - self.readout_width - 1,
                                      self.console.height - 12 - 1)
 
             # Determine where to center the playfield camera
@@ -129,60 +220,82 @@ class Interface:
             view_center = (max(floor(win_w/2), player_x),
                            max(floor(win_h/2), player_y))
 
-            # Print the playfield (and its overlap animations),
-            # now updated with its new window, with the calculated center point.
-            self._print_playfield(center_on=view_center)
-            self.playfield.draw_overlap_animations(center_on=view_center)
+            # Print the playfield, now updated with its new window, with the calculated center point.
+            # Cells with tied top sigils cycle through them based on the frame counter.
+            with metrics.span("frame.playfield"):
+                self._print_playfield(center_on=view_center)
 
-        # Draw animations that aren't always_on_top, if there are any.
-        [self.console.print(x=x,
-                            y=y,
-                            string=anim.get_sigil().character,
-                            fg=anim.get_sigil().color)
-         for x, y, anim in self.animations
-         if not anim.always_on_top]
+        with metrics.span("frame.animations"):
+            # Draw animations that aren't always_on_top, if there are any.
+            [self.console.print(x=x,
+                                y=y,
+                                string=anim.get_sigil().character,
+                                fg=anim.get_sigil().color)
+             for x, y, anim in self.animations
+             if not anim.always_on_top]
 
         # Print menus, if there are any.
         if self._menus:
-            self._print_menus()
-
-        if self._game_log:
-            self._print_game_log(x0=1, y0=self.playfield.window[1] + 1)
-
-        # Draw animations that ARE always_on_top, if there are any.
-        [self.console.print(x=x,
-                            y=y,
-                            string=anim.get_sigil().character,
-                            fg=anim.get_sigil().color)
-         for x, y, anim in self.animations
-         if anim.always_on_top]
-
-        # Send the populated console to screen
-        self.context.present(self.console,
-                             keep_aspect=True)
+            with metrics.span("frame.menus"):
+                self._print_menus()
+
+        if self._game_log is not None:
+            with metrics.span("frame.game_log"):
+                self._print_game_log(x0=1, y0=self.playfield.window[1] + 1)
+
+        with metrics.span("frame.animations_top"):
+            # Draw animations that ARE always_on_top, if there are any.
+            [self.console.print(x=x,
+                                y=y,
+                                string=anim.get_sigil().character,
+                                fg=anim.get_sigil().color)
+             for x, y, anim in self.animations
+             if anim.always_on_top]
+
+        # Draw the timing overlay in the readout column, inside the window border
+        if self._show_metrics:
+            self._print_metrics(x0=self.console.width - self.readout_width,
+                                y0=1,
+                                width=self.readout_width - 1,
+                                height=self.console.height - 2)
+
+        # Send the populated console to screen, unless running headless
+        if self.context is not None:
+            with metrics.span("frame.present"):
+                self.context.present(self.console,
+                                     keep_aspect=True)
+        latency.presented()
+        self._frame += 1
 
     def tick(self) -> None:
         """Fetches a fresh console, ticks the playfield, and ticks & cleans up animations.
         Override or call via super() to apply on-tick interface screw."""
+        with metrics.span("tick"):
+            self._tick()
 
+    def _tick(self) -> None:
         # Simulate only if there is a player character, if there is and the player
         # they aren't in a menu, or there is and it's not their turn to act.
-        if self.playfield and not self._menus:
-            pc = self.playfield.player_character
-            if pc and pc.cooldown != 0:
-                self.playfield.tick()
+        with metrics.span("tick.simulate"):
+            if self.playfield and not self._menus:
+                pc = self.playfield.player_character
+                if pc and pc.cooldown != 0:
+                    self.playfield.tick()
 
         # Refresh console and draw contents
-        self.console = self.new_console()
+        with metrics.span("tick.console"):
+            self.console = self.new_console()
         self.print_self()
 
         # Tick any animations that might be running
-        [anim.tick() for x, y, anim in self.animations]
+        with metrics.span("tick.animate"):
+            [anim.tick() for x, y, anim in self.animations]
 
         # Remove any finished animations
-        [self.clear_animation(anim)
-         for x, y, anim in self.animations
-         if not anim.running]
+        with metrics.span("tick.cleanup"):
+            [self.clear_animation(anim)
+             for x, y, anim in self.animations
+             if not anim.running]
         #
         # for x, y, anim in self.animations:
         #     print("{}, {}".format(anim.get_sigil().character,
@@ -195,22 +308,35 @@ class Interface:
             dispatcher = self.playfield.dispatch
 
         # And hand off events! :)
-        for event in tcod.event.get():
-            dispatcher.dispatch(event)
+        with metrics.span("tick.dispatch"):
+            for event in self._event_source():
+                with latency.handling(event):
+                    dispatcher.dispatch(event)
 
     def new_game_log(self,
                      width: int,
                      height: int,
-                     entries: List[LogEntry] = []):
+                     entries: Optional[List[LogEntry]] = None,
+                     capacity: int = 256,
+                     archive_path: Optional[str] = None):
         """Returns a new game log with specified entries, sized to fit along the lower edge
         of the screen and as high as free space beneath the playfield allows."""
+        if self._game_log is not None:
+            self._game_log.close()
+
         self._game_log = GameLog(width=width,
                                  height=height,
-                                 interface=self)
+                                 interface=self,
+                                 capacity=capacity,
+                                 archive_path=archive_path)
 
-        for e in entries:
+        for e in entries or ():
             self.print_to_log(e.text, e.color)
 
+    @property
+    def game_log(self) -> Optional[GameLog]:
+        return self._game_log
+
     def print_to_log(self, text: str,
                      color: Tuple[int, int, int] = (255, 255, 255)):
         """Appends a new LogEntry to self._game_log, given text and a valid color."""
@@ -239,12 +365,23 @@ class Interface:
         self._animations.append((x, y, animation))
 
     def __init__(self,
-                 context: tcod.context.Context,
+                 context: Optional[tcod.context.Context],
                  playfield: Optional[PlayField] = None,
-                 game_log: Optional[GameLog] = None):
+                 game_log: Optional[GameLog] = None,
+                 event_source: Callable[[], Iterable[tcod.event.Event]] = tcod.event.get,
+                 headless_size: Tuple[int, int] = (80, 50)):
+        """
+        :param context: The tcod context to draw to, or None to run headless without a window
+        :param event_source: Called once per tick for the events to dispatch. Swap in a recorder or replayer here.
+        :param headless_size: The (width, height) of the console used when there is no context
+        """
         self._context = context
+        self._event_source = event_source
+        self._headless_size = headless_size
         self._pf = playfield
         self._game_log = game_log
         self._menus: List[Menu] = []
         self._animations: List[Tuple[int, int, Animation]] = []
+        self._frame: int = 0  # Running count of presented frames, used to cycle overlapping sigils
+        self._show_metrics: bool = False
         self._console: Optional[tcod.console.Console] = self.new_console()
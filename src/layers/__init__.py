@@ -0,0 +1,4 @@
+__all__ = ["BitLayer", "as_bit_layer", "LayerStore"]
+
+from .bit_layer import BitLayer, as_bit_layer
+from .layer_store import LayerStore
@@ -0,0 +1,304 @@
+import numpy as np
+
+from typing import Tuple, Union
+
+# How many bits are set in each possible byte
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, np.newaxis], axis=1).sum(axis=1)
+
+
+def _shift_right(packed: np.ndarray, dx: int) -> np.ndarray:
+    """Moves every row's bits dx places toward higher x. Bits pushed past the last byte are lost."""
+    q, r = divmod(dx, 8)
+    shifted = np.zeros_like(packed)
+    if q < packed.shape[1]:
+        shifted[:, q:] = packed[:, :packed.shape[1] - q]
+    if r:
+        carry = np.zeros_like(shifted)
+        carry[:, 1:] = shifted[:, :-1] << (8 - r)
+        shifted = (shifted >> r) | carry
+    return shifted
+
+
+def _shift_left(packed: np.ndarray, dx: int) -> np.ndarray:
+    """Moves every row's bits dx places toward lower x. Bits pushed past x = 0 are lost."""
+    q, r = divmod(dx, 8)
+    shifted = np.zeros_like(packed)
+    if q < packed.shape[1]:
+        shifted[:, :packed.shape[1] - q] = packed[:, q:]
+    if r:
+        carry = np.zeros_like(shifted)
+        carry[:, :-1] = shifted[:, 1:] >> (8 - r)
+        shifted = (shifted << r) | carry
+    return shifted
+
+
+def _shift_rows(packed: np.ndarray, dy: int) -> np.ndarray:
+    """Moves every row dy places toward higher y, filling in with empty rows."""
+    shifted = np.zeros_like(packed)
+    if dy > 0:
+        shifted[dy:] = packed[:-dy]
+    elif dy < 0:
+        shifted[:dy] = packed[-dy:]
+    else:
+        shifted[:] = packed
+    return shifted
+
+
+def as_bit_layer(layer: Union[np.ndarray, "BitLayer"]) -> "BitLayer":
+    """Returns a BitLayer as it is, such as one mapped from a file, or packs anything else into a new one."""
+    return layer if isinstance(layer, BitLayer) else BitLayer.from_array(layer)
+
+
+class BitLayer:
+    """A 2D boolean layer, in [y][x] order, packed eight tiles to a byte with np.packbits.
+
+    It takes an eighth of the memory of a bool array, and its boolean operations, shifts and dilation work on
+    whole bytes, eight tiles at once. It converts to a bool array wherever NumPy wants one, through np.asarray(),
+    so it can be handed to anything which takes a passability field. Each row is packed separately, with the bits
+    past the width of the last byte of each row always zero."""
+
+    # Let NumPy arrays on the left of an operator defer to ours, rather than treat a layer as an object scalar
+    __array_ufunc__ = None
+
+    def __init__(self, packed: np.ndarray, width: int):
+        """
+        :param packed: 2D uint8 array of rows of bits, as from np.packbits(array, axis=1). Taken, not copied.
+        :param width: How many tiles wide the layer is
+        """
+        packed = np.asarray(packed)
+        if packed.dtype != np.uint8 or packed.ndim != 2:
+            raise ValueError("packed must be a 2D uint8 array; got {} {}".format(str(packed.ndim), str(packed.dtype)))
+        if packed.shape[1] != (width + 7) // 8:
+            raise ValueError("A width of {} needs {} bytes per row; got {}"
+                             .format(str(width), str((width + 7) // 8), str(packed.shape[1])))
+        self.packed = packed
+        self._width = width
+        self._clear_padding()
+
+    @classmethod
+    def from_array(cls, array: Union[np.ndarray, "BitLayer"]) -> "BitLayer":
+        """Packs a 2D boolean array, or anything NumPy can make into one. A BitLayer is copied."""
+        if isinstance(array, BitLayer):
+            return array.copy()
+        array = np.asarray(array, dtype=bool)
+        if array.ndim != 2:
+            raise ValueError("A BitLayer must be 2D; got {} dimensions".format(str(array.ndim)))
+        return cls(np.packbits(array, axis=1), array.shape[1])
+
+    @classmethod
+    def wrap(cls, packed: np.ndarray, width: int) -> "BitLayer":
+        """Wraps rows of bits already known to have their padding clear, such as a memory-mapped layer, without
+        reading or writing them as BitLayer() would."""
+        layer = cls.__new__(cls)
+        layer.packed = packed
+        layer._width = width
+        return layer
+
+    @classmethod
+    def zeros(cls, height: int, width: int) -> "BitLayer":
+        return cls(np.zeros((height, (width + 7) // 8), dtype=np.uint8), width)
+
+    @classmethod
+    def ones(cls, height: int, width: int) -> "BitLayer":
+        return cls(np.full((height, (width + 7) // 8), 255, dtype=np.uint8), width)
+
+    def _clear_padding(self) -> None:
+        spare = 8 * self.packed.shape[1] - self._width
+        if spare and self.packed.size:
+            self.packed[:, -1] &= np.uint8((0xFF << spare) & 0xFF)
+
+    def _like(self, packed: np.ndarray) -> "BitLayer":
+        return BitLayer(packed, self._width)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """(height, width), in tiles"""
+        return self.packed.shape[0], self._width
+
+    @property
+    def height(self) -> int:
+        return self.packed.shape[0]
+
+    @property
+    def width(self) -> int:
+        return self._width
+
+    @property
+    def size(self) -> int:
+        return self.height * self.width
+
+    @property
+    def nbytes(self) -> int:
+        """How many bytes the bits take up."""
+        return self.packed.nbytes
+
+    def __repr__(self):
+        return "BitLayer(shape={}, count={})".format(str(self.shape), str(self.count()))
+
+    def to_array(self) -> np.ndarray:
+        """Unpacks into a new 2D bool array."""
+        return np.unpackbits(self.packed, axis=1, count=self._width).view(bool)
+
+    def __array__(self, dtype=None, copy=None):
+        array = self.to_array()
+        return array if dtype is None else array.astype(dtype, copy=False)
+
+    def copy(self) -> "BitLayer":
+        return self._like(self.packed.copy())
+
+    def count(self) -> int:
+        """How many tiles are True."""
+        return int(_POPCOUNT[self.packed].sum())
+
+    def any(self) -> bool:
+        return bool(self.packed.any())
+
+    def all(self) -> bool:
+        return self.count() == self.size
+
+    def __bool__(self):
+        raise ValueError("The truth of a BitLayer is ambiguous. Use .any() or .all()")
+
+    # Boolean operations, tile by tile. The other side may be a BitLayer or anything shaped like one.
+
+    def _packed_other(self, other) -> np.ndarray:
+        if not isinstance(other, BitLayer):
+            other = np.asarray(other, dtype=bool)
+            if other.ndim == 0:
+                return np.full(self.packed.shape, 255 if other else 0, dtype=np.uint8)
+            other = BitLayer.from_array(np.broadcast_to(other, self.shape))
+        if other.shape != self.shape:
+            raise ValueError("BitLayers must be the same shape; got {} and {}"
+                             .format(str(self.shape), str(other.shape)))
+        return other.packed
+
+    def __and__(self, other) -> "BitLayer":
+        return self._like(self.packed & self._packed_other(other))
+
+    def __or__(self, other) -> "BitLayer":
+        return self._like(self.packed | self._packed_other(other))
+
+    def __xor__(self, other) -> "BitLayer":
+        return self._like(self.packed ^ self._packed_other(other))
+
+    __rand__ = __and__
+    __ror__ = __or__
+    __rxor__ = __xor__
+
+    def __invert__(self) -> "BitLayer":
+        return self._like(~self.packed)
+
+    def __eq__(self, other) -> "BitLayer":
+        return self._like(~(self.packed ^ self._packed_other(other)))
+
+    def __ne__(self, other) -> "BitLayer":
+        return self ^ other
+
+    # Elementwise ==, like an array, so a layer can't be hashed
+    __hash__ = None
+
+    # Indexing
+
+    def _bits_at(self, ys, xs) -> Tuple[Tuple[np.ndarray, np.ndarray], np.ndarray]:
+        """The flat bytes and bit masks of the tiles at ys, xs, which may be ints or arrays."""
+        ys, xs = np.broadcast_arrays(np.asarray(ys), np.asarray(xs))
+        if ((ys < -self.height) | (ys >= self.height) | (xs < -self._width) | (xs >= self._width)).any():
+            raise IndexError("Index out of bounds for a BitLayer of shape {}".format(str(self.shape)))
+        ys, xs = ys % self.height, xs % self._width
+        return (ys, xs >> 3), (np.uint8(0x80) >> (xs & 7).astype(np.uint8))
+
+    def _region(self, ys: slice, xs: slice) -> "BitLayer":
+        y_start, y_stop, y_step = ys.indices(self.height)
+        x_start, x_stop, x_step = xs.indices(self._width)
+        rows = self.packed[ys]
+        if x_step != 1:
+            return BitLayer.from_array(np.unpackbits(rows, axis=1, count=self._width).view(bool)[:, xs])
+
+        width = max(x_stop - x_start, 0)
+        if width == self._width:
+            return self._like(rows.copy())
+        first = x_start // 8
+        region = rows[:, first:first + (x_start % 8 + width + 7) // 8]
+        region = _shift_left(region, x_start % 8) if x_start % 8 else region.copy()
+        return BitLayer(np.ascontiguousarray(region[:, :(width + 7) // 8]), width)
+
+    def __getitem__(self, key):
+        """layer[y, x] is a bool and layer[ys, xs] with arrays of indices a bool array, as for an array.
+        Slicing both ways, like layer[y0:y1, x0:x1], gives a new BitLayer. A single row or column is a bool array.
+        """
+        ys, xs = key if isinstance(key, tuple) else (key, slice(None))
+        if isinstance(ys, slice) and isinstance(xs, slice):
+            return self._region(ys, xs)
+        if not isinstance(ys, slice) and not isinstance(xs, slice):
+            where, mask = self._bits_at(ys, xs)
+            bits = (self.packed[where] & mask) != 0
+            return bool(bits) if bits.ndim == 0 else bits
+        return np.unpackbits(self.packed[ys], axis=-1, count=self._width).view(bool)[..., xs]
+
+    def __setitem__(self, key, value) -> None:
+        """Sets tiles the same ways as they're read by layer[key]. Only the rows touched are unpacked."""
+        ys, xs = key if isinstance(key, tuple) else (key, slice(None))
+        if isinstance(value, BitLayer):
+            value = value.to_array()
+
+        if not isinstance(ys, slice) and not isinstance(xs, slice):
+            # ufunc.at writes through read-only arrays, so check for them here as plain assignment would
+            if not self.packed.flags.writeable:
+                raise ValueError("assignment destination is read-only")
+            where, mask = self._bits_at(ys, xs)
+            value = np.broadcast_to(np.asarray(value, dtype=bool), mask.shape)
+            ys, bytes_ = (np.broadcast_to(index, mask.shape) for index in where)
+            np.bitwise_or.at(self.packed, (ys[value], bytes_[value]), mask[value])
+            np.bitwise_and.at(self.packed, (ys[~value], bytes_[~value]), ~mask[~value])
+            return
+
+        rows = np.unpackbits(self.packed[ys], axis=-1, count=self._width).view(bool)
+        rows[..., xs] = value
+        self.packed[ys] = np.packbits(rows, axis=-1)
+
+    # Neighborhoods
+
+    def shifted(self, dx: int, dy: int) -> "BitLayer":
+        """The layer moved dx tiles toward higher x and dy toward higher y. Tiles moved off the edge are lost,
+        and those uncovered are False."""
+        # NumPy integers would promote the shifted bytes past uint8
+        dx, dy = int(dx), int(dy)
+        packed = _shift_rows(self.packed, dy)
+        if dx > 0:
+            packed = _shift_right(packed, dx)
+        elif dx < 0:
+            packed = _shift_left(packed, -dx)
+        return self._like(packed)
+
+    def _row_neighbors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Each tile's left and right neighbors, packed."""
+        left = _shift_right(self.packed, 1)
+        right = _shift_left(self.packed, 1)
+        return left, right
+
+    def dilate(self) -> "BitLayer":
+        """Every tile which is True or touches a True tile, diagonals included."""
+        left, right = self._row_neighbors()
+        across = left | self.packed | right
+        return self._like(across | _shift_rows(across, 1) | _shift_rows(across, -1))
+
+    def erode(self) -> "BitLayer":
+        """Every tile which is True along with all eight of its neighbors. Tiles past the edge count as False."""
+        eroded = ~(~self).dilate()
+        # Dilating the gaps can't see past the edge, so the border is cleared by hand
+        eroded[0, :] = False
+        eroded[-1, :] = False
+        eroded[:, 0] = False
+        eroded[:, -1] = False
+        return eroded
+
+    def neighbor_counts(self) -> np.ndarray:
+        """How many of each tile's eight neighbors are True, as a uint8 array. Tiles past the edge count as False.
+
+        The counts take a byte per tile anyway, so this unpacks once and sums the 3x3 box in two passes, across
+        then down, taking away each tile's own bit."""
+        height, width = self.shape
+        padded = np.zeros((height + 2, width + 2), dtype=np.uint8)
+        padded[1:-1, 1:-1] = np.unpackbits(self.packed, axis=1, count=width)
+        across = padded[:, :-2] + padded[:, 1:-1] + padded[:, 2:]
+        return across[:-2] + across[1:-1] + across[2:] - padded[1:-1, 1:-1]
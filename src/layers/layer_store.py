@@ -0,0 +1,133 @@
+import json
+import os
+import numpy as np
+
+from typing import Dict, List, Tuple, Union
+from .bit_layer import BitLayer
+
+Layer = Union[np.ndarray, BitLayer]
+
+
+class LayerStore:
+    """A directory of memory-mapped layers, one .npy file each, for levels too big to keep in memory.
+
+    Layers are mapped rather than read, so the OS pages in only the parts of them in use, such as the tiles around
+    the player, and drops them again under memory pressure. Writes to a mapped layer go straight to its file:
+    saving is a flush(), and loading a level is mapping its files again. A manifest beside them records which are
+    BitLayers, along with their widths."""
+    manifest_name = "layers.json"
+    suffix = ".npy"
+
+    def __init__(self, directory: str, readonly: bool = False):
+        """
+        :param directory: Where the layer files live. Created if it doesn't exist.
+        :param readonly: Whether to map layers read-only, so nothing can change the files
+        """
+        self.directory = directory
+        self.readonly = readonly
+        os.makedirs(directory, exist_ok=True)
+
+        manifest_path = os.path.join(directory, self.manifest_name)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r") as file:
+                self._manifest: Dict[str, Dict] = json.load(file)
+        else:
+            self._manifest = {}
+
+        # Every map opened through this store, by layer name, so flush() can reach them
+        self._maps: Dict[str, np.memmap] = {}
+
+    def _path(self, name: str) -> str:
+        if not name or os.sep in name or (os.altsep and os.altsep in name) or name.startswith("."):
+            raise ValueError("Layer names must be plain file names; got {}".format(str(name)))
+        return os.path.join(self.directory, name + self.suffix)
+
+    def _write_manifest(self) -> None:
+        # Write to a temporary file and move it into place, so a crash never leaves half a manifest behind
+        path = os.path.join(self.directory, self.manifest_name)
+        temporary = path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(self._manifest, file, sort_keys=True)
+        os.replace(temporary, path)
+
+    def _check_writable(self) -> None:
+        if self.readonly:
+            raise ValueError("This LayerStore is read-only")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._manifest
+
+    @property
+    def names(self) -> List[str]:
+        return sorted(self._manifest)
+
+    def shape(self, name: str) -> Tuple[int, ...]:
+        """The shape of a stored layer, in tiles. Only its header is read."""
+        if name not in self._manifest:
+            raise ValueError("No layer named {}".format(str(name)))
+        shape = np.lib.format.open_memmap(self._path(name), mode="r").shape
+        entry = self._manifest[name]
+        return (shape[0], entry["width"]) if entry["kind"] == "bits" else shape
+
+    def create(self, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.memmap:
+        """Makes a new zero-filled layer, replacing any of the same name, and maps it.
+
+        :return: The mapped array. Writes to it go to the file.
+        """
+        self._check_writable()
+        mapped = np.lib.format.open_memmap(self._path(name), mode="w+", dtype=dtype, shape=tuple(shape))
+        self._maps[name] = mapped
+        self._manifest[name] = {"kind": "array"}
+        self._write_manifest()
+        return mapped
+
+    def save(self, name: str, layer: Layer) -> Layer:
+        """Writes a layer out under name, replacing any of the same name.
+
+        :param layer: An array, or a BitLayer, which is stored packed
+        :return: The stored copy, mapped from its file: an np.memmap, or a BitLayer whose bits are one. A layer
+                 already mapped from that file comes back as it is.
+        """
+        source = layer.packed if isinstance(layer, BitLayer) else layer
+        if isinstance(source, np.memmap) and source.filename == os.path.abspath(self._path(name)):
+            return layer
+
+        if isinstance(layer, BitLayer):
+            mapped = self.create(name, layer.packed.shape, np.uint8)
+            mapped[:] = layer.packed
+            self._manifest[name] = {"kind": "bits", "width": layer.width}
+            self._write_manifest()
+            return BitLayer.wrap(mapped, layer.width)
+
+        layer = np.asarray(layer)
+        mapped = self.create(name, layer.shape, layer.dtype)
+        mapped[:] = layer
+        return mapped
+
+    def load(self, name: str) -> Layer:
+        """Maps a stored layer. Nothing is read until it's used.
+
+        :return: An np.memmap, or a BitLayer over one, as it was saved
+        """
+        if name not in self._manifest:
+            raise ValueError("No layer named {}".format(str(name)))
+        mapped = np.lib.format.open_memmap(self._path(name), mode="r" if self.readonly else "r+")
+        self._maps[name] = mapped
+
+        entry = self._manifest[name]
+        return BitLayer.wrap(mapped, entry["width"]) if entry["kind"] == "bits" else mapped
+
+    def remove(self, name: str) -> None:
+        self._check_writable()
+        if name not in self._manifest:
+            raise ValueError("No layer named {}".format(str(name)))
+        self._maps.pop(name, None)
+        del self._manifest[name]
+        self._write_manifest()
+        os.remove(self._path(name))
+
+    def flush(self) -> None:
+        """Writes every change made through this store's maps out to disk."""
+        for mapped in self._maps.values():
+            if mapped.mode != "r":
+                mapped.flush()
@@ -1,9 +1,10 @@
 from src.map_gen.room_generator import RoomGenerator
 from copy import deepcopy
-from typing import Tuple, List
+from typing import Optional, Tuple
 import numpy as np
-from math import floor, sqrt
-from random import random, sample, randint, choices
+from math import floor
+from src.map_generation.carving import CarvingEngine, DrunkArtist, CenterMindedArtist
+from src.map_generation.rng import fallback_rng
 from time import time_ns
 
 # In the words of Jaq: "oh boy here we go."
@@ -65,191 +66,28 @@ def decide_fate(x: int, y: int,
             return x, y, is_alive
 
 
-class DrunkArtist:
-    """Represents a wandering paint brush."""
-
-    def __init__(self, x0, y0,
-                 field: np.ndarray,
-                 brush: Tuple[Tuple[int, int]] = ((0, 0),),
-                 same_path_prob: float = 0):
-        # The field and this drunk's initial position on it.
-        self.x = x0
-        self.y = y0
-        self.field = field
-
-        # A tuple of dx, dy directions from x, y to paint when called upon.
-        self.brush = brush
-
-        # Last move and probability to prefer it to the exclusion of rolling
-        self.same_path_prob = same_path_prob
-        self.last_move = None
-
-        # Dimensions
-        self.height, self.width = field.shape
-
-    @property
-    def move_options(self):
-        opts = []
-        x_max, y_max = self.width - 1, self.height - 1
-
-        at_top_edge = self.y == 0
-        at_bottom_edge = self.y == y_max
-        at_left_edge = self.x == 0
-        at_right_edge = self.x == x_max
-
-        # Up move
-        if at_top_edge == 0:
-            opts.append((0, -1))
-
-        # Up right move
-        if not (at_top_edge or at_right_edge):
-            opts.append((1, -1))
-
-        # Right move
-        if not at_right_edge:
-            opts.append((1, 0))
-
-        # Down right move
-        if not (at_right_edge or at_bottom_edge):
-            opts.append((1, 1))
-
-        # Down move
-        if not at_bottom_edge:
-            opts.append((0, 1))
-
-        # Down left move
-        if not (at_left_edge or at_bottom_edge):
-            opts.append((-1, 1))
-
-        # Left move
-        if not at_left_edge:
-            opts.append((-1, 0))
-
-        # Up left move
-        if not (at_left_edge or at_top_edge):
-            opts.append((-1, -1))
-
-        return opts
-
-    @property
-    def valid_brushables(self):
-        """Returns a list of cells under this Drunkard's brush which are within the bounds of the field."""
-        x_max, y_max = self.width - 1, self.height - 1  # The index limits of the field
-        to_brush: List[Tuple[int, int]] = []  # A return value aggregator
-
-        # Iterate over each dx, dy combo in this Drunkard's brush
-        for dx, dy in self.brush:
-            # Determine if it's on a valid pair of indices
-            x_in_range = 0 <= self.x + dx <= x_max
-            y_in_range = 0 <= self.y + dy <= y_max
-
-            # If so, append it to the aggregator. Otherwise, fail silently.
-            if x_in_range and y_in_range:
-                to_brush.append((self.x + dx,
-                                 self.y + dy))
-
-        return to_brush
-
-    def apply_brush(self):
-        """Marks every valid tile under this Drunkard's brush as False, essentially carving out the map."""
-        for x, y in self.valid_brushables:
-            self.field[y, x] = False
-
-    def tick(self):
-        want_to_stick_with_path = random() <= self.same_path_prob
-        has_moved_at_least_once = self.last_move is not None
-        last_path_still_valid = self.last_move in self.move_options
-
-        if want_to_stick_with_path and has_moved_at_least_once and last_path_still_valid:
-            direction = self.last_move
-        else:
-            direction = sample(self.move_options, 1)[0]
-
-        dx, dy = direction
-        self.x += dx
-        self.y += dy
-
-        self.apply_brush()
-
-
-class CenterMindedArtist(DrunkArtist):
-    def __init__(self, x0: int, y0: int,
-                 field: np.ndarray,
-                 brush=(0, 0),
-                 same_path_prob=0,
-                 center_weight=0.55,
-                 not_center_weight=0.2):
-        super().__init__(x0=x0, y0=y0,
-                         field=field,
-                         brush=brush,
-                         same_path_prob=same_path_prob)
-
-        self.center_weight = center_weight
-        self.not_center_weight = not_center_weight
-
-    def tick(self):
-        want_to_stick_with_path = random() <= self.same_path_prob
-        has_moved_at_least_once = self.last_move is not None
-        last_path_still_valid = self.last_move in self.move_options
-
-        if want_to_stick_with_path and has_moved_at_least_once and last_path_still_valid:
-            direction = self.last_move
-        else:
-            # Move in a direction randomly chosen with preferential weight given to moving toward the center
-            center_x, center_y = self.width / 2 - 1, self.height / 2 - 1
-
-            def dist_to_center(x_, y_):
-                return sqrt((center_x - x_) ** 2 + (center_y - y_) ** 2)
-
-            # Calculate own distance to the center
-            own_dist_to_center = dist_to_center(self.x, self.y)
-            directions = self.move_options
-            destinations = [(self.x + dx,
-                             self.y + dy)
-                            for dx, dy in directions]
-
-            # Get which destinations are closer to the center, then use that to determine the weights
-            dest_closer_to_center = [dist_to_center(x_, y_) < own_dist_to_center
-                                     for x_, y_ in destinations]
-            weights = [self.center_weight if is_closer else self.not_center_weight
-                       for is_closer in dest_closer_to_center]
-
-            direction = choices(population=directions,
-                                weights=weights,
-                                k=1)[0]
-
-        dx, dy = direction
-        self.x += dx
-        self.y += dy
-
-        self.apply_brush()
-
-
 class VeryCenterMindedArtist(CenterMindedArtist):
-    def __init__(self, x0: int, y0: int,
-                 field,
-                 same_path_prob: float,
+    def __init__(self,
                  brush=((0, 0),),
+                 same_path_prob: float = 0,
                  center_weight=.85):
-        super().__init__(x0, y0, field, brush, same_path_prob, center_weight)
+        super().__init__(brush, same_path_prob, center_weight)
 
 
 class SlightlyCenterMindedArtist(CenterMindedArtist):
-    def __init__(self, x0: int, y0: int,
-                 field,
-                 same_path_prob: float,
+    def __init__(self,
                  brush=((0, 0),),
+                 same_path_prob: float = 0,
                  center_weight=.35):
-        super().__init__(x0, y0, field, brush, same_path_prob, center_weight)
+        super().__init__(brush, same_path_prob, center_weight)
 
 
 class VerySlightlyCenterMindedArtist(CenterMindedArtist):
-    def __init__(self, x0: int, y0: int,
-                 field,
-                 same_path_prob: float,
+    def __init__(self,
                  brush=((0, 0),),
+                 same_path_prob: float = 0,
                  center_weight=.3):
-        super().__init__(x0, y0, field, brush, same_path_prob, center_weight)
+        super().__init__(brush, same_path_prob, center_weight)
 
 
 class DrunkBrush(RoomGenerator):
@@ -262,7 +100,8 @@ class DrunkBrush(RoomGenerator):
                  drunk_add_prob: float = 0,  # Chance to spawn another drunk from a living one at each tick
                  drunk_die_prob: float = 0,  # Chance for a drunk to die each tick if it's not the last one alive
                  drunk_same_path_prob: float = 0,  # Chance for a drunk to use its last direction instead of rolling
-                 artist_class=DrunkArtist):  # The class from which to spawn this class's artist or artists
+                 artist_class=DrunkArtist,  # The class from which to spawn this class's artist or artists
+                 rng: Optional[np.random.Generator] = None):  # Source of randomness, e.g. an RngService stream
 
         # The initial state for a drunken walk should be a fully True field
         initial = np.full(shape=(height, width),
@@ -284,6 +123,7 @@ class DrunkBrush(RoomGenerator):
         self._same_path_prob = drunk_same_path_prob
 
         self.artist_class = artist_class
+        self.rng = rng if rng is not None else fallback_rng()
 
     @property
     def field_full_proportion(self) -> float:
@@ -327,42 +167,36 @@ class DrunkBrush(RoomGenerator):
             return self.bool_map
 
         else:
-            # Initialize our list of drunk artists with one situated at a random place on the map.
-            artists = [self.artist_class(x0=randint(floor(.45 * self.width),
-                                                    floor(.55 * self.width)),
-                                         y0=randint(floor(.45 * self.height),
-                                                    floor(.55 * self.height)),
-                                         field=self.field,
-                                         same_path_prob=self._same_path_prob,
-                                         brush=self.brush)]
+            # Start with one drunk artist situated at a random place near the middle of the map.
+            engine = CarvingEngine(self.field, carve_value=False, rng=self.rng)
+            kind = engine.add_kind(self.artist_class(brush=self.brush,
+                                                     same_path_prob=self._same_path_prob))
+            engine.spawn(kind,
+                         x=self.rng.integers(floor(.45 * self.width), floor(.55 * self.width), endpoint=True),
+                         y=self.rng.integers(floor(.45 * self.height), floor(.55 * self.height), endpoint=True))
 
             # Define a limit on how many ticks we'll run the drunks run
             tick_no = 0
             max_ticks = 10000
 
-            # Tick the artists until our finish condition is met or we hit the tick limit
-            while self.field_full_proportion > self._target_fullness and tick_no <= max_ticks:
+            # Tick the artists until our finish condition is met or we hit the tick limit.
+            # The engine keeps count of carved tiles, so checking fullness doesn't sum the field each tick.
+            while 1 - engine.carved_ratio > self._target_fullness and tick_no <= max_ticks:
+                kill_roll, spawn_roll, pick_roll = engine.random(3)
+
                 # Decide whether to kill an existing artist, if there's more than one.
-                if len(artists) > 1:
-                    # Make a random roll against the artist death probability
-                    should_kill_artist = random() <= self._die_prob
-
-                    # If we roll True, pick one at random and kill it
-                    if should_kill_artist:
-                        artists.remove(sample(artists, 1)[0])
-
-                # Decide whether to spawn a new artist
-                should_spawn_artist = random() <= self._add_prob
-                if should_spawn_artist:
-                    # If so, select one existing artist and spawn a new one on the same tile.
-                    parent = sample(artists, 1)[0]
-                    artists.append(self.artist_class(x0=parent.x,
-                                                     y0=parent.y,
-                                                     field=self.field,
-                                                     brush=self.brush,
-                                                     same_path_prob=self._same_path_prob))
+                if len(engine) > 1 and kill_roll <= self._die_prob:
+                    dies = np.zeros(len(engine), dtype=bool)
+                    dies[int(engine.random(1)[0] * len(engine))] = True
+                    engine.kill(dies)
+
+                # Decide whether to spawn a new artist on the same tile as an existing one
+                if spawn_roll <= self._add_prob:
+                    parent = int(pick_roll * len(engine))
+                    engine.spawn(kind, engine.x[parent], engine.y[parent])
+
                 # Tick artists
-                [a.tick() for a in artists]
+                engine.step()
 
                 # Increment tick counter to test against max_ticks
                 tick_no += 1
@@ -1,3 +1,6 @@
 from .cellulose import Cellulose
+from .level_cache import LevelCache, CachedMap
+from .rng import RngService
+from .pipeline import Pipeline, Stage
 
-__all__ = ["Cellulose"]
\ No newline at end of file
+__all__ = ["Cellulose", "LevelCache", "CachedMap", "RngService", "Pipeline", "Stage"]
\ No newline at end of file
@@ -0,0 +1,325 @@
+import numpy as np
+
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from src.map_generation.rng import fallback_rng
+
+Brush = Sequence[Tuple[int, int]]
+IntOrArray = Union[int, np.ndarray]
+
+BRUSH_2x2 = ((0, 0), (0, 1), (1, 0), (1, 1))
+BRUSH_4x4 = [position for position, value in np.ndenumerate(np.full(shape=(4, 4), fill_value=False))]
+BRUSH_ROUNDED_4x4 = [pos for pos in BRUSH_4x4
+                     if pos not in [(0, 0), (0, 3), (3, 0), (3, 3)]]
+
+BRUSH_5x5 = [position for position, val in
+             np.ndenumerate(np.full(shape=(5, 5), fill_value=False))]  # Hacky as frick tho, lmao
+BRUSH_ROUNDED_5x5 = [pos for pos in BRUSH_5x5
+                     if pos not in [(0, 0), (0, 1), (1, 0),
+                                    (4, 0), (3, 0), (4, 1),
+                                    (4, 4), (4, 3), (3, 4),
+                                    (0, 4), (0, 3), (1, 4)]]
+BRUSH_PLUS = [(0, 0,), (-1, 0), (0, -1), (1, 0), (0, 1)]
+
+# The eight (dx, dy) steps an artist can take, clockwise from straight up.
+DIRECTIONS = np.array([(0, -1), (1, -1), (1, 0), (1, 1),
+                       (0, 1), (-1, 1), (-1, 0), (-1, -1)], dtype=np.intp)
+
+
+class DrunkArtist:
+    """Describes a kind of wandering paint brush: the brush it paints with and how it picks its steps.
+    Where each artist is lives in a CarvingEngine, which moves every artist of every kind at once.
+
+    A plain DrunkArtist steps in any direction that stays on the field with equal odds."""
+    def __init__(self,
+                 brush: Brush = BRUSH_2x2,
+                 same_path_prob: float = 0):
+        """
+        :param brush: (dx, dy) offsets from the artist's position to paint after each step
+        :param same_path_prob: Chance to repeat the last step, if it's still possible, instead of rolling a new one
+        """
+        self.brush = np.array(brush, dtype=np.intp).reshape(-1, 2)
+        self.same_path_prob = same_path_prob
+
+        # Relative odds of steps toward and away from the artist's target. Unbiased kinds weigh them equally.
+        self.toward_weight = 1.0
+        self.away_weight = 1.0
+
+    @property
+    def biased(self) -> bool:
+        """Whether this kind of artist prefers steps toward a target point."""
+        return False
+
+    def default_target(self, field_shape: Tuple[int, int]) -> Optional[Tuple[float, float]]:
+        """The (x, y) point artists of this kind head toward when spawned without one, given the field's shape."""
+        return None
+
+
+class CenterMindedArtist(DrunkArtist):
+    """Prefers steps which bring it closer to the center of the field."""
+    def __init__(self,
+                 brush: Brush = BRUSH_2x2,
+                 same_path_prob: float = 0,
+                 center_weight: float = 0.55,
+                 not_center_weight: float = 0.2):
+        """
+        :param center_weight: Relative odds of each step which brings the artist closer to its target
+        :param not_center_weight: Relative odds of each step which doesn't
+        """
+        super().__init__(brush=brush,
+                         same_path_prob=same_path_prob)
+        self.toward_weight = center_weight
+        self.away_weight = not_center_weight
+
+    @property
+    def biased(self) -> bool:
+        return True
+
+    def default_target(self, field_shape: Tuple[int, int]) -> Optional[Tuple[float, float]]:
+        height, width = field_shape
+        return width / 2 - 1, height / 2 - 1
+
+
+class CentroidMindedArtist(CenterMindedArtist):
+    """Prefers steps toward its own centroid, which must be given when it's spawned."""
+    def default_target(self, field_shape: Tuple[int, int]) -> Optional[Tuple[float, float]]:
+        return None
+
+
+class CarvingEngine:
+    """Runs any number of drunk-walk artists over a boolean field at once.
+
+    Every artist's position, kind, target and last step are held in NumPy arrays. Each .step() rolls all of
+    their directions from one batch of random numbers, weighs steps by whether they bring each artist closer to
+    its target, then stamps every brush with array indexing. A running count of carved tiles makes checking
+    progress against a target openness free."""
+    def __init__(self,
+                 field: np.ndarray,
+                 carve_value: bool = True,
+                 rng: Optional[np.random.Generator] = None,
+                 random_block: int = 65536):
+        """
+        :param field: The 2D boolean array to paint, in [y][x] order. Painted in place.
+        :param carve_value: The value artists paint onto the field
+        :param rng: Source of randomness. Defaults to one seeded from the random module, so seeding that
+                    still makes generation repeatable.
+        :param random_block: How many random numbers to draw from rng at a time
+        """
+        self.field = field
+        self.carve_value = carve_value
+        self._rng = rng if rng is not None else fallback_rng()
+        self._random_block = random_block
+        self._random = np.empty(0)
+        self._random_at = 0
+
+        self._carved = int(np.count_nonzero(field == carve_value))
+
+        self._kinds: List[DrunkArtist] = []
+        self._kind_ids: Dict[int, int] = {}  # id() of a registered kind to its index
+
+        # Target points, as arrays of their x and y by index. Distances to them are worked out only for the eight
+        # steps each artist could take, so a target costs nothing per tile however big the field is.
+        self._target_ids: Dict[Tuple[float, float], int] = {}
+        self._target_x = np.empty(0, dtype=np.float64)
+        self._target_y = np.empty(0, dtype=np.float64)
+
+        # Per-artist state
+        self._x = np.empty(0, dtype=np.intp)
+        self._y = np.empty(0, dtype=np.intp)
+        self._kind = np.empty(0, dtype=np.intp)
+        self._target = np.empty(0, dtype=np.intp)  # -1 for artists without one
+        self._last = np.empty(0, dtype=np.intp)    # Index into DIRECTIONS, or -1 before an artist's first step
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """The (height, width) of the field."""
+        return self.field.shape
+
+    @property
+    def carved(self) -> int:
+        """How many tiles of the field hold the carve value."""
+        return self._carved
+
+    @property
+    def carved_ratio(self) -> float:
+        return self._carved / self.field.size
+
+    @property
+    def x(self) -> np.ndarray:
+        return self._x
+
+    @property
+    def y(self) -> np.ndarray:
+        return self._y
+
+    @property
+    def kinds(self) -> np.ndarray:
+        """The index of each artist's kind, as returned by .add_kind()."""
+        return self._kind
+
+    def __len__(self) -> int:
+        return len(self._x)
+
+    def random(self, n: int) -> np.ndarray:
+        """Returns n uniform floats in [0, 1), sliced from a block drawn in advance."""
+        if self._random_at + n > len(self._random):
+            self._random = self._rng.random(max(self._random_block, n))
+            self._random_at = 0
+
+        out = self._random[self._random_at:self._random_at + n]
+        self._random_at += n
+        return out
+
+    def add_kind(self, kind: DrunkArtist) -> int:
+        """Registers a kind of artist and returns the index to spawn it by. Registering one twice is harmless."""
+        if id(kind) not in self._kind_ids:
+            self._kind_ids[id(kind)] = len(self._kinds)
+            self._kinds.append(kind)
+
+            # Refresh the per-kind lookup tables used by .step()
+            self._same_path = np.array([k.same_path_prob for k in self._kinds])
+            self._toward = np.array([k.toward_weight for k in self._kinds])
+            self._away = np.array([k.away_weight for k in self._kinds])
+
+        return self._kind_ids[id(kind)]
+
+    def add_target(self, point: Tuple[float, float]) -> int:
+        """Registers an (x, y) point artists can head toward, and returns its index."""
+        return int(self.add_targets([point])[0])
+
+    def add_targets(self, points: Sequence[Tuple[float, float]]) -> np.ndarray:
+        """Registers many (x, y) points at once, such as one per centroid, and returns their indices.
+        A point already registered keeps its index."""
+        ids = np.empty(len(points), dtype=np.intp)
+        new = []
+        for i, (x, y) in enumerate(points):
+            point = (float(x), float(y))
+            if point not in self._target_ids:
+                self._target_ids[point] = len(self._target_x) + len(new)
+                new.append(point)
+            ids[i] = self._target_ids[point]
+
+        if new:
+            new = np.array(new, dtype=np.float64)
+            self._target_x = np.concatenate((self._target_x, new[:, 0]))
+            self._target_y = np.concatenate((self._target_y, new[:, 1]))
+        return ids
+
+    def spawn(self, kind: int, x: IntOrArray, y: IntOrArray, target: Optional[IntOrArray] = None) -> None:
+        """Adds artists of a kind at the given positions. Each paints its brush where it stands right away.
+
+        :param kind: An index returned by .add_kind()
+        :param x, y: A position, or arrays of positions for several artists
+        :param target: Index or indices from .add_target(). Defaults to the kind's default target, if it has one.
+        """
+        x = np.atleast_1d(np.asarray(x, dtype=np.intp))
+        y = np.atleast_1d(np.asarray(y, dtype=np.intp))
+        if target is None:
+            point = self._kinds[kind].default_target(self.field.shape)
+            target = self.add_target(point) if point is not None else -1
+        target = np.broadcast_to(np.asarray(target, dtype=np.intp), x.shape)
+
+        self._x = np.concatenate((self._x, x))
+        self._y = np.concatenate((self._y, y))
+        self._kind = np.concatenate((self._kind, np.full(x.shape, kind, dtype=np.intp)))
+        self._target = np.concatenate((self._target, target))
+        self._last = np.concatenate((self._last, np.full(x.shape, -1, dtype=np.intp)))
+
+        self._stamp(x, y, np.full(x.shape, kind, dtype=np.intp))
+
+    def kill(self, mask: np.ndarray, keep_one_of: Sequence[np.ndarray] = ()) -> None:
+        """Removes every artist for which mask is True.
+
+        :param keep_one_of: Masks of groups of artists. If every artist in a group would die, the first is spared.
+        """
+        mask = mask.copy()
+        for group in keep_one_of:
+            members = np.nonzero(group)[0]
+            if len(members) and mask[members].all():
+                mask[members[0]] = False
+
+        keep = ~mask
+        self._x = self._x[keep]
+        self._y = self._y[keep]
+        self._kind = self._kind[keep]
+        self._target = self._target[keep]
+        self._last = self._last[keep]
+
+    def of_kinds(self, *kinds: int) -> np.ndarray:
+        """Returns a mask of the artists belonging to any of the given kinds."""
+        return np.isin(self._kind, kinds)
+
+    def step(self) -> None:
+        """Moves every artist one tile, then paints their brushes."""
+        n = len(self._x)
+        if n == 0:
+            return
+        height, width = self.field.shape
+
+        # Every artist's eight candidate destinations, and which of them are on the field
+        nx = self._x[:, np.newaxis] + DIRECTIONS[:, 0]
+        ny = self._y[:, np.newaxis] + DIRECTIONS[:, 1]
+        valid = (0 <= nx) & (nx < width) & (0 <= ny) & (ny < height)
+        weights = valid.astype(np.float64)
+
+        # Artists with a target weigh steps by whether they get closer to it
+        biased = np.nonzero(self._target >= 0)[0]
+        if len(biased):
+            t = self._target[biased]
+            tx, ty = self._target_x[t], self._target_y[t]
+            here = (self._x[biased] - tx) ** 2 + (self._y[biased] - ty) ** 2
+            there = (nx[biased] - tx[:, np.newaxis]) ** 2 + (ny[biased] - ty[:, np.newaxis]) ** 2
+            kinds = self._kind[biased]
+            weights[biased] = np.where(there < here[:, np.newaxis],
+                                       self._toward[kinds][:, np.newaxis],
+                                       self._away[kinds][:, np.newaxis]) * valid[biased]
+
+            # If an artist's kind gives no weight to any step it can take, let it wander instead
+            stuck = ~weights.any(axis=1)
+            weights[stuck] = valid[stuck]
+
+        # Roll a weighted direction for each artist. Those with no step to take at all, as on a 1x1 field, stay put.
+        rolls = self.random(2 * n)
+        cumulative = np.cumsum(weights, axis=1)
+        total = cumulative[:, -1]
+        choice = np.count_nonzero(cumulative <= (rolls[:n] * total)[:, np.newaxis], axis=1)
+        choice[total == 0] = -1
+
+        # Some artists stick to their last step instead, if it's still on the field
+        stick = (rolls[n:] < self._same_path[self._kind]) & (self._last >= 0)
+        sticking = np.nonzero(stick)[0]
+        stick[sticking] = valid[sticking, self._last[sticking]]
+        choice = np.where(stick, self._last, choice)
+
+        self._last = choice
+        moved = choice >= 0
+        self._x = self._x + np.where(moved, DIRECTIONS[choice, 0], 0)
+        self._y = self._y + np.where(moved, DIRECTIONS[choice, 1], 0)
+
+        self._stamp(self._x, self._y, self._kind)
+
+    def run(self, target_ratio: float, max_steps: int) -> int:
+        """Steps until the carved ratio reaches target_ratio or max_steps have run. Returns the steps taken."""
+        steps = 0
+        while steps < max_steps and self.carved_ratio < target_ratio:
+            self.step()
+            steps += 1
+        return steps
+
+    def _stamp(self, x: np.ndarray, y: np.ndarray, kinds: np.ndarray) -> None:
+        """Paints each artist's brush at its position, clipped to the field, and updates the carved count."""
+        height, width = self.field.shape
+        cells = []
+        for k in np.unique(kinds):
+            brush = self._kinds[k].brush
+            selected = kinds == k
+            xs = (x[selected][:, np.newaxis] + brush[:, 0]).ravel()
+            ys = (y[selected][:, np.newaxis] + brush[:, 1]).ravel()
+            on_field = (0 <= xs) & (xs < width) & (0 <= ys) & (ys < height)
+            cells.append(ys[on_field] * width + xs[on_field])
+
+        # Deduplicate so overlapping brushes aren't counted twice
+        flat = np.unique(np.concatenate(cells)) if cells else np.empty(0, dtype=np.intp)
+        ys, xs = np.divmod(flat, width)
+        fresh = self.field[ys, xs] != self.carve_value
+        self._carved += int(np.count_nonzero(fresh))
+        self.field[ys[fresh], xs[fresh]] = self.carve_value
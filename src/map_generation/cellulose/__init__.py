@@ -1,4 +1,4 @@
-from .cellulose_ import Cellulose
+from .cellulose_ import Cellulose, composite, UNION, SUBTRACT, OVERWRITE, BLEND_MODES
 from .room import RoomCellulose
 
-__all__ = ["Cellulose", "RoomCellulose"]
\ No newline at end of file
+__all__ = ["Cellulose", "RoomCellulose", "composite", "UNION", "SUBTRACT", "OVERWRITE", "BLEND_MODES"]
\ No newline at end of file
@@ -3,6 +3,41 @@ from typing import List, Tuple
 from math import floor
 from uuid import uuid4
 
+# Blend modes for compositing one field onto another
+UNION = "union"          # Tiles True in either field become True
+SUBTRACT = "subtract"    # Tiles True in the source become False
+OVERWRITE = "overwrite"  # The source replaces the target outright
+BLEND_MODES = (UNION, SUBTRACT, OVERWRITE)
+
+
+def composite(src: np.ndarray, tgt: np.ndarray, x0: int, y0: int, mode: str = UNION) -> None:
+    """Mutates tgt by blending src onto it with src's top-left corner at x0, y0 on tgt.
+
+    Whatever part of src falls outside tgt is clipped, so x0 and y0 may be negative or run past tgt's edges.
+
+    :param mode: One of UNION, SUBTRACT or OVERWRITE
+    """
+    if mode not in BLEND_MODES:
+        raise ValueError("mode must be one of {}; got {}".format(str(BLEND_MODES), str(mode)))
+
+    src_height, src_width = src.shape
+    tgt_height, tgt_width = tgt.shape
+
+    # The overlapping window, in tgt's coordinates
+    left, top = max(x0, 0), max(y0, 0)
+    right, bottom = min(x0 + src_width, tgt_width), min(y0 + src_height, tgt_height)
+    if left >= right or top >= bottom:
+        return
+
+    window = tgt[top:bottom, left:right]
+    source = src[top - y0:bottom - y0, left - x0:right - x0]
+    if mode == UNION:
+        window |= source
+    elif mode == SUBTRACT:
+        window &= ~source
+    else:
+        window[...] = source
+
 
 class Cellulose:
     def _generate(self):
@@ -12,9 +47,6 @@ class Cellulose:
     def __init__(self,
                  width: int,
                  height: int):
-        if not (width % 15 == 0) and (height % 15 == 0):
-            raise ValueError("Width and height must be multiples of 15 cells!")
-
         self.width = width
         self.height = height
         self.field = np.full(shape=(height, width),
@@ -25,15 +57,6 @@ class Cellulose:
         self.grid_shape = (floor(self.width / 15),
                            floor(self.height / 15))
 
-    def apply_to(self, x0: int, y0: int, tgt: np.ndarray) -> None:
-        """Mutates tgt to True for every True in self.field, offsetting by x0, y0."""
-        for position, truth in np.ndenumerate(self.field):
-            if truth:
-                dy, dx = position
-                tgt[x0+dy, x0+dx] = truth
-        # print([truth for position, truth in np.ndenumerate(self.field) if truth])
-        # for y in range(0, self.height):
-        #     for x in range(0, self.width):
-        #         if self.field[y, x] is True:
-        #             print("A cell was true and thus applied.")
-        #             tgt[y + y0, x + x0] = True
+    def apply_to(self, x0: int, y0: int, tgt: np.ndarray, mode: str = UNION) -> None:
+        """Composites self.field onto tgt with its top-left corner at x0, y0. See composite()."""
+        composite(self.field, tgt, x0, y0, mode)
@@ -1,53 +1,137 @@
 import numpy as np
-import random as rand
 
-from math import sin, cos
-from typing import Tuple
-from src.map_generation.cellulose import Cellulose
+from typing import Optional, Tuple
+from src.map_generation.cellulose import Cellulose, composite, UNION
+from src.map_generation.rng import fallback_rng
 
+Path = Tuple[np.ndarray, np.ndarray]
 
-class HallwayCellulose(Cellulose):
-    def _generate(self):
-        def paint(x, y):
-            x_range = [x_ for x_ in range(x, x + self.brush_size)
-                       if 0 <= x + self.brush_size < self.width - self.brush_size]
-            y_range = [y_ for y_ in range(y, y + self.brush_size)
-                       if 0 <= y + self.brush_size < self.height - self.brush_size]
-            for x_ in x_range:
-                for y_ in y_range:
-                    self.field[y_, x_] = True
+# Hallway shapes
+L_SHAPED = "l_shaped"    # Straight across, then straight down or up
+MONOTONE = "monotone"    # A random staircase which never steps away from the destination
+BRESENHAM = "bresenham"  # As straight a line as the grid allows
+STYLES = (L_SHAPED, MONOTONE, BRESENHAM)
+
+
+def _sign(n: int) -> int:
+    return int(n > 0) - int(n < 0)
+
+
+def l_path(origin: Tuple[int, int], destination: Tuple[int, int], horizontal_first: bool = True) -> Path:
+    """Returns (xs, ys) of every tile on an L-shaped path from origin to destination, both included."""
+    (x0, y0), (x1, y1) = origin, destination
+    step_x, step_y = _sign(x1 - x0) or 1, _sign(y1 - y0) or 1
+    across = np.arange(x0, x1 + step_x, step_x)
+    down = np.arange(y0, y1 + step_y, step_y)
+
+    if horizontal_first:
+        xs = np.concatenate((across, np.full(len(down) - 1, x1)))
+        ys = np.concatenate((np.full(len(across), y0), down[1:]))
+    else:
+        xs = np.concatenate((np.full(len(down), x0), across[1:]))
+        ys = np.concatenate((down, np.full(len(across) - 1, y1)))
+    return xs, ys
+
+
+def monotone_path(origin: Tuple[int, int], destination: Tuple[int, int], rng: np.random.Generator) -> Path:
+    """Returns (xs, ys) of a random path from origin to destination made of orthogonal steps, every one of which
+    brings it closer to the destination. Every such path is equally likely."""
+    (x0, y0), (x1, y1) = origin, destination
+    dx, dy = x1 - x0, y1 - y0
+
+    # Shuffle the horizontal and vertical steps together, then add them up
+    sideways = rng.permutation(np.concatenate((np.ones(abs(dx), dtype=bool), np.zeros(abs(dy), dtype=bool))))
+    xs = x0 + _sign(dx) * np.concatenate(([0], np.cumsum(sideways)))
+    ys = y0 + _sign(dy) * np.concatenate(([0], np.cumsum(~sideways)))
+    return xs, ys
 
-        cursor = [param for param in self.origin]
-        while cursor != self.destination:
-            paint(cursor[0], cursor[1])
 
-            dx, dy = self.destination[0] - cursor[0], self.destination[1] - cursor[1]
+def bresenham_path(origin: Tuple[int, int], destination: Tuple[int, int]) -> Path:
+    """Returns (xs, ys) of the straightest 8-connected line from origin to destination, one tile per step along
+    its longer axis."""
+    (x0, y0), (x1, y1) = origin, destination
+    steps = max(abs(x1 - x0), abs(y1 - y0))
+    if steps == 0:
+        return np.array([x0]), np.array([y0])
 
-            can_go_sideways = False if dx == 0 else True
-            go_sideways = rand.random() < 0.5 if can_go_sideways else False
+    t = np.arange(steps + 1)
+    xs = x0 + np.floor((x1 - x0) * t / steps + .5).astype(np.intp)
+    ys = y0 + np.floor((y1 - y0) * t / steps + .5).astype(np.intp)
+    return xs, ys
 
-            if go_sideways:
-                delta = 1 if dx > 0 else -1
-                cursor = (cursor[0] + delta,
-                          cursor[1])
-            else:
-                delta = 1 if dy > 0 else -1
-                cursor = (cursor[0],
-                          cursor[1] + delta)
 
+def dilate(xs: np.ndarray, ys: np.ndarray, brush_size: int) -> Tuple[int, int, np.ndarray]:
+    """Stamps a square brush_size brush with its top-left corner on each tile of a path.
 
+    :return: (x0, y0, mask), where mask is the bounding box of the stamped tiles and x0, y0 is its top-left corner
+    """
+    x0, y0 = int(xs.min()), int(ys.min())
+    height, width = int(ys.max()) - y0 + 1, int(xs.max()) - x0 + 1
+    path = np.zeros((height, width), dtype=bool)
+    path[ys - y0, xs - x0] = True
 
+    # OR the path over itself once per brush offset
+    mask = np.zeros((height + brush_size - 1, width + brush_size - 1), dtype=bool)
+    for dy in range(brush_size):
+        for dx in range(brush_size):
+            mask[dy:dy + height, dx:dx + width] |= path
+    return x0, y0, mask
+
+
+class HallwayCellulose(Cellulose):
+    """A corridor between two tiles, in map coordinates.
+
+    The whole path is computed at once as index arrays, then stamped and dilated by the brush in one pass over
+    the corridor's bounding box. .field holds that box, placed on the map at .x0, .y0, and .carve_into() writes
+    it straight into a map-sized mask."""
     def __init__(self,
                  origin: Tuple[int, int],
                  destination: Tuple[int, int],
-                 brush_size: int = 2):
-        min_x, max_x = min([origin[0], destination[0]]), max([origin[0], destination[0]])
-        min_y, max_y = min([origin[1], destination[1]]), max([origin[1], destination[1]])
+                 brush_size: int = 2,
+                 style: str = MONOTONE,
+                 rng: Optional[np.random.Generator] = None):
+        """
+        :param origin: The (x, y) tile on the map to start from
+        :param destination: The (x, y) tile on the map to finish at
+        :param brush_size: The width of the corridor. Its brush extends right and down from each path tile.
+        :param style: One of L_SHAPED, MONOTONE or BRESENHAM
+        :param rng: Source of randomness for monotone paths and which way L-shaped ones turn
+        """
+        if style not in STYLES:
+            raise ValueError("style must be one of {}; got {}".format(str(STYLES), str(style)))
+
+        self.origin = (int(origin[0]), int(origin[1]))
+        self.destination = (int(destination[0]), int(destination[1]))
+        self.brush_size = brush_size
+        self.style = style
+        rng = rng if rng is not None else fallback_rng()
+
+        if style == L_SHAPED:
+            path = l_path(self.origin, self.destination, horizontal_first=bool(rng.integers(0, 2)))
+        elif style == MONOTONE:
+            path = monotone_path(self.origin, self.destination, rng)
+        else:
+            path = bresenham_path(self.origin, self.destination)
+
+        self.x0, self.y0, field = dilate(*path, brush_size)
+        super().__init__(width=field.shape[1],
+                         height=field.shape[0])
+        self.field = field
+
+    @property
+    def xs(self) -> np.ndarray:
+        """The x of every tile of the corridor, in map coordinates."""
+        return np.nonzero(self.field)[1] + self.x0
+
+    @property
+    def ys(self) -> np.ndarray:
+        """The y of every tile of the corridor, in map coordinates."""
+        return np.nonzero(self.field)[0] + self.y0
 
-        width, height = max_x - min_x, max_y - min_y
-        super().__init__(width=width,
-                         height=height)
+    def apply_to(self, x0: int, y0: int, tgt: np.ndarray, mode: str = UNION) -> None:
+        """Composites the corridor onto tgt, treating x0, y0 as where tgt's map origin sits."""
+        composite(self.field, tgt, x0 + self.x0, y0 + self.y0, mode)
 
-        self.origin = origin
-        self.destination = destination
-        self.brush_size = brush_size
\ No newline at end of file
+    def carve_into(self, mask: np.ndarray) -> None:
+        """Marks the corridor's tiles True on a map-sized mask, dropping any which fall off it."""
+        composite(self.field, mask, self.x0, self.y0, UNION)
@@ -1,57 +1,7 @@
 from src.map_generation.cellulose import Cellulose
-from typing import List, Tuple, Dict
-from math import floor, sqrt
-from random import choice
+from src.map_generation.doors import DoorPlacer
+from typing import List, Optional, Tuple, Dict
 import numpy as np
-import multiprocessing as mp
-
-
-def _euclidean_dist_from_origin(origin: Tuple[int, int],
-                                dest: Tuple[int, int]) -> Tuple[Tuple[int, int], float]:
-    x0, y0 = origin
-    x1, y1 = dest
-
-    dx = x1 - x0
-    dy = y1 - y0
-
-    return origin, sqrt(dx ** 2 + dy ** 2)
-
-
-def _manhattan_dist_from_origin(origin: Tuple[int, int],
-                                dest: Tuple[int, int]) -> Tuple[Tuple[int, int], int]:
-    return origin, abs(dest[0] - origin[0]) + abs(dest[1] - origin[1])
-
-
-def _closest_point_to(x_pt: int, y_pt: int, field: np.ndarray) -> Tuple[int, int]:
-    field_height, field_width = field.shape
-    pts = []
-
-    # Pts is an argument list for parallelized operation _euclidean_dist_from_origin,
-    # which includes pt as the origin and all x, y combos in the same block which
-    # aren't outside the range of the map.
-    for x in [x for x in range(x_pt - 3, x_pt + 4)
-              if 0 <= x <= field_width]:
-        for y in [y for y in range(y_pt - 3, y_pt + 4)
-                  if 0 <= y <= field_width]:
-            pts.append(((x_pt, y_pt),
-                        (x, y)))
-
-    # Spin up a pool and calculate the euclidean distance from
-    # each point in the cell to the specified edge point.
-    pool = mp.Pool(mp.cpu_count())
-    points_and_dists = pool.starmap(func=_manhattan_dist_from_origin,
-                                    iterable=pts)
-    pool.close()
-
-    # Calculate the distances and return the corresponding point.
-    # If two points tie, the nature of sequence.index means that
-    # it'll be left/top biased since it pulls the first match.
-    distances = [dist for point, dist in points_and_dists]
-    shortest_distance = min(distances)
-    closest_index = distances.index(shortest_distance)
-    closest_point = [point for point, dist in points_and_dists][closest_index]
-
-    return closest_point
 
 
 def find_door_pt(field: np.ndarray,
@@ -62,63 +12,11 @@ def find_door_pt(field: np.ndarray,
 
     :param field: A boolean passability matrix representing a RoomCellophane's .field
     :param mid_pt: Where, on the relevant axis, to treat as the center for purposes of deciding where to draw the door.
-    :param side: One of: 'top', 'middle', 'left', 'bottom'.
+    :param side: One of: 'top', 'left', 'bottom', 'right'.
 
     :return: An (x, y) tuple; a tile on this room's cellophane to declare as a door point for the specified side.
     """
-    assert (side in ('top', 'left', 'bottom', 'right'))
-    field_height, field_width = field.shape
-
-    if side == 'top':
-        # Pick a column, and scan down from y=0 until we find a cell just before a passable one.
-        col_range = [val for val in range(-2, 3)
-                     if 0 <= val + mid_pt < field_width]
-        door_x = mid_pt + choice(col_range)
-
-        # Get the first index from the top in which this column is true
-        first_empty_y = np.where(field[:, door_x] is True)[0]
-
-        # The y for the door will be 1 tile before that.
-        door_y = first_empty_y - 1 if 0 < first_empty_y else 0
-        return door_x, door_y
-
-    elif side == 'left':
-        # Pick a row, and scan right from x=0 until we find a cell just before a passable one.
-        row_range = [val for val in range(-2, 3)
-                     if 0 <= val + mid_pt <= field_height]
-        door_y = mid_pt + choice(row_range)
-
-        # Get the first index from the left in which this row is true
-        first_empty_x = np.where(field[door_y, :] is True)[0]
-
-        # The x for the door will be 1 tile before that.
-        door_x = first_empty_x - 1 if 0 < first_empty_x else 0
-        return door_x, door_y
-
-    elif side == 'right':
-        # Pick a row, and scan left from -1 until we find a passable cell.
-        row_range = [val for val in range(-2, 3)
-                     if val + mid_pt < field_height]
-        door_y = mid_pt + choice(row_range)
-
-        last_empty_x = np.where(field[door_y, :] is True)[-1]
-
-        door_x = last_empty_x + 1 if last_empty_x < field_width - 1 else field_width - 1
-        return door_x, door_y
-
-    elif side == 'bottom':
-        # Pick a column, and scan up from -1 until we find a passable cell.
-        col_range = [val for val in range(-2, 3)
-                     if val + mid_pt < field_width]
-        door_x = mid_pt + choice(col_range)
-
-        last_empty_y = np.where(field[:, door_x] is True)[-1]
-
-        door_y = last_empty_y + 1 if last_empty_y < field_height - 1 else field_height - 1
-        return door_x, door_y
-
-    else:
-        raise ValueError("No side specified.")
+    return DoorPlacer(field).best_door(side, mid_pt)
 
 
 class RoomCellulose(Cellulose):
@@ -132,7 +30,8 @@ class RoomCellulose(Cellulose):
 
         :param grid_width: Room arrangement grid width
         :param grid_height: Room arrangement grid height
-        :param generator: The MapGenerator or subclass which intends to use this cello. Must have a .grid.
+        :param generator: The MapGenerator or subclass which intends to use this cello. Must have a .grid
+                          and a .register_room().
         """
         super().__init__(width=15 * grid_width,
                          height=15 * grid_height)
@@ -145,11 +44,19 @@ class RoomCellulose(Cellulose):
         self.generator = generator
         self.grid: np.ndarray = generator.grid
 
-        # Append this RoomCellulose's UUID to all grid cells it occupies
-        self.grid[grid_y0:grid_y0 + grid_height,
-        grid_x0:grid_x0 + grid_width] = self.uuid
-        # Append this RoomCellulose itself to the generator's list of rooms
-        self.generator.rooms.append(self)
+        # Whether this room is planned on the grid but its field is still waiting to be generated
+        self.pending = False
+        self._door_placer: Optional[DoorPlacer] = None
+
+        # Mark the grid cells this room occupies with its id, and add it to the generator's list of rooms
+        self.room_id: int = self.generator.register_room(self)
+
+    @property
+    def door_placer(self) -> DoorPlacer:
+        """A DoorPlacer for this room's field, rebuilt only when the field is replaced."""
+        if self._door_placer is None or self._door_placer.field is not self.field:
+            self._door_placer = DoorPlacer(self.field)
+        return self._door_placer
 
     @property
     def door_points(self) -> List[Dict]:
@@ -197,9 +104,8 @@ class RoomCellulose(Cellulose):
                     doors.append({
                         "origin": c,
                         "destination": n,
-                        "door_pt": find_door_pt(self.field,
-                                                mid_pt=mid_pt,
-                                                side="top")
+                        "door_pt": self.door_placer.best_door(mid_pt=mid_pt,
+                                                              side="top")
                     })
 
                 # If it's a bottom-side neighbor
@@ -209,9 +115,8 @@ class RoomCellulose(Cellulose):
                     doors.append({
                         "origin": c,
                         "destination": n,
-                        "door_pt": find_door_pt(self.field,
-                                                mid_pt=mid_pt,
-                                                side="bottom")
+                        "door_pt": self.door_placer.best_door(mid_pt=mid_pt,
+                                                              side="bottom")
                     })
 
                 # If it's a left-side neighbor
@@ -221,9 +126,8 @@ class RoomCellulose(Cellulose):
                     doors.append({
                         "origin": c,
                         "destination": n,
-                        "door_pt": find_door_pt(self.field,
-                                                mid_pt=mid_pt,
-                                                side="left")
+                        "door_pt": self.door_placer.best_door(mid_pt=mid_pt,
+                                                              side="left")
                     })
 
                 # If it's a right-side cell
@@ -233,9 +137,8 @@ class RoomCellulose(Cellulose):
                     doors.append({
                         "origin": c,
                         "destination": n,
-                        "door_pt": find_door_pt(self.field,
-                                                mid_pt=mid_pt,
-                                                side="right")
+                        "door_pt": self.door_placer.best_door(mid_pt=mid_pt,
+                                                              side="right")
                     })
 
                 # If the logic above somehow doesn't catch it
@@ -0,0 +1,192 @@
+import numpy as np
+
+from typing import Dict, Optional, Tuple
+from src.map_generation.doors import distance_transform
+from src.map_generation.cellulose.hallway import HallwayCellulose, L_SHAPED
+from src.map_generation.rng import fallback_rng
+
+# Ways to repair a field with unreachable pockets
+PRUNE = "prune"      # Fill them in
+CONNECT = "connect"  # Carve corridors out to them
+REPAIRS = (PRUNE, CONNECT)
+
+
+def label_components(passable: np.ndarray, diagonal: bool = True) -> Tuple[np.ndarray, int]:
+    """Labels the connected regions of passable tiles.
+
+    This is union-find done a whole array at a time, over horizontal runs of passable tiles rather than single
+    tiles. Each round, every edge between runs in different trees hooks the larger root under the smaller one,
+    then pointer jumping (parent = parent[parent]) flattens every tree to its root. Parents only ever decrease,
+    so no cycle can form, and it finishes when no edge joins two roots, usually within a handful of rounds. Each
+    component's root ends up being its first run.
+
+    :param passable: 2D boolean array, in [y][x] order
+    :param diagonal: Whether tiles touching only at a corner are connected, as they are for 8-way movement
+    :return: (labels, count), where labels is an int32 array the shape of passable holding 0 for impassable
+             tiles and 1 to count for each component, numbered in order of their first tile in row-major order
+    """
+    passable = np.asarray(passable, dtype=bool)
+    height, width = passable.shape
+
+    # Pad a column on either side so neighbors are fixed offsets into the flattened array which never wrap
+    row = width + 2
+    padded = np.zeros((height, row), dtype=bool)
+    padded[:, 1:-1] = passable
+    padded = padded.ravel()
+
+    # Number the runs. Each passable position's run is how many runs have started up to it.
+    starts = padded.copy()
+    starts[1:] &= ~padded[:-1]
+    run_of = np.cumsum(starts, dtype=np.int32) - 1
+    parent = np.arange(run_of[-1] + 1 if len(run_of) else 0, dtype=np.int32)
+
+    # Edges (u, v) between runs in neighboring rows: straight down, and diagonally down either side.
+    # Side-by-side tiles of the same two runs give the same edge, so keep only the first of each.
+    us, vs = [], []
+    for offset in (row - 1, row, row + 1) if diagonal else (row,):
+        tiles = np.flatnonzero(padded[:-offset] & padded[offset:])
+        u, v = run_of[tiles], run_of[tiles + offset]
+        first = np.ones(len(tiles), dtype=bool)
+        first[1:] = (u[1:] != u[:-1]) | (v[1:] != v[:-1])
+        us.append(u[first])
+        vs.append(v[first])
+    us, vs = np.concatenate(us), np.concatenate(vs)
+
+    while True:
+        # Flatten every tree so each run points at its root
+        while True:
+            grandparent = parent[parent]
+            if (grandparent == parent).all():
+                break
+            parent = grandparent
+
+        pu, pv = parent[us], parent[vs]
+        joining = pu != pv
+        if not joining.any():
+            break
+        pu, pv = pu[joining], pv[joining]
+        np.minimum.at(parent, np.maximum(pu, pv), np.minimum(pu, pv))
+
+        # Only edges which still joined two trees can do so next round
+        us, vs = us[joining], vs[joining]
+
+    # Number the roots in order, then give every tile its run's root's number
+    root_label = np.cumsum(parent == np.arange(len(parent), dtype=np.int32), dtype=np.int32)
+    labels = np.zeros(passable.shape, dtype=np.int32)
+    labels[passable] = root_label[parent[run_of[padded]]]
+    return labels, int(root_label[-1]) if len(root_label) else 0
+
+
+class Components:
+    """The connected regions of a passability field, with their statistics."""
+    def __init__(self, passable: np.ndarray, diagonal: bool = True):
+        """
+        :param passable: 2D boolean array, in [y][x] order
+        :param diagonal: Whether tiles touching only at a corner are connected. See label_components().
+        """
+        self.diagonal = diagonal
+        self.labels, self.count = label_components(passable, diagonal)
+
+    @property
+    def sizes(self) -> np.ndarray:
+        """How many tiles are in each component. sizes[0] counts the impassable tiles."""
+        return np.bincount(self.labels.ravel(), minlength=self.count + 1)
+
+    @property
+    def largest(self) -> int:
+        """The label of the biggest component, or 0 if there are none."""
+        return int(np.argmax(self.sizes[1:])) + 1 if self.count else 0
+
+    @property
+    def centroids(self) -> np.ndarray:
+        """A (count + 1, 2) array of each component's mean (x, y). Row 0 is the impassable tiles'."""
+        ys, xs = np.indices(self.labels.shape)
+        sizes = np.maximum(self.sizes, 1)
+        return np.stack((np.bincount(self.labels.ravel(), xs.ravel(), minlength=self.count + 1) / sizes,
+                         np.bincount(self.labels.ravel(), ys.ravel(), minlength=self.count + 1) / sizes), axis=1)
+
+    def mask(self, label: int) -> np.ndarray:
+        return self.labels == label
+
+    def stats(self) -> Dict[str, float]:
+        """A summary of how fragmented the field is."""
+        sizes = self.sizes[1:]
+        total = int(sizes.sum())
+        return {"components": self.count,
+                "largest": int(sizes.max()) if self.count else 0,
+                "smallest": int(sizes.min()) if self.count else 0,
+                "passable": total,
+                "reachable_ratio": float(sizes.max()) / total if total else 1.0}
+
+
+def prune(passable: np.ndarray, min_size: Optional[int] = None, diagonal: bool = True) -> np.ndarray:
+    """Fills in unreachable pockets.
+
+    :param min_size: Keep every component with at least this many tiles. By default only the largest is kept.
+    :return: A new passability array
+    """
+    components = Components(passable, diagonal)
+    if min_size is None:
+        keep = np.zeros(components.count + 1, dtype=bool)
+        keep[components.largest] = components.count > 0
+    else:
+        keep = components.sizes >= min_size
+        keep[0] = False
+    return keep[components.labels]
+
+
+def connect(passable: np.ndarray,
+            brush_size: int = 1,
+            diagonal: bool = True,
+            rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Carves a corridor from every pocket to the largest component, from whichever tile of the pocket is nearest
+    to it, along an L-shaped path to that nearest tile.
+
+    One distance transform of the largest component finds the nearest pair for every pocket at once, so this takes
+    a single pass however many pockets there are.
+
+    :param brush_size: The width of each corridor. See HallwayCellulose.
+    :param rng: Which way each corridor turns
+    :return: A new passability array
+    """
+    rng = rng if rng is not None else fallback_rng()
+    connected = np.array(passable, dtype=bool)
+    components = Components(connected, diagonal)
+    if components.count <= 1:
+        return connected
+
+    distance, nearest_x, nearest_y = distance_transform(components.mask(components.largest))
+
+    # For each other component, the flat index of its tile closest to the largest
+    pocket_tiles = np.flatnonzero((components.labels != 0) & (components.labels != components.largest))
+    pocket_labels = components.labels.ravel()[pocket_tiles]
+    order = np.lexsort((distance.ravel()[pocket_tiles], pocket_labels))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = pocket_labels[order][1:] != pocket_labels[order][:-1]
+    closest = pocket_tiles[order[first]]
+
+    width = connected.shape[1]
+    for y, x in zip(*np.divmod(closest, width)):
+        HallwayCellulose((x, y), (nearest_x[y, x], nearest_y[y, x]),
+                         brush_size=brush_size,
+                         style=L_SHAPED,
+                         rng=rng).carve_into(connected)
+    return connected
+
+
+def repair(passable: np.ndarray,
+           how: str = CONNECT,
+           brush_size: int = 1,
+           diagonal: bool = True,
+           rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Makes every passable tile reachable from every other, by prune() or connect().
+
+    :param how: PRUNE or CONNECT
+    :return: A new passability array
+    """
+    if how == PRUNE:
+        return prune(passable, diagonal=diagonal)
+    elif how == CONNECT:
+        return connect(passable, brush_size=brush_size, diagonal=diagonal, rng=rng)
+    else:
+        raise ValueError("how must be one of {}; got {}".format(str(REPAIRS), str(how)))
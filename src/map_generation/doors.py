@@ -0,0 +1,141 @@
+import numpy as np
+
+from typing import List, Optional, Tuple
+
+SIDES = ("top", "bottom", "left", "right")
+
+
+def _lower_envelope(cost: np.ndarray, axis: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Along one axis of a 2D integer cost array, finds min over j of cost[j] + |i - j| at every i, and the j
+    which attains it, preferring the smaller j on ties.
+
+    Both directions are a running minimum: scanning forward, cost[j] + i - j is i plus the running minimum of
+    cost[j] - j, and likewise backward. Packing j into the low bits of each key lets np.minimum.accumulate
+    carry the argmin along with the minimum."""
+    n = cost.shape[axis]
+    bits = max(n - 1, 1).bit_length()
+    # The packed keys run up to about (max cost + 2n) << bits. Use 32 bits if that fits, since it's twice as fast.
+    dtype = np.int32 if (int(cost.max(initial=0)) + 2 * n + 1) << bits < 2**31 else np.int64
+    i = np.arange(n, dtype=dtype).reshape((-1, 1) if axis == 0 else (1, -1))
+    cost = cost.astype(dtype)
+    low = dtype(2**bits - 1)
+
+    forward = np.minimum.accumulate(((cost - i + n) << bits) | i, axis=axis)
+    forward_distance, forward_j = (forward >> bits) - n + i, forward & low
+
+    reverse = (slice(None, None, -1), slice(None)) if axis == 0 else (slice(None), slice(None, None, -1))
+    backward = np.minimum.accumulate((((cost + i) << bits) | i)[reverse], axis=axis)[reverse]
+    backward_distance, backward_j = (backward >> bits) - i, backward & low
+
+    # Select arithmetically rather than with np.where, which is slow on masks with no pattern to them
+    take_backward = backward_distance < forward_distance
+    return (np.minimum(backward_distance, forward_distance),
+            forward_j + take_backward * (backward_j - forward_j))
+
+
+def distance_transform(passable: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Computes the exact Manhattan distance from every tile to the nearest passable tile, and where that tile is.
+
+    The L1 distance separates by axis, so this is one pass along the rows and one down the columns of the result.
+    Tiles with no passable tile anywhere have a distance of height + width or more.
+
+    :param passable: 2D boolean array, in [y][x] order
+    :return: (distance, nearest_x, nearest_y) arrays, each the shape of passable
+    """
+    height, width = passable.shape
+    unreachable = height + width
+    cost = (~passable).astype(np.int32) * unreachable
+
+    row_distance, row_x = _lower_envelope(cost, axis=1)
+    distance, nearest_y = _lower_envelope(row_distance, axis=0)
+    nearest_x = row_x[nearest_y, np.arange(width)[np.newaxis, :]]
+    return distance, nearest_x, nearest_y
+
+
+class DoorPlacer:
+    """Answers where to put doors in a room's passable field with array lookups into a distance transform.
+
+    A door on a side is the passable tile nearest to some point of that edge. The corridor from the neighboring
+    room's door carves through the wall between the edge and that tile, so the best door on a side is the one
+    with the shallowest wall, with ties going to the edge point nearest the side's midpoint. No processes are
+    ever started."""
+    def __init__(self, field: np.ndarray):
+        """
+        :param field: A room's 2D boolean passability array, in [y][x] order
+        """
+        self.field = field
+        self.distance, self.nearest_x, self.nearest_y = distance_transform(field)
+        self.height, self.width = field.shape
+
+    @property
+    def any_passable(self) -> bool:
+        return bool(self.field.any())
+
+    def nearest_passable(self, x: int, y: int) -> Optional[Tuple[int, int]]:
+        """Returns the passable tile nearest to x, y, which is clamped onto the field, or None if there isn't one."""
+        if not self.any_passable:
+            return None
+        x = min(max(x, 0), self.width - 1)
+        y = min(max(y, 0), self.height - 1)
+        return int(self.nearest_x[y, x]), int(self.nearest_y[y, x])
+
+    def _edge(self, side: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(xs, ys) of every tile along one edge of the field, in order along it."""
+        if side == "top":
+            return np.arange(self.width), np.zeros(self.width, dtype=np.intp)
+        elif side == "bottom":
+            return np.arange(self.width), np.full(self.width, self.height - 1)
+        elif side == "left":
+            return np.zeros(self.height, dtype=np.intp), np.arange(self.height)
+        elif side == "right":
+            return np.full(self.height, self.width - 1), np.arange(self.height)
+        else:
+            raise ValueError("side must be one of {}; got {}".format(str(SIDES), str(side)))
+
+    def candidates(self, side: str, mid_pt: int, radius: int = 7) -> np.ndarray:
+        """Ranks the doors reachable from the edge points within radius of mid_pt along a side.
+
+        :return: An array of rows (door_x, door_y, edge_x, edge_y, depth), best first, where depth is how many
+                 tiles of wall lie between the edge point and the door. Empty if the room has no passable tiles.
+        """
+        edge_xs, edge_ys = self._edge(side)
+        window = slice(max(mid_pt - radius, 0), max(mid_pt + radius + 1, 0))
+        edge_xs, edge_ys = edge_xs[window], edge_ys[window]
+        if not self.any_passable or len(edge_xs) == 0:
+            return np.empty((0, 5), dtype=np.intp)
+
+        depth = self.distance[edge_ys, edge_xs]
+        off_center = np.abs(np.arange(window.start, window.start + len(edge_xs)) - mid_pt)
+        order = np.lexsort((off_center, depth))
+        return np.stack((self.nearest_x[edge_ys, edge_xs],
+                         self.nearest_y[edge_ys, edge_xs],
+                         edge_xs, edge_ys, depth), axis=1)[order]
+
+    def best_door(self, side: str, mid_pt: int, radius: int = 7) -> Tuple[int, int]:
+        """Returns the (x, y) door for a side near mid_pt. If the room has nowhere passable, that's the edge point
+        at mid_pt itself."""
+        ranked = self.candidates(side, mid_pt, radius)
+        if len(ranked) == 0:
+            edge_xs, edge_ys = self._edge(side)
+            at = min(max(mid_pt, 0), len(edge_xs) - 1)
+            return int(edge_xs[at]), int(edge_ys[at])
+        return int(ranked[0, 0]), int(ranked[0, 1])
+
+
+def rank_by_corridor_length(origin_doors: np.ndarray, destination_doors: np.ndarray) -> List[Tuple[int, int, int]]:
+    """Pairs up candidate doors in two rooms, shortest corridor first.
+
+    :param origin_doors: Rows starting (door_x, door_y), in map coordinates, such as DoorPlacer.candidates() offset
+                         by the room's position
+    :param destination_doors: The same, for the other room
+    :return: (origin index, destination index, corridor length) for every pair, where corridor length is the
+             Manhattan distance between the two doors
+    """
+    origin_doors = np.asarray(origin_doors)
+    destination_doors = np.asarray(destination_doors)
+    lengths = np.abs(origin_doors[:, np.newaxis, 0] - destination_doors[np.newaxis, :, 0]) \
+        + np.abs(origin_doors[:, np.newaxis, 1] - destination_doors[np.newaxis, :, 1])
+
+    order = np.argsort(lengths, axis=None, kind="stable")
+    origin_index, destination_index = np.unravel_index(order, lengths.shape)
+    return [(int(o), int(d), int(lengths[o, d])) for o, d in zip(origin_index, destination_index)]
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import zipfile
+import numpy as np
+
+from typing import Callable, Dict, Optional
+from src.layers import LayerStore, as_bit_layer
+from src.map_generation.rng import RngService
+
+Arrays = Dict[str, np.ndarray]
+
+
+class CachedMap:
+    """Stands in for a map generator which has already run, holding only its .walls and .field, packed as
+    BitLayers so that many of them can be held at once."""
+    def __init__(self, walls: np.ndarray, field: np.ndarray):
+        self.walls = as_bit_layer(walls)
+        self.field = as_bit_layer(field)
+
+    @classmethod
+    def load(cls, layer_store: LayerStore) -> "CachedMap":
+        """Maps the walls and field saved in a LayerStore, such as by a LevelGenerator given one."""
+        return cls(layer_store.load("walls"), layer_store.load("field"))
+
+
+class LevelCache:
+    """Stores generated levels as compressed .npz files in a directory, keyed by the generator class,
+    its parameters and the seed it ran with.
+
+    The directory is held under max_bytes by evicting the least recently used files first. Use is
+    tracked through each file's modification time, which is bumped on every hit, so recency survives
+    between runs without an index file."""
+    suffix = ".npz"
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 2**20):
+        """
+        :param directory: Where to keep cached levels. Created if it doesn't exist.
+        :param max_bytes: The most disk space the cache may take up before old levels are evicted
+        """
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive; got {}".format(str(max_bytes)))
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(generator_class: type, params: Dict, seed: int) -> str:
+        """A stable hex digest naming a generator class, its parameters and a seed."""
+        description = json.dumps({"class": generator_class.__module__ + "." + generator_class.__qualname__,
+                                  "params": params,
+                                  "seed": seed},
+                                 sort_keys=True, default=str)
+        return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _entries(self):
+        """Every cached file as (path, size, last used), oldest first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(self.suffix):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime_ns))
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    @property
+    def size(self) -> int:
+        """How many bytes the cached levels take up on disk."""
+        return sum(size for path, size, used in self._entries())
+
+    def __len__(self) -> int:
+        return len(self._entries())
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> Optional[Arrays]:
+        """Returns the arrays stored under key, or None if they aren't cached."""
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as archive:
+                arrays = {name: archive[name] for name in archive.files}
+        except (OSError, ValueError, zipfile.BadZipFile):
+            # A missing or unreadable file is just a miss. Drop it if it's corrupt so it's regenerated.
+            if os.path.exists(path):
+                os.remove(path)
+            self.misses += 1
+            return None
+
+        os.utime(path)
+        self.hits += 1
+        return arrays
+
+    def put(self, key: str, arrays: Arrays) -> None:
+        """Stores arrays under key, then evicts least recently used levels until the cache fits in max_bytes."""
+        path = self._path(key)
+
+        # Write to a temporary file and move it into place, so a crash never leaves half a level behind
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as file:
+            np.savez_compressed(file, **arrays)
+        os.replace(temporary, path)
+
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes least recently used levels until the cache fits in max_bytes."""
+        entries = self._entries()
+        total = sum(size for path, size, used in entries)
+        for path, size, used in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self) -> None:
+        for path, size, used in self._entries():
+            os.remove(path)
+
+    def get_or_generate(self,
+                        generator_class: type,
+                        params: Dict,
+                        seed: int,
+                        generate: Optional[Callable[[int], Arrays]] = None) -> Arrays:
+        """Returns a cached level if there is one. Otherwise generates the level from seed and caches it.
+        No global random state is touched, so a hit and a miss leave the process in the same state.
+
+        :param generator_class: The generator class, which is part of the key
+        :param params: Keyword arguments for generator_class, which are part of the key. Must be JSON-serializable.
+        :param seed: The seed to generate with, which is part of the key
+        :param generate: Given seed, returns the arrays to cache. It should draw only from randomness seeded
+                         by it. Defaults to instantiating generator_class with params and an RngService seeded
+                         with seed, as rngs, and taking its .walls and .field.
+        """
+        key = self.key(generator_class, params, seed)
+        arrays = self.get(key)
+        if arrays is not None:
+            return arrays
+
+        if generate is None:
+            def generate(seed: int) -> Arrays:
+                generator = generator_class(**params, rngs=RngService(seed))
+                return {"walls": generator.walls, "field": generator.field}
+
+        arrays = generate(seed)
+        self.put(key, arrays)
+        return arrays
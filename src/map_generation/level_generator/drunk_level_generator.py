@@ -1,36 +1,72 @@
 import numpy as np
 import random as rand
 
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from src.map_generation.level_generator.level_generator_ import LevelGenerator
 from src.map_generation.map_generator import WholeDrunkMapGen
-from src.entity import Entity, Mobile
+from src.map_generation.level_cache import LevelCache, CachedMap
+from src.map_generation.rng import RngService
+from src.map_generation.spawn_index import SpawnIndex
+from src.layers import LayerStore
+from src.entity import Entity
+from src.entity.entities import Mobile
 from src.sigil import Sigil
 
+MAP_PARAMS = {"width": 80, "height": 60,
+              "num_centers": 12,
+              "passability_tgt": 0.25,
+              "wanderer_born_prob": 0,
+              "wanderer_die_prob": 0,
+              "centroidal_born_prob": 0.10,
+              "centroidal_die_prob": 0.0125}
+
+
+def _roll_level(num_entities: int, rngs: RngService):
+    """Generates the map and picks where its content and the player spawn, as arrays fit for a LevelCache."""
+    map_gen = WholeDrunkMapGen(**MAP_PARAMS, rng=rngs.stream("map"))
+
+    # Everything gets a tile of its own
+    xs, ys = SpawnIndex(map_gen.field).sample_distinct(num_entities + 1, rngs.stream("content"))
+    positions = np.stack((xs, ys), axis=1)
+
+    return {"walls": map_gen.walls,
+            "field": map_gen.field,
+            "content_positions": positions[:-1],
+            "player_spawn": positions[-1]}
+
 
 class DrunkLevelGenerator(LevelGenerator):
-    def __init__(self):
-        map_gen = WholeDrunkMapGen(width=80, height=60,
-                                   num_centers=12,
-                                   passability_tgt=0.25,
-                                   wanderer_born_prob=0,
-                                   wanderer_die_prob=0,
-                                   centroidal_born_prob=0.10,
-                                   centroidal_die_prob=0.0125)
-
-        def generate_content(walls: np.ndarray, field: np.ndarray) -> List[Tuple[int, int, Entity]]:
-            ents = [Mobile(size=4,
-                           sigil=Sigil("m", color=(190, 190, 240)),
-                           name="Memeish boi"),
-                    Mobile(size=4,
-                           sigil=Sigil("m", color=(220, 200, 255)),
-                           name="Memey McMemeFace")]
-            positions = [(pos[1], pos[0]) for pos, truth in np.ndenumerate(field) if truth]
-
-            ents_and_positions = [(ent, rand.choice(positions)) for ent in ents]
-            return [(pos[0], pos[1], ent) for ent, pos in ents_and_positions]
+    def __init__(self,
+                 cache: Optional[LevelCache] = None,
+                 seed: Optional[int] = None,
+                 layer_store: Optional[LayerStore] = None):
+        """
+        :param cache: Where to look up and store this level. Only used along with a seed.
+        :param seed: The master seed for this level's RngService. Without one, a seed is drawn from the random
+                     module.
+        :param layer_store: Where to keep the level's layers memory-mapped. See LevelGenerator.
+        """
+        ents = [Mobile(size=4,
+                       sigil=Sigil("m", color=(190, 190, 240)),
+                       name="Memeish boi"),
+                Mobile(size=4,
+                       sigil=Sigil("m", color=(220, 200, 255)),
+                       name="Memey McMemeFace")]
 
-        super().__init__(width=60, height=40,
-                         map_generator=map_gen,
-                         content_generator=generate_content)
+        rngs = RngService(seed if seed is not None else rand.getrandbits(64))
+        if cache is not None and seed is not None:
+            level = cache.get_or_generate(type(self), MAP_PARAMS, seed,
+                                          generate=lambda seed: _roll_level(len(ents), rngs))
+        else:
+            level = _roll_level(len(ents), rngs)
 
+        def generate_content(walls: np.ndarray, field: np.ndarray,
+                             spawns: SpawnIndex) -> List[Tuple[int, int, Entity]]:
+            return [(int(x), int(y), ent) for ent, (x, y) in zip(ents, level["content_positions"])]
+
+        super().__init__(width=60, height=40,
+                         map_generator=CachedMap(level["walls"], level["field"]),
+                         content_generator=generate_content,
+                         player_spawn_generator=lambda: tuple(int(i) for i in level["player_spawn"]),
+                         layer_store=layer_store,
+                         rngs=rngs)
@@ -1,11 +1,17 @@
-import random as rand
 import numpy as np
+import random as rand
 import multiprocessing as mp
 
-from typing import Callable, List, Tuple
+from typing import Callable, List, Optional, Tuple
 
-from src.playfield import PlayField
-from src.entity import Entity, Static, Mobile
+from src.playfield import PlayField, FLOOR, WALL
+from src.layers import BitLayer, LayerStore, as_bit_layer
+from src.map_generation.connectivity import Components
+from src.map_generation.spawn_index import SpawnIndex
+from src.map_generation.rng import RngService
+from src.entity import Entity
+from src.entity.entities import Static, Mobile
+from src.entity.landscape import WalkableTerrain
 from src.sigil import Sigil
 
 
@@ -14,30 +20,47 @@ class LevelGenerator:
                  map_generator,
                  content_generator,
                  player_spawn_generator=None,
-                 wall_generator=None):
+                 wall_generator=None,
+                 layer_store: Optional[LayerStore] = None,
+                 rngs: Optional[RngService] = None):
         # After instantiation, should have attributes .walls and .fields, described below
         self._generator: Callable = map_generator
 
         # Should spawn a bunch of mobiles and map features and other good stuff based on the map generator.
+        # Called with (walls, field, spawns), where spawns is a SpawnIndex, and returns [(x, y, entity),]
         self._content_generator: Callable = content_generator
 
-        # Should be a function which returns a new static entity representing a wall
+        # Where this level's randomness comes from, such as the player spawn's stream. Defaults to a service seeded
+        # from the random module, so seeding that still makes the level repeatable.
+        self.rngs: RngService = rngs if rngs is not None else RngService(rand.getrandbits(64))
+
+        # Should be a function which returns a new static entity representing a wall, shared by every wall tile
         self._wall_generator: Callable = wall_generator if wall_generator else self._default_wall_generator
 
-        # Walls is a 2d boolean numpy array of cells upon which to draw walls or other boundaries
-        self.walls: np.ndarray = map_generator.walls
+        # Walls is a 2d boolean layer of cells upon which to draw walls or other boundaries
+        self.walls: BitLayer = as_bit_layer(map_generator.walls)
 
-        # Field is a boolean numpy array of cells in which it is valid to spawn entities--the inside of the playfield.
-        self.field: np.ndarray = map_generator.field
+        # Field is a boolean layer of cells in which it is valid to spawn entities--the inside of the playfield.
+        self.field: BitLayer = as_bit_layer(map_generator.field)
+
+        # Given a layer store, the walls and field live there as memory-mapped files rather than in memory, as
+        # does the terrain of the playfield. Load them again later with CachedMap.load().
+        self.layer_store: Optional[LayerStore] = layer_store
+        if layer_store is not None:
+            self.walls = layer_store.save("walls", self.walls)
+            self.field = layer_store.save("field", self.field)
 
         # A running list of entities with which to generate the playfield, in the format [(x, y, entity),]
+        # The walls aren't among them; they're laid out as terrain straight from .walls by get_playfield().
         self.entities: List[Tuple[int, int, Entity]] = []
 
-        # Start generating entities by laying out the walls surrounding the playable space.
-        self.entities += self._walls_as_entities()
+        # Where things can spawn: every tile of the field's largest connected region, equally likely.
+        # Use .weighted() and .within() on it to prefer some places over others.
+        components = Components(self.field)
+        self.spawns: SpawnIndex = SpawnIndex(components.mask(components.largest))
 
         # Spin up the content for this map based on the provided content_generator function
-        content: List[Entity] = content_generator(self.walls, self.field)
+        content: List[Entity] = content_generator(self.walls, self.field, self.spawns)
         self.entities += content
 
         # While we're at it, figure out where to spawn the player
@@ -48,25 +71,26 @@ class LevelGenerator:
     @staticmethod
     def _default_wall_generator():
         """A stand-in for something specifiable at instantiation. Returns a bland little wall."""
-        return lambda: Static(size=9,
-                              sigil=Sigil("#",
-                                          priority=3),
-                              name="Wall",
-                              passable=False)
-
-    def _walls_as_entities(self) -> List[Tuple[int, int, Entity]]:
-        """Returns this LevelGenerator's .walls as a list of (x, y, entity)"""
-        #([x for x in np.ndenumerate(self.walls)])
-        return [(pos[1], pos[0], self._wall_generator()) for pos, truth in np.ndenumerate(self.walls) if truth]
+        return Static(size=9,
+                      sigil=Sigil("#",
+                                  priority=3),
+                      name="Wall",
+                      passable=False)
 
     def get_playfield(self, interface, player_character: Mobile):
-        """Instantiates a new Playfield using the topography and entities generated by this class."""
-        height, width = self.walls.shape
-        return PlayField(width=width, height=height,
-                         interface=interface,
-                         player_character=player_character,
-                         pc_spawn_point=self._player_spawn)
+        """Instantiates a new Playfield using the topography and entities generated by this class.
+        Every wall tile is drawn with the one wall from the wall generator."""
+        return PlayField.from_layers(interface=interface,
+                                     walls=self.walls,
+                                     field=self.field,
+                                     terrain_palette={FLOOR: WalkableTerrain(), WALL: self._wall_generator()},
+                                     contents=self.entities,
+                                     player_character=player_character,
+                                     pc_spawn_point=self._player_spawn,
+                                     layer_store=self.layer_store)
 
     def place_player_spawn(self):
-        """If no more specific method is given, pick a random place in the field with no particular weight."""
-        return rand.choice([(pos[1], pos[0]) for pos, truth in np.ndenumerate(self.field) if truth])
\ No newline at end of file
+        """If no more specific method is given, pick a random place from .spawns with no particular weight,
+        so the player can't start out stuck in a pocket. Drawn from the "player_spawn" stream of .rngs."""
+        xs, ys = self.spawns.sample(1, self.rngs.stream("player_spawn"))
+        return int(xs[0]), int(ys[0])
\ No newline at end of file
@@ -1,12 +1,16 @@
 from src.map_generation.map_generator.map_generator_ import MapGenerator
 from src.map_generation.cellulose import drunk_walk
+from src.map_generation.rng import RngService
+from typing import Optional
 
 
 class DrunkMapGenerator(MapGenerator):
     """Generates a map based on drunk artist rooms--independent passability brushes which wander their field space."""
     def __init__(self,
                  grid_width: int,
-                 grid_height: int):
+                 grid_height: int,
+                 max_grid_openness: float = .5,
+                 rngs: Optional[RngService] = None):
         candidates = [drunk_walk.SmallDrunkRoom,
                       drunk_walk.MediumDrunkRoom,
                       drunk_walk.LargeDrunkRoom]
@@ -14,7 +18,9 @@ class DrunkMapGenerator(MapGenerator):
         super().__init__(grid_width=grid_width,
                          grid_height=grid_height,
                          candidates=candidates,
-                         candidate_weights=weights)
+                         candidate_weights=weights,
+                         max_grid_openness=max_grid_openness,
+                         rngs=rngs)
 
 
 if __name__ == "__main__":
@@ -24,8 +30,8 @@ if __name__ == "__main__":
     mapgen = DrunkMapGenerator(grid_width=7,
                                grid_height=5)
 
-    walls, passability = mapgen._render()
-    for row in walls:
+    mapgen._generate()
+    for row in mapgen.walls.to_array():
         char_row = ["#" if truth else " "
                     for truth in row]
         print("".join(char_row))
\ No newline at end of file
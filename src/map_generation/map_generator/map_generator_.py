@@ -1,43 +1,20 @@
 import numpy as np
+import random as rand
 import multiprocessing as mp
 
-from copy import deepcopy
-from random import choices, random
-from typing import List, Optional, Type, Tuple
+from typing import Callable, Dict, List, Optional, Set, Type, Tuple
 from src.map_generation.cellulose import RoomCellulose
-from src.map_generation.cellulose.hallway import HallwayCellulose
+from src.map_generation.cellulose import composite
+from src.map_generation.cellulose.hallway import HallwayCellulose, MONOTONE
+from src.instrumentation import tracing
+from src.layers import BitLayer
+from src.map_generation.rng import RngService
+from src.map_generation.smoothing import walls_of
 
 
-def _determine_wall(x0, y0, field: np.ndarray) -> Tuple[int, int, bool]:
-    """Parallelizable function to determine a wall array given a passable array.
-
-    Returns (x0, y0, True) for impassable tiles which border passable tiles, and (x0, y0, False) otherwise."""
-    own_passability = field[y0, x0]
-
-    # If this tile is already passable, it definitely shouldn't be a wall.
-    if own_passability:
-        return x0, y0, False
-
-    # If it's not, then it's only a wall if it touches a cell that IS passable.
-    else:
-        # Get truth values of adjacent cells
-        height, width = field.shape
-
-        # Trim our selection range to the boundaries of the field's indices
-        neighbor_indices = [(x, y) for x, y in [(x0-1, y0-1), (x0-1, y0), (x0-1, y0+1),
-                                                (x0, y0-1), (x0, y0+1),
-                                                (x0+1, y0-1), (x0+1, y0), (x0+1, y0+1)]
-                            if 0 <= x < width and 0 <= y < height]
-
-        neighbor_truths = [field[y, x] for x, y in neighbor_indices]
-
-        # If any of the neighbors are passable, and this cell isn't, then this cell is a Genuine Wall :)
-        if sum(neighbor_truths) > 0:
-            return x0, y0, True
-
-        # If not, trim it so as not to waste memory on static entities that'll never be seen.
-        else:
-            return x0, y0, False
+def _run_job(function: Callable[..., np.ndarray], args: tuple) -> np.ndarray:
+    """Calls a room's field job. Module-level so a pool can run it."""
+    return function(*args)
 
 
 class MapGenerator:
@@ -45,7 +22,15 @@ class MapGenerator:
                  grid_width: int, grid_height: int,
                  candidates: List[Type[RoomCellulose]],
                  candidate_weights: List[float],
-                 max_grid_openness: float):
+                 max_grid_openness: float,
+                 rngs: Optional[RngService] = None,
+                 hall_style: str = MONOTONE):
+        """
+        :param rngs: Where to draw the layout's and each room's random streams from. Rooms draw from
+                     rngs.room(x, y), so each room comes out the same however many rooms are generated before it
+                     or wherever it's generated. Defaults to a service seeded from the random module.
+        :param hall_style: The shape of the hallways linking rooms. See src.map_generation.cellulose.hallway.
+        """
         if not len(candidates) == len(candidate_weights):
             raise ValueError("Lengths of candidates and candidate_weights must match!")
         self.shape = (grid_width, grid_height)
@@ -53,39 +38,116 @@ class MapGenerator:
         self.candidates = candidates
         self.candidate_weights = candidate_weights
 
-        # A grid of the UUID strings of its subordinate RoomCellophanes
-        self.grid = np.full(shape=(grid_height, grid_width),
-                            fill_value="",
-                            dtype=np.dtype('U36'))  # IIRC the standard for UUID4 is 32 hex digits and 4 dashes
+        # A grid of the ids of its subordinate RoomCellophanes, where 0 is an empty cell
+        self.grid = np.zeros(shape=(grid_height, grid_width),
+                             dtype=np.int32)
+        self._rooms_by_id: Dict[int, RoomCellulose] = {}
 
         # The generator will run until at least a certain ratio of the grid is not empty.
         self.max_grid_openness = max_grid_openness
+        self._empty_cells = self.grid.size
+
+        # (origin, destination) pairs of grid cells where a room could open onto an empty neighboring cell.
+        # Kept up to date as rooms are placed, along with which origins border each empty cell. A list, so doors
+        # can be drawn by index in a reproducible order, with each door's index alongside for O(1) removal.
+        self.free_doors: List[Tuple[Tuple[int, int], Tuple[int, int]]] = []
+        self._free_door_index: Dict[Tuple[Tuple[int, int], Tuple[int, int]], int] = {}
+        self._free_doors_into: Dict[Tuple[int, int], Set[Tuple[int, int]]] = {}
+
+        self.rngs = rngs if rngs is not None else RngService(rand.getrandbits(64))
+        self.rng = self.rngs.stream("layout")
 
         self.rooms: List[RoomCellulose] = []
         self.halls: List[HallwayCellulose] = []
-        self.linked_cells: List[Tuple[Tuple[int, int], Tuple[int, int]]] = []
+        self.hall_style = hall_style
 
-    def _room_by_uuid_str(self, uuid: str) -> RoomCellulose:
-        # A list that -should- only have one element.
-        rooms = [r for r in self.rooms if r.uuid == uuid]
+        # Every hallway's tiles, carved straight in at map scale as they're linked. 15 tiles per grid cell.
+        self.hall_mask = np.zeros(shape=(15 * grid_height, 15 * grid_width),
+                                  dtype=bool)
+        self.linked_cells: List[Tuple[Tuple[int, int], Tuple[int, int]]] = []
 
-        if len(rooms) > 1:
-            raise Exception("Tried to get room by uuid, but more than one was returned!")
-        return rooms[0]
+    @property
+    def _candidate_probabilities(self) -> np.ndarray:
+        weights = np.asarray(self.candidate_weights, dtype=np.float64)
+        return weights / weights.sum()
+
+    def room_rng(self, grid_x: int, grid_y: int) -> np.random.Generator:
+        """The random stream for the room whose top-left cell is grid_x, grid_y."""
+        return self.rngs.room(grid_x, grid_y).stream("artists")
+
+    def _add_free_door(self, door: Tuple[Tuple[int, int], Tuple[int, int]]) -> None:
+        if door not in self._free_door_index:
+            self._free_door_index[door] = len(self.free_doors)
+            self.free_doors.append(door)
+
+    def _remove_free_door(self, door: Tuple[Tuple[int, int], Tuple[int, int]]) -> None:
+        # Swap the last door into this one's place, rather than shifting everything after it down
+        index = self._free_door_index.pop(door, None)
+        if index is None:
+            return
+        last = self.free_doors.pop()
+        if index < len(self.free_doors):
+            self.free_doors[index] = last
+            self._free_door_index[last] = index
+
+    def register_room(self, room: RoomCellulose) -> int:
+        """Places a room on the grid, marking the cells it covers with a new id, and returns that id.
+        Called by RoomCellulose on instantiation."""
+        room_id = len(self._rooms_by_id) + 1
+        self._rooms_by_id[room_id] = room
+        self.rooms.append(room)
+
+        x0, y0 = room.grid_position
+        width, height = room.grid_shape
+        covered = self.grid[y0:y0 + height, x0:x0 + width]
+        self._empty_cells -= int(np.count_nonzero(covered == 0))
+        covered[:] = room_id
+
+        # The room's cells can no longer be opened onto...
+        grid_height, grid_width = self.grid.shape
+        cells = [(x, y) for y in range(y0, min(y0 + height, grid_height))
+                 for x in range(x0, min(x0 + width, grid_width))]
+        for cell in cells:
+            for origin in self._free_doors_into.pop(cell, ()):
+                self._remove_free_door((origin, cell))
+
+        # ...but the room can open onto any empty cell around it
+        for x, y in cells:
+            for dx, dy in ((-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)):
+                neighbor = (x + dx, y + dy)
+                if 0 <= neighbor[0] < grid_width and 0 <= neighbor[1] < grid_height \
+                        and self.grid[neighbor[1], neighbor[0]] == 0:
+                    self._add_free_door(((x, y), neighbor))
+                    self._free_doors_into.setdefault(neighbor, set()).add((x, y))
+
+        return room_id
+
+    def room_by_id(self, room_id: int) -> Optional[RoomCellulose]:
+        """Returns the room with a given id, or None for 0 and unknown ids."""
+        return self._rooms_by_id.get(int(room_id))
 
     def room_in_grid_cell(self, x: int, y: int) -> Optional[RoomCellulose]:
         """Returns which room a specified grid cell is part of, or None."""
-        if not (0 <= x < self.shape[1]) and (0 <= y <= self.shape[0]):
+        grid_height, grid_width = self.grid.shape
+        if not (0 <= x < grid_width and 0 <= y < grid_height):
             raise ValueError("x and y must constitute a valid grid location; got {}, {}"
                              .format(str(x), str(y)))
-        content_id = self.grid[y, x]
-        if content_id == "":
-            return None
-        else:
-            return self._room_by_uuid_str(content_id)
+        return self.room_by_id(self.grid[y, x])
 
-    def generate_room(self, x0, y0):
-        if not (0 <= x0 < self.shape[0]) and (0 <= y0 < self.shape[1]):
+    def _room_fits(self, room: Type[RoomCellulose], x0: int, y0: int) -> bool:
+        """Whether a room of the given class placed at x0, y0 would cover only empty cells within the grid."""
+        cel_width, cel_height = room.grid_shape
+        grid_width, grid_height = self.shape
+        return x0 + cel_width <= grid_width and y0 + cel_height <= grid_height \
+            and not self.grid[y0:y0 + cel_height, x0:x0 + cel_width].any()
+
+    def generate_room(self, x0, y0, defer: bool = False):
+        """Rolls a room that fits at grid cell x0, y0 and places it on the grid.
+
+        :param defer: Only plan the room, leaving its field to be generated by .generate_rooms()
+        :return: The room, or None if no candidate rolled fits there
+        """
+        if not (0 <= x0 < self.shape[0] and 0 <= y0 < self.shape[1]):
             raise ValueError("x0 and y0 must be valid grid cells. Got {}, {}"
                              .format(str(x0), str(y0)))
 
@@ -97,23 +159,51 @@ class MapGenerator:
         try_counter = 0
         try_limit = 10
         chosen_cello: Optional[Type[RoomCellulose]] = None
-        grid_width, grid_height = self.shape
         while try_counter < try_limit and chosen_cello is None:
-            room = choices(population=self.candidates,
-                           weights=self.candidate_weights,
-                           k=1)[0]
-            cel_width, cel_height = room.grid_shape
-            if x0 + cel_width < grid_width and y0 + cel_height < grid_height:
+            room = self.candidates[self.rng.choice(len(self.candidates), p=self._candidate_probabilities)]
+            if self._room_fits(room, x0, y0):
                 chosen_cello = room
 
             try_counter += 1
 
+        if chosen_cello is None:
+            return None
+
         cel = chosen_cello(grid_x=x0,
                            grid_y=y0,
-                           generator=self)
+                           generator=self,
+                           defer=defer)
 
         return cel
 
+    def plan_room(self, x0, y0):
+        """Places a room on the grid without generating its field yet."""
+        return self.generate_room(x0, y0, defer=True)
+
+    def generate_rooms(self, processes: Optional[int] = None) -> None:
+        """Generates the fields of every planned room at once, one room per task in a worker pool.
+
+        Each room draws from its own RNG stream, so the result is the same as generating them one at a time.
+
+        :param processes: How many worker processes to use. Defaults to one per CPU; 1 runs in this process.
+        """
+        pending = [r for r in self.rooms if r.pending]
+        if not pending:
+            return
+
+        jobs = [r.field_job for r in pending]
+        processes = min(processes or mp.cpu_count(), len(jobs))
+        with tracing.span("pool._carve_room", "pool", args={"tasks": len(jobs), "processes": processes}):
+            if processes == 1:
+                fields = [_run_job(function, args) for function, args in jobs]
+            else:
+                with mp.Pool(processes) as pool:
+                    fields = pool.starmap(func=_run_job, iterable=jobs)
+
+        for room, field in zip(pending, fields):
+            room.field = field
+            room.pending = False
+
     def link_door_pts(self, grid_origin, grid_destination):
         x_0, y_0 = grid_origin
         x_i, y_i = grid_destination
@@ -149,18 +239,20 @@ class MapGenerator:
 
         # Generate the hallway cellulose and append it to the class-level lists
         hall = HallwayCellulose(origin=origin_pt,
-                                destination=dest_pt)
+                                destination=dest_pt,
+                                style=self.hall_style,
+                                rng=self.rngs.stream("hall", len(self.halls)))
+        hall.carve_into(self.hall_mask)
         self.halls.append(hall)
         self.linked_cells.append((grid_origin, grid_destination))
         self.linked_cells.append((grid_destination, grid_origin))
 
     def _grid_openness(self):
         """Returns the proportion [0, 1] of empty to total cells."""
-        not_empty = [val for position, val in np.ndenumerate(self.grid) if val]
-        return (self.grid.size - len(not_empty))/self.grid.size
+        return self._empty_cells / self.grid.size
 
-    def _render(self) -> Tuple[np.ndarray, np.ndarray]:
-        """Returns a tuple of two 2D numpy bool arrays (walls, passability).
+    def _render(self) -> Tuple[BitLayer, BitLayer]:
+        """Returns a tuple of two 2D BitLayers (walls, passability).
         In the first, truth represents where to draw walls,
         and the second is a reference for valid thing spawn points."""
         grid_shape = self.grid.shape
@@ -174,70 +266,59 @@ class MapGenerator:
                         fill_value=False)
 
         # Apply each room
-        for r in self.rooms:
-            # Calculate x0, y0 in tiles
-            gx0, gy0 = r.grid_position
-            field_x0, field_y0 = (15*gx0, 15*gy0)
-
-            # Apply the room cel's contents to the field
-            r.apply_to(field_x0, field_y0, tgt=field)
-
-        # Apply each hallway
-        for h in self.halls:
-            # Hallways already consider their origins in terms of tiles.
-            # They're essentially map-sized cels.
-            h.apply_to(0, 0, field)
-
-        # Create a walls array, separate from the passability array so that we have both and can trim this one.
-        walls = deepcopy(field)
-        for row in walls:
-            char_row = ["#" if truth else " "
-                        for truth in row]
-
-        # In parallel, calculate which cells are entirely surrounded by impassable tiles and should NOT be walls.
-        enumerated_cells = [(position[1], position[0], field) for position, truth in np.ndenumerate(field)]
-        pool = mp.Pool(mp.cpu_count())
-        wall_deltas = pool.starmap(func=_determine_wall,
-                                   iterable=enumerated_cells)
-        pool.close()
-
-        # Apply the calculated values to create a boolean map of where to draw walls
-        for x, y, truth in wall_deltas:
-            walls[y, x] = truth
-
-        # Return the boolean truth arrays of walls and passability
+        with tracing.span("MapGenerator.rooms", "mapgen"):
+            for r in self.rooms:
+                # Calculate x0, y0 in tiles
+                gx0, gy0 = r.grid_position
+                field_x0, field_y0 = (15*gx0, 15*gy0)
+
+                # Apply the room cel's contents to the field
+                r.apply_to(field_x0, field_y0, tgt=field)
+
+        # Apply the hallways, which were carved into one map-sized mask as they were linked
+        with tracing.span("MapGenerator.halls", "mapgen"):
+            composite(self.hall_mask, field, 0, 0)
+
+        # Walls go on the impassable tiles which touch passable ones, found on the packed field
+        with tracing.span("MapGenerator.walls", "mapgen"):
+            field = BitLayer.from_array(field)
+            walls = walls_of(field)
+
+        # Return the packed truth layers of walls and passability
         return walls, field
 
-    def _generate(self):
-        linked_rooms = []
+    def _generate(self, processes: Optional[int] = None):
+        """Fills the grid with rooms, each opening off one already placed and linked to it by a hallway, then
+        renders them into .walls and .field.
+
+        Every room is planned on the grid first, and then all of their fields are generated at once by
+        .generate_rooms(). Hallways need the rooms' door points, so they're linked after that.
+
+        :param processes: How many worker processes generate_rooms() uses
+        """
+        # Pairs of (origin, destination) grid cells to link with hallways once the rooms have fields
+        links: List[Tuple[Tuple[int, int], Tuple[int, int]]] = []
 
         # First room has an even chance each for an x and y offset of one.
-        first_x0 = round(random())
-        first_y0 = round(random())
-        first_room = self.generate_room(first_x0, first_y0)
+        first_x0, first_y0 = (int(i) for i in self.rng.integers(0, 2, size=2))
+        self.plan_room(first_x0, first_y0)
 
         max_add_failures = 10
         add_failures = 0
-        while self._grid_openness() > self.max_grid_openness and add_failures < max_add_failures:
-            # Select a room that has unoccupied neighbor cells.
-            # We'll define this as any room which has a door point connecting to cell in a list of empty grid cells.
-            empty_grid_cells = [(position[1], position[0]) for position, value
-                                in np.ndenumerate(self.grid)
-                                if not value]
-
-            def free_door_pts(r: RoomCellulose):
-                return [d for d in r.door_points
-                        if d["destination"] in empty_grid_cells]
+        while self._grid_openness() > self.max_grid_openness and add_failures < max_add_failures \
+                and self.free_doors:
+            # Pick a door out of any placed room onto an empty cell, from the list kept up to date as rooms are placed
+            origin, destination = self.free_doors[int(self.rng.integers(len(self.free_doors)))]
 
-            # Compile and flatten a list of available door points for each room
-            origin_doors = sum([free_door_pts(r) for r in self.rooms if len(free_door_pts(r)) != 0], [])
+            # Try to roll a room which fits there. If we fail, count it against the limit.
+            if self.plan_room(*destination) is None:
+                add_failures += 1
+                continue
 
-            # TODO: This approach is simple and tends to make major rooms branch right/down. Make it better?
-            def max_size_for_room_from_door(d):
-                x_origin, y_origin = d["origin"]
-                x_corner, y_corner = d["destination"]
+            links.append((origin, destination))
 
-            doors_and_max_sizes = []
+        self.generate_rooms(processes)
+        for origin, destination in links:
+            self.link_door_pts(origin, destination)
 
-            # Try some number of times to roll a room that fits that space
-                # If we fail, increment add_failures
+        self.walls, self.field = self._render()
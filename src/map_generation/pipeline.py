@@ -0,0 +1,189 @@
+import hashlib
+import json
+import time
+import numpy as np
+
+from typing import Callable, Dict, List, Optional, Sequence
+from src.instrumentation import tracing
+from src.map_generation.level_cache import LevelCache
+from src.map_generation.rng import RngService
+
+Layers = Dict[str, np.ndarray]
+
+
+def _digest(array: np.ndarray) -> str:
+    """A hex digest of an array's dtype, shape and contents."""
+    array = np.ascontiguousarray(array)
+    digest = hashlib.sha256("{}{}".format(array.dtype.str, array.shape).encode("utf-8"))
+    digest.update(array.data)
+    return digest.hexdigest()
+
+
+class Stage:
+    """One step of a Pipeline. It reads some named layers and returns new layers, or new versions of old ones.
+
+    A stage is func(**inputs, **params), plus rng=... for stages which use randomness, and it returns a dict of
+    the layers it provides. Stages must return new arrays rather than modify their inputs, since the inputs may
+    be held in a cache."""
+    def __init__(self,
+                 name: str,
+                 func: Callable[..., Layers],
+                 requires: Sequence[str] = (),
+                 provides: Sequence[str] = (),
+                 params: Optional[Dict] = None,
+                 uses_rng: bool = False):
+        """
+        :param name: Unique within a pipeline. Also names the stage's random stream.
+        :param func: Does the work
+        :param requires: Names of the layers passed to func
+        :param provides: Names of the layers func returns
+        :param params: Further keyword arguments for func. Must be JSON-serializable, since they're part of the
+                       stage's cache key.
+        :param uses_rng: Whether func takes an rng keyword argument, drawn from the pipeline's RngService
+        """
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.provides = tuple(provides)
+        self.params = dict(params) if params else {}
+        self.uses_rng = uses_rng
+
+    def __repr__(self):
+        return "Stage({}, requires={}, provides={})".format(self.name, str(self.requires), str(self.provides))
+
+    def with_params(self, **params) -> "Stage":
+        """A copy of this stage with some parameters changed."""
+        return Stage(self.name, self.func, self.requires, self.provides, {**self.params, **params}, self.uses_rng)
+
+    def key(self, inputs: Dict[str, str], rngs: Optional[RngService]) -> str:
+        """A stable hex digest of everything this stage's output depends on.
+
+        :param inputs: Digests of the input layers, by name
+        :param rngs: The pipeline's RngService, whose seed and path are part of the key if the stage uses it
+        """
+        description = json.dumps({"stage": self.name,
+                                  "func": self.func.__module__ + "." + self.func.__qualname__,
+                                  "params": self.params,
+                                  "inputs": inputs,
+                                  "rng": [str(rngs.master_seed), list(rngs.path)] if self.uses_rng else None},
+                                 sort_keys=True, default=str)
+        return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+    def run(self, layers: Layers, rngs: Optional[RngService]) -> Layers:
+        missing = [name for name in self.requires if name not in layers]
+        if missing:
+            raise ValueError("Stage {} requires layers it wasn't given: {}".format(self.name, str(missing)))
+
+        kwargs = {name: layers[name] for name in self.requires}
+        if self.uses_rng:
+            kwargs["rng"] = rngs.stream(self.name)
+
+        outputs = self.func(**kwargs, **self.params)
+        if set(outputs) != set(self.provides):
+            raise ValueError("Stage {} should provide {}; got {}".format(self.name, str(self.provides),
+                                                                          str(sorted(outputs))))
+        return outputs
+
+
+class Pipeline:
+    """An ordered list of Stages passing named NumPy layers from one to the next.
+
+    Each stage's output is remembered under a key of its parameters, its random stream and the contents of its
+    inputs. Running again after swapping a stage or changing its parameters reruns only that stage and those
+    downstream of it whose inputs actually changed. Given a LevelCache, outputs also persist between runs.
+    Every stage is timed, in .timings, and traced."""
+    def __init__(self,
+                 stages: Sequence[Stage],
+                 rngs: Optional[RngService] = None,
+                 cache: Optional[LevelCache] = None):
+        """
+        :param stages: In the order to run them
+        :param rngs: Where stages that use randomness draw it from, each from a stream named after itself.
+                     Defaults to fresh entropy.
+        :param cache: Where to persist stage outputs. Without one they're only remembered in memory, and only the
+                      latest for each stage.
+        """
+        self.stages: List[Stage] = []
+        for stage in stages:
+            self.append(stage)
+
+        self.rngs = rngs if rngs is not None else RngService()
+        self.cache = cache
+
+        # The latest (key, outputs) of each stage, by name
+        self._memo: Dict[str, tuple] = {}
+
+        # How many milliseconds each stage took in the last run, and which stages were served from a cache
+        self.timings: Dict[str, float] = {}
+        self.cached: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.stages)
+
+    def __getitem__(self, name: str) -> Stage:
+        return self.stages[self.index(name)]
+
+    def index(self, name: str) -> int:
+        for i, stage in enumerate(self.stages):
+            if stage.name == name:
+                return i
+        raise ValueError("No stage named {}".format(str(name)))
+
+    def append(self, stage: Stage) -> None:
+        self.insert(len(self.stages), stage)
+
+    def insert(self, index: int, stage: Stage) -> None:
+        if any(s.name == stage.name for s in self.stages):
+            raise ValueError("A stage named {} is already in this pipeline".format(str(stage.name)))
+        self.stages.insert(index, stage)
+
+    def remove(self, name: str) -> Stage:
+        return self.stages.pop(self.index(name))
+
+    def replace(self, name: str, stage: Stage) -> None:
+        """Swaps the stage called name for another, which may have a different name."""
+        index = self.index(name)
+        self.stages.pop(index)
+        self.insert(index, stage)
+
+    def set_params(self, name: str, **params) -> None:
+        """Changes some parameters of the stage called name."""
+        self.replace(name, self[name].with_params(**params))
+
+    def _lookup(self, stage: Stage, key: str) -> Optional[Layers]:
+        if stage.name in self._memo and self._memo[stage.name][0] == key:
+            return self._memo[stage.name][1]
+        if self.cache is not None and key in self.cache:
+            return self.cache.get(key)
+        return None
+
+    def run(self, layers: Optional[Layers] = None) -> Layers:
+        """Runs every stage in order.
+
+        :param layers: Layers to start with, such as fixed inputs to the first stage
+        :return: Every layer given or provided by any stage, each at its latest version
+        """
+        layers = dict(layers) if layers else {}
+        digests = {name: _digest(layer) for name, layer in layers.items()}
+        self.timings = {}
+        self.cached = []
+
+        for stage in self.stages:
+            key = stage.key({name: digests.get(name) for name in stage.requires}, self.rngs)
+
+            start = time.perf_counter()
+            with tracing.span("Pipeline." + stage.name, "mapgen"):
+                outputs = self._lookup(stage, key)
+                if outputs is not None:
+                    self.cached.append(stage.name)
+                else:
+                    outputs = stage.run(layers, self.rngs)
+                    if self.cache is not None:
+                        self.cache.put(key, outputs)
+            self.timings[stage.name] = 1000 * (time.perf_counter() - start)
+
+            self._memo[stage.name] = (key, outputs)
+            layers.update(outputs)
+            digests.update((name, _digest(layer)) for name, layer in outputs.items())
+
+        return layers
@@ -0,0 +1,64 @@
+import random as rand
+import zlib
+import numpy as np
+
+from typing import Optional, Tuple, Union
+
+PathPart = Union[int, str]
+
+
+def fallback_rng() -> np.random.Generator:
+    """A Generator for callers given no stream, seeded from the random module so seeding that still makes
+    their output repeatable."""
+    return np.random.default_rng(rand.getrandbits(64))
+
+
+def _spawn_key_part(part: PathPart) -> int:
+    """Non-negative ints are used as they are. Strings are hashed past 2**32 so they can't collide with them."""
+    if isinstance(part, str):
+        return 2**32 + zlib.crc32(part.encode("utf-8"))
+    elif isinstance(part, (int, np.integer)) and part >= 0:
+        return int(part)
+    else:
+        raise ValueError("Stream path parts must be strings or non-negative ints; got {}".format(str(part)))
+
+
+class RngService:
+    """Hands out independent, seeded NumPy Generators, each named by a path such as ("level", 3, "room", 2, 1),
+    all derived from one master seed.
+
+    A stream depends only on the master seed and its path, never on which other streams were made first or in
+    which process. Work split across processes can therefore draw from its own stream and still come out the
+    same as a serial run."""
+    def __init__(self, master_seed: Optional[int] = None, path: Tuple[PathPart, ...] = ()):
+        """
+        :param master_seed: The seed every stream derives from. Defaults to fresh OS entropy.
+        :param path: A prefix prepended to the path of every stream this service hands out. See .child().
+        """
+        self.master_seed: int = master_seed if master_seed is not None else np.random.SeedSequence().entropy
+        self.path = tuple(path)
+        self._spawn_key = tuple(_spawn_key_part(part) for part in self.path)
+
+    def __repr__(self):
+        return "RngService({}, path={})".format(str(self.master_seed), str(self.path))
+
+    def seed_sequence(self, *path: PathPart) -> np.random.SeedSequence:
+        """The SeedSequence for a path, for handing to other processes or to libraries which take one."""
+        return np.random.SeedSequence(self.master_seed,
+                                      spawn_key=self._spawn_key + tuple(_spawn_key_part(part) for part in path))
+
+    def stream(self, *path: PathPart) -> np.random.Generator:
+        """A fresh Generator for a path. Asking for the same path twice gives two Generators in the same state."""
+        return np.random.default_rng(self.seed_sequence(*path))
+
+    def child(self, *path: PathPart) -> "RngService":
+        """A service whose streams all sit under path, to hand to a subsystem."""
+        return RngService(self.master_seed, self.path + path)
+
+    def level(self, depth: int) -> "RngService":
+        """The service for everything generated on one level of the dungeon."""
+        return self.child("level", depth)
+
+    def room(self, grid_x: int, grid_y: int) -> "RngService":
+        """The service for one room, named by its top-left cell on a map generator's grid."""
+        return self.child("room", grid_x, grid_y)
@@ -0,0 +1,60 @@
+import numpy as np
+
+from math import floor
+from typing import Tuple
+
+
+def inner_bounds(width: int, height: int, margin: float = .10) -> Tuple[int, int, int, int]:
+    """Returns (min_x, max_x, min_y, max_y), inclusive, of the map with margin of each axis trimmed from both
+    sides. The default keeps the inner 80%."""
+    min_x, max_x = floor(margin * width), min(floor((1 - margin) * width), width - 1)
+    min_y, max_y = floor(margin * height), min(floor((1 - margin) * height), height - 1)
+    return min_x, max_x, min_y, max_y
+
+
+def farthest_point_sample(points: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Greedily picks count rows of points, each as far as possible from those already picked.
+
+    The first pick is random. Each point's squared distance to its nearest pick is kept up to date with one
+    vectorised pass per pick, so this is O(count * len(points)) array work and no Python loop over pairs.
+
+    :param points: An (n, 2) integer array of (x, y)
+    :param count: How many to pick. At most n.
+    :return: The indices of the picked rows, in the order they were picked
+    """
+    points = np.asarray(points, dtype=np.int64)
+    xs, ys = points[:, 0].copy(), points[:, 1].copy()
+    count = min(count, len(points))
+    picks = np.empty(count, dtype=np.intp)
+    if count == 0:
+        return picks
+
+    def squared_distances(i):
+        dx, dy = xs - xs[i], ys - ys[i]
+        return dx * dx + dy * dy
+
+    picks[0] = rng.integers(0, len(points))
+    nearest = squared_distances(picks[0])
+    for i in range(1, count):
+        picks[i] = np.argmax(nearest)
+        np.minimum(nearest, squared_distances(picks[i]), out=nearest)
+    return picks
+
+
+def sample_centroids(width: int,
+                     height: int,
+                     count: int,
+                     rng: np.random.Generator,
+                     oversample: int = 5,
+                     margin: float = .10) -> np.ndarray:
+    """Returns count well-spread (x, y) tiles within the inner part of a map.
+
+    Rolls oversample times as many candidate tiles as are needed, all within inner_bounds(), then keeps the
+    farthest-point sample of them.
+
+    :return: A (count, 2) integer array of (x, y)
+    """
+    min_x, max_x, min_y, max_y = inner_bounds(width, height, margin)
+    candidates = np.stack((rng.integers(min_x, max_x, size=oversample * count, endpoint=True),
+                           rng.integers(min_y, max_y, size=oversample * count, endpoint=True)), axis=1)
+    return candidates[farthest_point_sample(candidates, count, rng)]
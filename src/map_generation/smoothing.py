@@ -0,0 +1,64 @@
+import numpy as np
+
+from typing import Sequence, Union
+from src.layers import BitLayer
+
+
+def neighbor_counts(alive: Union[np.ndarray, BitLayer]) -> np.ndarray:
+    """Returns how many of each cell's eight neighbors are True. Cells past the edge count as False."""
+    if isinstance(alive, BitLayer):
+        return alive.neighbor_counts()
+
+    height, width = alive.shape
+    padded = np.zeros((height + 2, width + 2), dtype=np.uint8)
+    padded[1:-1, 1:-1] = alive
+
+    counts = np.zeros((height, width), dtype=np.uint8)
+    for dy in (0, 1, 2):
+        for dx in (0, 1, 2):
+            if not (dx == 1 and dy == 1):
+                counts += padded[dy:dy + height, dx:dx + width]
+    return counts
+
+
+def cellular_automata(field: np.ndarray,
+                      born: Sequence[int] = (5, 6, 7, 8),
+                      survive: Sequence[int] = (4, 5, 6, 7, 8),
+                      iterations: int = 1) -> np.ndarray:
+    """Smooths the walls of a passability field, where False is a wall, with a born/survive cellular automaton.
+
+    Walls are the living cells: a wall with a survive count of wall neighbors stays, and an open tile with a born
+    count of wall neighbors is walled in. Only interior cells change; the border row and column are returned as
+    walls. Every cell is updated at once from the previous generation.
+
+    :param field: 2D boolean passability array, in [y][x] order. Not modified.
+    :param iterations: How many generations to run
+    :return: A new passability array
+    """
+    field = np.asarray(field, dtype=bool)
+    survive_lookup = np.isin(np.arange(9), survive)
+    born_lookup = np.isin(np.arange(9), born)
+
+    for i in range(iterations):
+        walls = ~field
+        counts = neighbor_counts(walls)
+        next_walls = np.where(walls, survive_lookup[counts], born_lookup[counts])
+
+        field = field.copy()
+        field[1:-1, 1:-1] = ~next_walls[1:-1, 1:-1]
+
+    field[0, :] = False
+    field[-1, :] = False
+    field[:, 0] = False
+    field[:, -1] = False
+    return field
+
+
+def walls_of(field: Union[np.ndarray, BitLayer]) -> Union[np.ndarray, BitLayer]:
+    """Returns where to draw walls around a passability field: every impassable tile which touches a passable
+    one, diagonals included. A BitLayer field gets a BitLayer back, worked out without unpacking it."""
+    if isinstance(field, BitLayer):
+        return ~field & field.dilate()
+
+    field = np.asarray(field, dtype=bool)
+    return ~field & (neighbor_counts(field) > 0)
@@ -0,0 +1,222 @@
+import numpy as np
+
+from typing import Optional, Tuple
+from src.map_generation.doors import distance_transform
+from src.map_generation.rng import fallback_rng
+
+Positions = Tuple[np.ndarray, np.ndarray]
+
+
+def alias_table(weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Builds Walker's alias table, with which each weighted draw is one uniform column pick and one coin flip.
+
+    Columns are filled a batch at a time. First every under-full column whose whole shortfall fits within one
+    over-full column's surplus takes it from there, found with cumulative sums. The few left straddling two
+    columns are then paired one-to-one with over-full columns as in Vose's method, which may leave those
+    under-full in turn for the next round.
+
+    :param weights: 1D array of non-negative weights, not all zero
+    :return: (prob, alias): column i is itself with probability prob[i], and otherwise alias[i]
+    """
+    n = len(weights)
+    prob = np.asarray(weights, dtype=np.float64) * n / np.sum(weights)
+    alias = np.arange(n)
+    small, large = np.flatnonzero(prob < 1), np.flatnonzero(prob >= 1)
+
+    while len(small) and len(large):
+        # Lay the shortfalls and surpluses end to end. A shortfall lying inside one surplus is filled from it.
+        deficit = 1 - prob[small]
+        ends = np.cumsum(deficit)
+        bounds = np.cumsum(prob[large] - 1)
+        donor = np.minimum(np.searchsorted(bounds, ends), len(large) - 1)
+        fits = ends - deficit >= np.concatenate(([0], bounds))[donor]
+
+        alias[small[fits]] = large[donor[fits]]
+        prob[large] -= np.bincount(donor[fits], weights=deficit[fits], minlength=len(large))
+
+        # Pair the rest one-to-one, Vose style
+        small = small[~fits]
+        k = min(len(small), len(large))
+        alias[small[:k]] = large[:k]
+        prob[large[:k]] -= 1 - prob[small[:k]]
+
+        flipped = prob[large] < 1
+        small = np.concatenate((small[k:], large[flipped]))
+        large = large[~flipped]
+
+    # Whatever's left is full, give or take rounding
+    prob[small] = 1
+    prob[large] = 1
+    return prob, alias
+
+
+def distance_from_walls(field: np.ndarray) -> np.ndarray:
+    """The Manhattan distance from each tile to the nearest impassable one, or off the map if that's nearer."""
+    height, width = field.shape
+    ys, xs = np.indices(field.shape)
+    to_edge = np.minimum(np.minimum(xs, width - 1 - xs), np.minimum(ys, height - 1 - ys)) + 1
+    if field.all():
+        return to_edge
+    return np.minimum(distance_transform(~field)[0], to_edge)
+
+
+def distance_from(shape: Tuple[int, int], x: int, y: int) -> np.ndarray:
+    """The straight-line distance from each tile of a map to x, y, such as the player spawn."""
+    ys, xs = np.indices(shape)
+    return np.hypot(xs - x, ys - y)
+
+
+class SpawnIndex:
+    """The tiles where things may spawn, held as flat index arrays with a weight each, for drawing spawn points
+    a whole batch at a time.
+
+    Draws with replacement use an alias table, built on first use, so each is O(1). Draws without replacement
+    use Efraimidis-Spirakis keys, and spaced draws throw batches of those as darts."""
+    def __init__(self, field: np.ndarray, weights: Optional[np.ndarray] = None):
+        """
+        :param field: 2D boolean array, in [y][x] order, of tiles where things may spawn
+        :param weights: 2D array, the shape of field, of how likely each tile is. Defaults to equally likely.
+                        Tiles weighted 0 are left out.
+        """
+        field = np.asarray(field, dtype=bool)
+        self.shape: Tuple[int, int] = field.shape
+
+        if weights is None:
+            self.tiles = np.flatnonzero(field)
+            self.weights = np.ones(len(self.tiles))
+        else:
+            weights = np.asarray(weights, dtype=np.float64)
+            if weights.shape != field.shape:
+                raise ValueError("weights must be the shape of field, {}; got {}"
+                                 .format(str(field.shape), str(weights.shape)))
+            if (weights[field] < 0).any():
+                raise ValueError("weights must not be negative")
+            self.tiles = np.flatnonzero(field & (weights > 0))
+            self.weights = weights.ravel()[self.tiles]
+
+        self._alias: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self.tiles)
+
+    @property
+    def mask(self) -> np.ndarray:
+        """The tiles in this index, as a 2D boolean array."""
+        mask = np.zeros(self.shape, dtype=bool)
+        mask.ravel()[self.tiles] = True
+        return mask
+
+    def _weight_grid(self) -> np.ndarray:
+        grid = np.zeros(self.shape)
+        grid.ravel()[self.tiles] = self.weights
+        return grid
+
+    def weighted(self, weights: np.ndarray) -> "SpawnIndex":
+        """A new index with each tile's weight multiplied by the matching tile of weights, such as
+        distance_from_walls() or distance_from() the player spawn."""
+        return SpawnIndex(self.mask, self._weight_grid() * weights)
+
+    def within(self, mask: np.ndarray) -> "SpawnIndex":
+        """A new index of only the tiles also in mask, such as one room's tiles or one connected region."""
+        return SpawnIndex(self.mask & mask, self._weight_grid())
+
+    def without(self, xs: np.ndarray, ys: np.ndarray) -> "SpawnIndex":
+        """A new index without the given tiles, such as ones already taken."""
+        mask = self.mask
+        mask[ys, xs] = False
+        return SpawnIndex(mask, self._weight_grid())
+
+    def _positions(self, tiles: np.ndarray) -> Positions:
+        ys, xs = np.divmod(tiles, self.shape[1])
+        return xs, ys
+
+    def _check(self, count: int, replace: bool = True) -> None:
+        if count < 0:
+            raise ValueError("count must not be negative; got {}".format(str(count)))
+        if count > 0 and not len(self):
+            raise ValueError("There are no tiles to spawn on")
+        if not replace and count > len(self):
+            raise ValueError("Can't draw {} distinct tiles from {}".format(str(count), str(len(self))))
+
+    def sample(self, count: int = 1, rng: Optional[np.random.Generator] = None) -> Positions:
+        """Draws count tiles by weight, with replacement.
+
+        :return: (xs, ys) arrays
+        """
+        self._check(count)
+        rng = rng if rng is not None else fallback_rng()
+        if self._alias is None:
+            self._alias = alias_table(self.weights)
+        prob, alias = self._alias
+
+        columns = rng.integers(0, len(self), size=count)
+        picks = np.where(rng.random(count) < prob[columns], columns, alias[columns])
+        return self._positions(self.tiles[picks])
+
+    def _keys(self, rng: np.random.Generator) -> np.ndarray:
+        """Efraimidis-Spirakis keys: ordering tiles by these, largest first, is a weighted draw without
+        replacement. They're log(u) / weight, the log of u ** (1 / weight), so tiny weights don't underflow."""
+        return np.log(rng.random(len(self))) / self.weights
+
+    def sample_distinct(self, count: int, rng: Optional[np.random.Generator] = None) -> Positions:
+        """Draws count different tiles by weight.
+
+        :return: (xs, ys) arrays, in the order they were drawn
+        """
+        self._check(count, replace=False)
+        rng = rng if rng is not None else fallback_rng()
+        keys = self._keys(rng)
+        top = np.argpartition(-keys, count - 1)[:count] if count else np.zeros(0, dtype=np.intp)
+        return self._positions(self.tiles[top[np.argsort(-keys[top])]])
+
+    def sample_spaced(self,
+                      count: int,
+                      min_distance: float,
+                      rng: Optional[np.random.Generator] = None) -> Positions:
+        """Draws up to count different tiles by weight, no two of them closer than min_distance.
+
+        Candidates come in Efraimidis-Spirakis order, a batch at a time. A candidate is kept if it's clear of
+        every tile kept so far, which is one lookup into a grid of blocked tiles, and of every earlier candidate
+        in its batch. Each kept tile then blocks the disc around it. Fewer than count come back if the field
+        fills up first.
+
+        :param min_distance: The least straight-line distance allowed between two drawn tiles
+        :return: (xs, ys) arrays, in the order they were drawn
+        """
+        self._check(count)
+        rng = rng if rng is not None else fallback_rng()
+        height, width = self.shape
+        order = self.tiles[np.argsort(-self._keys(rng))]
+
+        # Offsets covering the open disc of radius min_distance
+        reach = max(int(np.ceil(min_distance)) - 1, 0)
+        dy, dx = np.mgrid[-reach:reach + 1, -reach:reach + 1]
+        disc = dx * dx + dy * dy < min_distance * min_distance
+        dx, dy = dx[disc], dy[disc]
+
+        blocked = np.zeros(self.shape, dtype=bool)
+        kept = []
+        found = 0
+        start = 0
+        while found < count and start < len(order):
+            # Batches are capped, since checking a batch against itself is quadratic in its size
+            batch = order[start:start + min(max(2 * (count - found), 64), 1024)]
+            start += len(batch)
+            ys, xs = np.divmod(batch, width)
+
+            clear = ~blocked[ys, xs]
+            xs, ys = xs[clear], ys[clear]
+            if len(xs) > 1:
+                # Drop any candidate too close to an earlier one in the batch
+                close = (xs[:, np.newaxis] - xs) ** 2 + (ys[:, np.newaxis] - ys) ** 2 < min_distance * min_distance
+                clear = ~np.tril(close, -1).any(axis=1)
+                xs, ys = xs[clear], ys[clear]
+            xs, ys = xs[:count - found], ys[:count - found]
+
+            kept.append(ys * width + xs)
+            found += len(xs)
+            by, bx = ys[:, np.newaxis] + dy, xs[:, np.newaxis] + dx
+            inside = (0 <= by) & (by < height) & (0 <= bx) & (bx < width)
+            blocked[by[inside], bx[inside]] = True
+
+        return self._positions(np.concatenate(kept) if kept else np.zeros(0, dtype=np.intp))
@@ -1,9 +1,11 @@
 import tcod
+import numpy as np
 from typing import Iterable, Callable, List, Tuple, Optional, MutableSequence, Type
-from copy import deepcopy
-from math import floor
+from bisect import bisect_left, bisect_right
+from math import floor, ceil
 from src.inputs import PositionDelta
 from src.sigil import Sigil
+from src.instrumentation import latency
 
 # Custom type for an RGB color tuple
 RGB = Tuple[int, int, int]
@@ -12,6 +14,9 @@ RGB = Tuple[int, int, int]
 RenderableItem = Tuple[str, Tuple[int, int, int]]
 RenderableArray = MutableSequence[MutableSequence[RenderableItem]]
 
+# A pre-rendered block of (glyphs, colors) arrays in [y][x] order, shaped (h, w) and (h, w, 3).
+Tiles = Tuple[np.ndarray, np.ndarray]
+
 
 class MenuOption:
     """Represents a single row in a menu. Is able to render itself as a list of strings."""
@@ -84,94 +89,65 @@ class MenuOption:
         self._color = color
 
         self._highlight_icon = on_highlight_icon
+        self._highlighted = False
+
+        # Pre-rendered (glyphs, colors), or None if something it depends on has changed since.
+        self._tiles: Optional[Tiles] = None
 
     @property
     def text(self):
         """Returns the primary text for this menu option."""
         return self._text
 
-    @property
-    def rows(self) -> RenderableArray:
-        """Renders this menu option as a list of lists of (char, color_tuple), including margins/border/padding"""
+    def _render_tiles(self) -> Tiles:
+        """Renders this menu option, including its padding and border, into glyph and color arrays.
 
-        def char_to_tuple(char: str):
-            return char, self.color
-
-        def lines_to_tuples(lines_: List[List[str]]):
-            return [[char_to_tuple(char)
-                     for char in row]
-                    for row in lines_]
-
-        def pad_string(line: str):
-            """Center-align a specified string based on own width."""
-            text_width = len(line)
-            tgt_width = self._width
-            new_line = deepcopy(line)
-
-            # Pad it left or right based on evens/odds.
-            # Stagger the count by 1 so the modulus trick doesn't throw a div-by-zero error
-            # Developer confession: I don't know why "+3" fixes this.
-            for j in range(1, tgt_width - text_width + 3):
-                if j % 2:
-                    new_line = " " + new_line
-                else:
-                    new_line = new_line + " "
-
-            return new_line
-
-        # Get text, split it, and cast it to character lists. Also pad width.
-        str_lines: List[str] = [pad_string(s) for s in self._text.split("\n")]
-        lines: List[List[str]] = [[char for char in l] for l in str_lines]
-
-        # Pad empty string rows to top and bottom to match height.
-        # Iterator is offset by 1 to avoid div-by-0 error in the modulus
-        height_diff = self._height - len(lines)
-        for i in range(1, height_diff + 1):
-            new_row: List[str] = [" " for j in range(0, len(lines[0]))]
-            if i % 2:
-                lines = lines + [new_row]
-            else:
-                lines = [new_row] + lines
-
-        # TODO: Rewrite this padding business more sensibly
-
-        # Apply margins and border, if appropriate
-        # if self._pad_vertical:
-        #     for i in range(0, self._pad_vertical + 1):
-        #         # Pad top and bottom by one full row per pad_vertical
-        #         blank_row: List[str] = [" " for i in range(0, self._width + 2*self._pad_horizontal)]
-        #         lines.insert(0, blank_row)
-        #         lines.append(blank_row)
-        #
-        # if self._pad_horizontal:
-        #     for i in range(0, len(lines)):
-        #         # Pad left and right once each per pad_horizontal
-        #         lines[i]: str = " " + str(lines[i])
-        #         lines[i]: str = lines[i] + " "
+        Each line of text is centered in a row of width + 2 tiles, with any odd leftover space on
+        the left, and the lines are centered vertically with any odd leftover row on the bottom."""
+        lines: List[str] = self._text.split("\n")
+        row_width = self._width + 2
+
+        glyphs = np.full(shape=(self._height, row_width), fill_value=ord(" "), dtype=np.int32)
+        colors = np.empty(shape=(self._height, row_width, 3), dtype=np.uint8)
+        colors[:] = self.color
+
+        top = floor(max(self._height - len(lines), 0) / 2)
+        for i, line in enumerate(lines[:self._height]):
+            left = ceil((self._width - len(line) + 2) / 2)
+            codepoints = np.frombuffer(line.encode("utf-32-le"), dtype=np.uint32)
+            glyphs[top + i, left:left + len(codepoints)] = codepoints
 
         if self._has_border:
-            # If this MenuOption has a border, construct and write that into the edge characters.
+            # If this MenuOption has a border, write it into the edge tiles.
             # This should, as per value testing, only run if there's padding to safely write in.
+            glyphs[:, 0] = ord("│")
+            glyphs[:, -1] = ord("│")
+            glyphs[0, :] = ord("─")
+            glyphs[-1, :] = ord("─")
+            glyphs[0, 0], glyphs[0, -1] = ord("┌"), ord("┐")
+            glyphs[-1, 0], glyphs[-1, -1] = ord("└"), ord("┘")
 
-            # Insert side borders
-            for i in range(0, len(lines)):
-                lines[i][0] = "│"
-                lines[i][-1] = "│"
+        return glyphs, colors
 
-            # Generate and append top and bottom borders
-            new_top = ["─" for i in lines[0]]
-            new_top[0] = "┌"
-            new_top[-1] = "┐"
+    @property
+    def tiles(self) -> Tiles:
+        """Returns this menu option pre-rendered as (glyphs, colors) arrays in [y][x] order.
+        Only re-rendered after its text, color, subtext or highlight state changes."""
+        if self._tiles is None:
+            self._tiles = self._render_tiles()
+        return self._tiles
 
-            new_bottom = ["─" for i in lines[0]]
-            new_bottom[0] = "└"
-            new_bottom[-1] = "┘"
+    def invalidate(self) -> None:
+        """Drops the pre-rendered tiles. Call if a subclass changes anything else that affects rendering."""
+        self._tiles = None
 
-            lines[0] = new_top
-            lines[-1] = new_bottom
-            # print(lines)
-            # Convert characters to (char, (r, g, b)) format
-            return lines_to_tuples(lines)
+    @property
+    def rows(self) -> RenderableArray:
+        """Renders this menu option as a list of lists of (char, color_tuple), including margins/border/padding"""
+        glyphs, colors = self.tiles
+        return [[(chr(glyphs[y, x]), tuple(int(c) for c in colors[y, x]))
+                 for x in range(0, glyphs.shape[1])]
+                for y in range(0, glyphs.shape[0])]
 
     @property
     def size(self) -> Tuple[int, int]:
@@ -188,6 +164,7 @@ class MenuOption:
                                          pad_vertical=self._pad_vertical)
         if fits:
             self._text = text
+            self._tiles = None
         else:
             raise ValueError("Assigned text does not fit in the dimensions of this MenuOption")
 
@@ -213,7 +190,9 @@ class MenuOption:
         for c in (r, g, b):
             if not 0 <= c <= 255:
                 raise ValueError("RGB values must be in range 0-255. Got {}".format(str(new_rgb)))
-        self._color = new_rgb
+        if new_rgb != self._color:
+            self._color = new_rgb
+            self._tiles = None
 
     @property
     def subtext(self) -> str:
@@ -221,16 +200,27 @@ class MenuOption:
 
     @subtext.setter
     def subtext(self, st: str):
-        self._subtext = st
+        if st != self._subtext:
+            self._subtext = st
+            self._tiles = None
+
+    @property
+    def highlighted(self) -> bool:
+        """Whether this menu option currently has the menu's cursor."""
+        return self._highlighted
 
     def on_gets_cursor(self):
         """Run when the player highlights this menu option.
         By default, turns the selection .color green. Override to add more interesting logic."""
+        self._highlighted = True
+        self._tiles = None
         self.color = (25, 230, 25)
 
     def on_loses_cursor(self):
         """Run when the player moves from highlighting this menu option to highlighting another.
         By default, turns the selection .color white. Override to add more interesting logic."""
+        self._highlighted = False
+        self._tiles = None
         self.color = (255, 255, 255)
 
 
@@ -381,6 +371,7 @@ class Menu:
         """Sets the spacing between selections for this menu, if given an integer value of at least zero tiles."""
         if spacing >= 0:
             self._spacing = spacing
+            self._recompute_offsets()
         else:
             raise ValueError(".spacing must be an integer of at least zero tiles--given {}".format(str(spacing)))
 
@@ -424,10 +415,12 @@ class Menu:
     def clear(self) -> None:
         """Removes all contents. Irreversible."""
         self._contents = []
+        self._recompute_offsets()
 
     def add_option(self, opt: MenuOption):
         """Add a menu option to the end of this menu's list of contents."""
-        self._contents = [] + self._contents + [opt]
+        self._contents.append(opt)
+        self._append_offset(opt)
 
         # If this is the first or only element in the menu contents,
         # then be sure to fire its on_gets_cursor method.
@@ -438,6 +431,24 @@ class Menu:
     def remove_option(self, opt: MenuOption):
         if opt in self._contents:
             self._contents.remove(opt)
+            self._recompute_offsets()
+
+    def _append_offset(self, opt: MenuOption) -> None:
+        """Records the top and bottom rows of a newly appended option, relative to the top of the first option."""
+        top = self._bottoms[-1] + self._spacing if self._bottoms else 0
+        self._offsets.append(top)
+        self._bottoms.append(top + opt.size[1])
+
+    def _recompute_offsets(self) -> None:
+        """Rebuilds every option's top and bottom rows, and pulls the selection and scroll window back in range."""
+        self._offsets: List[int] = []
+        self._bottoms: List[int] = []
+        for opt in self._contents:
+            self._append_offset(opt)
+
+        last = max(len(self._contents) - 1, 0)
+        self._selected = min(getattr(self, "_selected", 0), last)
+        self._scroll_top = min(getattr(self, "_scroll_top", 0), self._selected)
 
     def open_menu(self) -> None:
         """Set this menu as the last element of the interface menus list"""
@@ -455,7 +466,8 @@ class Menu:
                  contents: Optional[Iterable[MenuOption]] = (),
                  color: RGB = (255, 255, 255),
                  dispatch: tcod.event.EventDispatch = None,
-                 is_full_screen: bool = False):
+                 is_full_screen: bool = False,
+                 virtualised: bool = False):
         """
         Generate a new menu with specified dimensions.
         :param width: Total width of the menu, in tiles
@@ -464,6 +476,8 @@ class Menu:
         :param spacing: How many empty rows to draw between each menu item
         :param padding: A tuple of (top, right, bottom, left), in tiles with which to pad the menu
         :param contents: An iterable of MenuOption instances, in order, to be added to this menu. Can be empty.
+        :param virtualised: If True, only the options inside a scroll window that follows the selection are laid out,
+                            so drawing and scrolling cost the same no matter how many options the menu has.
         """
         # Ensure width and height are both at least one tile
         if sum([dim > 0 for dim in (width, height)]) == 2:
@@ -504,6 +518,13 @@ class Menu:
         # The index of the currently selected menu_option.
         self._selected: int = 0
 
+        # In virtualised mode, the index of the first option inside the visible scroll window.
+        self._virtualised = virtualised
+        self._scroll_top: int = 0
+
+        # Each option's top and bottom rows, relative to the top of the first option.
+        self._recompute_offsets()
+
         # Assigns a flag to be used by the open_menu logic to eventually break the menu loop
         self._is_open = False
 
@@ -525,27 +546,41 @@ class Menu:
         """Changes the selection based on the dy of a PositionDelta.
         Also implements looping behavior."""
         num_options = len(self._contents)
-        y_max = num_options - 1  # Minus 1, because it's an index.
-        dy = deepcopy(delta.dy)
-        y0 = self.selected
-        y1 = y0+dy
-
-        # If y1 is past the end of the list indices, loop back.
-        if y1 >= 0:
-            while y1 > y_max:
-                y1 -= num_options
-
-        # In the case y1 is a negative index, loop back until it's smaller than
-        if y1 < 0:
-            y1_neg = -y1
-            while y1_neg > y_max:
-                y1_neg -= num_options
-            y1 = num_options - y1_neg
+        y1 = (self.selected + delta.dy) % num_options
 
         self._contents[self._selected].on_loses_cursor()
         self._selected = y1
         self._contents[self._selected].on_gets_cursor()
 
+        self._scroll_to_selection()
+        latency.mark("menu_selection")
+
+    @property
+    def virtualised(self) -> bool:
+        """Whether this menu only lays out the options inside its scroll window."""
+        return self._virtualised
+
+    @property
+    def _window_height(self) -> int:
+        """The number of rows available to options, inside the top and bottom padding."""
+        return self._height - self.pad_top - self.pad_bottom
+
+    def _scroll_to_selection(self) -> None:
+        """Moves the scroll window just far enough that the selected option is fully inside it."""
+        sel = self._selected
+        if sel < self._scroll_top:
+            self._scroll_top = sel
+        elif self._bottoms[sel] > self._offsets[self._scroll_top] + self._window_height:
+            # The first option whose top is low enough that the selected option's bottom still fits
+            self._scroll_top = min(bisect_left(self._offsets, self._bottoms[sel] - self._window_height), sel)
+
+    def visible_range(self) -> Tuple[int, int]:
+        """Returns the (start, stop) indices of the options inside the virtualised scroll window.
+        At least the first option in the window is always included, even if it doesn't fit."""
+        top = self._scroll_top
+        stop = bisect_right(self._bottoms, self._offsets[top] + self._window_height)
+        return top, max(stop, top + 1)
+
     @property
     def dispatch(self) -> tcod.event.EventDispatch:
         return self._dispatch
@@ -558,31 +593,13 @@ class Menu:
             raise ValueError("d must be a subclass of tcod.event.EventDispatch, got {}"
                              .format(str(d)))
 
-    def render_menu(self, x0: int, y0: int) -> List[Tuple[int, int, Sigil]]:
-        """
+    def layout(self, x0: int, y0: int) -> List[Tuple[int, int, MenuOption]]:
+        """Determines which menu options are visible and where to draw them.
 
         :param x0 - The x component of the top-left corner of this menu
         :param y0 - The y component of the top-left corner of this menu
+        :return: A list of (x, y, MenuOption), where x and y are the console position of the option's top-left tile.
         """
-        def rows_to_drawables(x_0: int, y_0: int, opt_rows: RenderableArray) -> List[Tuple[int, int, Sigil]]:
-            """
-
-            :param x_0: The x component of the top-left corner of this set of things to be drawn
-            :param y_0: The y component of the top-left corner of this set of things to be drawn
-            :param opt_rows: A batch of rows (usually given by a MenuObject) to be drawn
-            :return: A list of (x, y, Sigil) tuples, where x and y are true console positions.
-            """
-            drawables_ = []
-            for dy in range(0, len(opt_rows)):  # dy is both change from y0 and our row iterator
-                for dx in range(0, len(opt_rows[dy])):  # same for dx, x0, and our our column iterator
-                    char = opt_rows[dy][dx][0]
-                    color = opt_rows[dy][dx][1]
-                    drawables_.append((x_0 + dx,
-                                      y_0 + dy,
-                                      Sigil(char,
-                                            color=color)))
-            return drawables_
-
         h = self._height
         w = self._width
 
@@ -591,6 +608,12 @@ class Menu:
         if not self.contents:
             raise Exception("Tried to open an empty menu.")
 
+        if self._virtualised:
+            start, stop = self.visible_range()
+            top = self._offsets[start]
+            return [(x0, y0 + self.pad_top + self._offsets[i] - top, self._contents[i])
+                    for i in range(start, stop)]
+
         # Left offset should be left pad, plus 1/2 rounded down of half of the diff
         # between working width and option width. -1 'cause we want corresponding index.
         # TODO: Make .width/.height getters or find a more graceful way of doing this.
@@ -616,11 +639,25 @@ class Menu:
             else:
                 opts = self.contents[self._selected - 1:self._selected + num_opts - 1]
 
+        return [(x0, y0 + locations[i][1], opts[i])
+                for i in range(0, len(opts))]
+
+    def render_menu(self, x0: int, y0: int) -> List[Tuple[int, int, Sigil]]:
+        """Renders the visible menu options as individual drawables.
+        Prefer blitting each option's .tiles at the positions given by .layout().
+
+        :param x0 - The x component of the top-left corner of this menu
+        :param y0 - The y component of the top-left corner of this menu
+        :return: A list of (x, y, Sigil) tuples, where x and y are true console positions.
+        """
         drawables: List[Tuple[int, int, Sigil]] = []
-        for i in range(0, len(opts)):
-            rows = opts[i].rows
-            pos = locations[i]
-            drawables += rows_to_drawables(x_0=x0, y_0=y0 + pos[1], opt_rows=rows)
+        for x_0, y_0, opt in self.layout(x0, y0):
+            glyphs, colors = opt.tiles
+            for (dy, dx), glyph in np.ndenumerate(glyphs):
+                drawables.append((x_0 + dx,
+                                  y_0 + dy,
+                                  Sigil(chr(glyph),
+                                        color=tuple(int(c) for c in colors[dy, dx]))))
 
         return drawables
 
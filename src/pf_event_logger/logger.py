@@ -1,5 +1,6 @@
 from typing import Optional
 import sqlite3
+from src.instrumentation import metrics
 
 
 def _initialize_pf_db(c: sqlite3.Cursor):
@@ -97,8 +98,7 @@ class PFEventLogger:
         self.playfield = playfield
 
         self.conn = sqlite3.connect(":memory:")
-        with self.conn.cursor() as c:
-            _initialize_pf_db(c)
+        _initialize_pf_db(self.conn.cursor())
 
         if from_db:
             from_db.backup(self.conn)
@@ -112,8 +112,9 @@ class PFEventLogger:
         else:
             tgt = "{}/{}.db".format(dir_path, filename)
 
-        tgt_conn = sqlite3.connect(tgt)
-        self.conn.backup(tgt_conn)
+        with metrics.span("logger.write_to_disk"):
+            tgt_conn = sqlite3.connect(tgt)
+            self.conn.backup(tgt_conn)
 
     def cursor(self) -> sqlite3.Cursor:
         """Returns a fresh cursor from this logger's (probably in-memory) database connection."""
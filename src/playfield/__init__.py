@@ -1,5 +1,5 @@
-__all__ = ["Cell", "PlayField"]
+__all__ = ["Cell", "PlayField", "VOID", "FLOOR", "WALL"]
 
 from .cell import Cell
-from .play_field import PlayField
+from .play_field import PlayField, VOID, FLOOR, WALL
 
@@ -19,10 +19,12 @@ class Cell:
         """Returns an iterable of the highest-priority sigil or sigils in this cell."""
 
         # DEVNOTE: The idea is to cycle through top sigils for a given rendered tile on the map
-        if len(self.contents) > 0:
+        terrain = self._parent.terrain_at(self._x, self._y)
+        drawn = self.contents + [terrain] if terrain else self.contents
+        if len(drawn) > 0:
             # Get the highest sigil priority from all (sigil, priority)
             # tuples, then return a list of sigils with that priority.
-            sigils = [(entity.sigil, entity.sigil.priority) for entity in self.contents]
+            sigils = [(entity.sigil, entity.sigil.priority) for entity in drawn]
             max_value = max([s[1] for s in sigils])
 
             top_sigils = [s[0]
@@ -79,8 +81,11 @@ class Cell:
 
     @property
     def passable(self) -> bool:
-        """If this cell is empty, or it's not empty but none of its contents are impassable, then it's passable."""
-        if not self.contents:
+        """If this cell is empty, or it's not empty but none of its contents are impassable, then it's passable.
+        The terrain under it counts too."""
+        if not self._parent.passability[self._y, self._x]:
+            return False
+        elif not self.contents:
             return True
         elif sum([c.passable for c in self.contents]) != len(self.contents):
             return False
@@ -1,23 +1,36 @@
 from typing import Optional, Iterable, Tuple, List, Dict
 from src.entity import Entity
 from src.entity.entities import Static, Mobile
+from src.entity.landscape import WalkableTerrain, Wall
 from src.inputs import GameplayHandler
-from src.animation import Animation, AnimationFrame, OverlappingSigilAnimation
 from tcod.event import EventDispatch
 from math import floor
 from .cell import Cell
 from src.pf_event_logger import PFEventLogger
+from src.instrumentation import metrics, tracing
+from src.layers import BitLayer, LayerStore
 import numpy as np
 
 # Aliased class for type hinting. It's a class that's not uppercase.
 # But also Numpy is so major we're just not going to question it.
 ArrayLike = np.ndarray
 
+# Terrain codes for the layers given to PlayField.from_layers, and the keys of its terrain palette
+VOID = 0   # Nothing at all
+FLOOR = 1  # Passable tiles of the field
+WALL = 2   # The walls around them
+
 
 class PlayField:
     """Contains an easily-accessed two-dimensional array of Cell objects.
     Stored in [y][x] order of ordinal position."""
 
+    # How many frames each of a cell's tied top sigils is shown before cycling to the next.
+    overlap_period: int = 10
+
+    # How many rows of terrain from_layers() lays out at a time, so big levels needn't be unpacked all at once
+    layer_band: int = 256
+
     def __init__(self, width: int, height: int,
                  interface,
                  # Should only be special in that we pause sim when the PC's cooldown==0
@@ -26,13 +39,17 @@ class PlayField:
                  window_height: int = 0, window_width: int = 0,
                  window_x0: int = 0, window_y0: int = 0,
                  dispatch: Optional[EventDispatch] = None,
-                 contents: Optional[Iterable[Tuple[int, int, Entity]]] = ()):
+                 contents: Optional[Iterable[Tuple[int, int, Entity]]] = (),
+                 layer_store: Optional[LayerStore] = None):
         """
         Initialize a new PlayField of given dimensions, optionally with an iterable of initial entities.
 
         :param width: Width of the PlayField, in tiles
         :param height: Height of the PlayField, in tiles
         :param contents: A list of (x, y, entity) tuples containing entities and where to spawn them.
+        :param layer_store: Where to keep the terrain layer, memory-mapped from a file rather than in memory.
+                            Terrain of the right shape already in the store is taken up as it is, which is how a
+                            saved level is loaded; see from_store(). Call flush() to save.
         """
         if width < 2 or height < 2:
             raise ValueError("Width and height must be at least 2 each!")
@@ -47,20 +64,24 @@ class PlayField:
 
         self._animations: List = []
 
-        # Iteratively create the Cell field and cast it to a NumPy array
-        __field = []
-        for y in range(0, self._height):
-            # Create a row which includes one cell, in order,
-            # for every tile between 0 and the opposite map edge.
-            row = [Cell(x=x,
-                        y=y,
-                        parent=self)
-                   for x in range(0, self._width)]
-
-            # Then append it to the field.
-            __field += [row]
-        self._field = np.array(__field,
-                               dtype=Cell)
+        # Cells are only made when something first asks for one; until then a tile's slot in the field is None.
+        self._field = np.full((self._height, self._width), None, dtype=object)
+        self._cells: List[Cell] = []
+
+        # Terrain is a code per tile, looked up in the palette for the shared entity it stands for.
+        # Code 0 is always nothing. See from_layers().
+        self._terrain_palette: List[Optional[Entity]] = [None]
+        self._layer_store = layer_store
+        # Which tiles the terrain lets things through, packed, and kept up to date by paint_terrain(). Blank terrain
+        # is all passable; loaded terrain isn't known until it's read, so that waits until passability is asked for.
+        self._passable: Optional[BitLayer] = BitLayer.ones(self._height, self._width)
+        if layer_store is None:
+            self._terrain = np.zeros((self._height, self._width), dtype=np.uint8)
+        elif "terrain" in layer_store and layer_store.shape("terrain") == (self._height, self._width):
+            self._terrain = layer_store.load("terrain")
+            self._passable = None
+        else:
+            self._terrain = layer_store.create("terrain", (self._height, self._width), np.uint8)
 
         for x, y, e in contents:
             # Add each provided entity (e) into its specified location
@@ -84,6 +105,143 @@ class PlayField:
         elif self._interface:
             self._dispatch = GameplayHandler(interface=interface)
 
+    @classmethod
+    def from_layers(cls,
+                    interface,
+                    walls: ArrayLike,
+                    field: ArrayLike,
+                    terrain_palette: Optional[Dict[int, Entity]] = None,
+                    contents: Optional[Iterable[Tuple[int, int, Entity]]] = (),
+                    **kwargs) -> "PlayField":
+        """Builds a whole level at once from a map generator's boolean layers.
+
+        Walls and floors become terrain: one code per tile, filled in with array operations, each standing for one
+        shared entity from the palette. Only the things in contents, such as doors and mobs, are real entities
+        placed one by one.
+
+        :param walls: 2D boolean array or BitLayer, in [y][x] order, of where to draw walls. Walls win over field.
+        :param field: 2D boolean array or BitLayer, the shape of walls, of passable tiles to floor
+        :param terrain_palette: The entity to draw for each terrain code. Defaults to a plain WalkableTerrain for
+                                FLOOR and a Wall for WALL.
+        :param contents: (x, y, entity) of everything else to place
+        :param kwargs: Passed on to PlayField(), such as player_character and pc_spawn_point
+        """
+        # Packed layers are unpacked a band of rows at a time, below
+        walls = walls if isinstance(walls, BitLayer) else np.asarray(walls, dtype=bool)
+        field = field if isinstance(field, BitLayer) else np.asarray(field, dtype=bool)
+        if walls.shape != field.shape:
+            raise ValueError("walls and field must be the same shape; got {} and {}"
+                             .format(str(walls.shape), str(field.shape)))
+
+        height, width = walls.shape
+        pf = cls(width, height, interface=interface, **kwargs)
+
+        palette = terrain_palette if terrain_palette is not None else {FLOOR: WalkableTerrain(), WALL: Wall()}
+        for y0 in range(0, height, cls.layer_band):
+            y1 = min(y0 + cls.layer_band, height)
+            band_walls = np.asarray(walls[y0:y1, :], dtype=bool)
+            terrain = np.full(band_walls.shape, VOID, dtype=np.uint8)
+            terrain[np.asarray(field[y0:y1, :], dtype=bool)] = FLOOR
+            terrain[band_walls] = WALL
+            pf.paint_terrain(terrain, palette, 0, y0)
+
+        for x, y, e in contents:
+            e.introduce_at(x, y, pf)
+        return pf
+
+    @classmethod
+    def from_store(cls,
+                   interface,
+                   layer_store: LayerStore,
+                   terrain_palette: Dict[int, Entity],
+                   contents: Optional[Iterable[Tuple[int, int, Entity]]] = (),
+                   **kwargs) -> "PlayField":
+        """Loads a level whose terrain was saved to a LayerStore, by mapping it rather than reading it.
+
+        :param terrain_palette: The entity to draw for each terrain code, which aren't themselves saved
+        :param contents: (x, y, entity) of everything else to place
+        :param kwargs: Passed on to PlayField(), such as player_character and pc_spawn_point
+        """
+        if "terrain" not in layer_store:
+            raise ValueError("There's no terrain in the layer store at {}".format(str(layer_store.directory)))
+        height, width = layer_store.shape("terrain")
+        pf = cls(width, height, interface=interface, layer_store=layer_store, **kwargs)
+        pf._set_palette(terrain_palette)
+
+        for x, y, e in contents:
+            e.introduce_at(x, y, pf)
+        return pf
+
+    def flush(self) -> None:
+        """Saves the terrain to the layer store, if there is one. Only the pages which changed are written."""
+        if self._layer_store is not None:
+            self._layer_store.flush()
+
+    def paint_terrain(self, terrain: ArrayLike, palette: Dict[int, Entity], x0: int = 0, y0: int = 0) -> None:
+        """Overwrites a block of terrain codes, clipped to the playfield, and adds palette entries for them.
+
+        :param terrain: 2D integer array of terrain codes, in [y][x] order. Code 0 is nothing.
+        :param palette: The shared entity to draw for each code in terrain. Entries replace any already given.
+        :param x0: Where the block's top-left corner goes
+        :param y0: Likewise
+        """
+        self._set_palette(palette)
+
+        terrain = np.asarray(terrain)
+        x_start, x_stop = max(x0, 0), min(x0 + terrain.shape[1], self.width)
+        y_start, y_stop = max(y0, 0), min(y0 + terrain.shape[0], self.height)
+        if x_start < x_stop and y_start < y_stop:
+            block = terrain[y_start - y0:y_stop - y0, x_start - x0:x_stop - x0]
+            self._terrain[y_start:y_stop, x_start:x_stop] = block
+            if self._passable is not None:
+                self._passable[y_start:y_stop, x_start:x_stop] = self._passable_codes()[block]
+
+    def _set_palette(self, palette: Dict[int, Entity]) -> None:
+        for code, entity in palette.items():
+            if not 0 < code < 256:
+                raise ValueError("Terrain codes must be in range 0 < code < 256, given {}".format(str(code)))
+            if code >= len(self._terrain_palette):
+                self._terrain_palette += [None] * (code + 1 - len(self._terrain_palette))
+
+            # Tiles already painted with this code may have changed passability, so the layer has to be rebuilt
+            previous = self._terrain_palette[code]
+            if previous is not None and (entity is None or entity.passable) != previous.passable:
+                self._passable = None
+            self._terrain_palette[code] = entity
+
+    def _passable_codes(self) -> np.ndarray:
+        """Whether each terrain code lets things through, indexed by code."""
+        return np.array([entity is None or entity.passable for entity in self._terrain_palette])
+
+    @property
+    def terrain(self) -> ArrayLike:
+        """The terrain code of every tile, in [y][x] order. Read-only; use paint_terrain() to change it."""
+        view = self._terrain.view()
+        view.flags.writeable = False
+        return view
+
+    def terrain_at(self, x: int, y: int) -> Optional[Entity]:
+        """Returns the shared terrain entity drawn at x, y, or None if there's none."""
+        # paint_terrain() fills in the palette before any code is used, so every code has an entry
+        return self._terrain_palette[self._terrain.item(y, x)]
+
+    @property
+    def passability(self) -> BitLayer:
+        """Which tiles the terrain lets things through, packed: every tile but those painted with impassable
+        terrain. Entities standing on the tiles aren't counted; ask Cell.passable for those.
+        Read-only; use paint_terrain() to change it."""
+        if self._passable is None:
+            # Built a band of rows at a time, like from_layers(), so a mapped level isn't unpacked all at once
+            codes = self._passable_codes()
+            self._passable = BitLayer.zeros(self._height, self._width)
+            for y0 in range(0, self._height, self.layer_band):
+                y1 = min(y0 + self.layer_band, self._height)
+                self._passable[y0:y1, :] = codes[self._terrain[y0:y1]]
+
+        view = self._passable.packed.view()
+        view.flags.writeable = False
+        return BitLayer.wrap(view, self._width)
+
     @property
     def shape(self) -> Tuple[int, int]:
         """Returns the shape of this playfield in terms of (width, height)"""
@@ -99,7 +257,12 @@ class PlayField:
         x_lim = self.width - 1
         y_lim = self.height - 1
         if 0 <= x <= x_lim and 0 <= y <= y_lim:
-            return self._field[y][x]
+            cell = self._field[y, x]
+            if cell is None:
+                cell = Cell(x=x, y=y, parent=self)
+                self._field[y, x] = cell
+                self._cells.append(cell)
+            return cell
         else:
             raise ValueError("Location (x:{}, y:{}) is out of bounds!"
                              .format(str(x), str(y)))
@@ -121,26 +284,21 @@ class PlayField:
             c = [self.get_cell(x, y) for x, y in cells if x and y]
             return c
         else:
-            # Return all cells in this PlayField
-            c = []
-            for row in self._field:
-                for value in row:
-                    c += [value]
-            return c
+            # Return all cells in this PlayField, making any which haven't been yet
+            return [self.get_cell(x, y) for y in range(0, self.height) for x in range(0, self.width)]
 
     def has_cell(self, cell: Cell) -> bool:
-        """Skims the _field arrays for any instance of the specified Cell.
+        """Checks whether the specified Cell is one of this playfield's.
         :param cell An instance of playfield.Cell"""
+        x, y = cell.position
+        return 0 <= x < self.width and 0 <= y < self.height and self._field[y, x] is cell
 
-        def row_has_cell(r) -> bool:
-            return cell in r
+    def drawables(self, center_on: Tuple[int, int], frame: int = 0) -> List[Dict]:
+        """Render own cells into an iterable which can be printed to a console line by line.
 
-        return True in [row_has_cell(row) for row in self._field]
+        :param center_on: The (x, y) playfield position on which to center the view.
+        :param frame: The interface's running frame counter, used to cycle cells with tied top sigils."""
 
-    def drawables(self, center_on: Tuple[int, int]) -> List[Dict]:
-        """Render own cells into an iterable which can be printed to a console line by line."""
-
-        # TODO: Implement animations here as an alternative to just showing the first top sigil
         console_x0, console_y0 = self.origin  # The top-left console tile in which the window is drawn
         console_x_max, console_y_max = self.window  # The maximum height and width we can render at once
 
@@ -166,25 +324,31 @@ class PlayField:
                             if y < self.height]
 
         # Flatten the array of positions and request corresponding Cell instances
-        flat_window_positions = sum(window_positions, [])
+        flat_window_positions = [pos for row in window_positions for pos in row]
         cells: List[Cell] = self.get_cells(cells=flat_window_positions)
 
-        drawables = [{"x": c.position[0] - window_x0 + 1,
-                      "y": c.position[1] - window_y0 + 1,
-                      "character": c.sigils[0].character,
-                      "priority": c.sigils[0].priority,
-                      "rgb": c.sigils[0].color}
-                     for c in cells
-                     if c.contents and len(c.contents) != 0]
+        drawables = []
+        for c in cells:
+            sigils = c.sigils
+            if not sigils:
+                continue
+
+            # Cells with several tied top sigils cycle through them, one every overlap_period frames.
+            sigil = sigils[(frame // self.overlap_period) % len(sigils)]
+            drawables.append({"x": c.position[0] - window_x0 + 1,
+                              "y": c.position[1] - window_y0 + 1,
+                              "character": sigil.character,
+                              "priority": sigil.priority,
+                              "rgb": sigil.color})
 
         return drawables
 
     @property
     def entities(self) -> List[Entity]:
-        cells = self.get_cells()
-
+        """Every entity placed on this playfield. Terrain isn't included, as it's shared rather than placed."""
+        # Only cells which have been made can hold anything.
         # Extract contents from each non-empty cell and flatten them into one list
-        ent_lists = [c.contents for c in cells if c.contents]
+        ent_lists = [c.contents for c in self._cells if c.contents]
         flat_ents = sum(ent_lists, [])
 
         return flat_ents
@@ -253,9 +417,11 @@ class PlayField:
 
     def tick(self) -> None:
         """Calls .tick on all child cells' entities, then updates own animations/delays/etc"""
-        mobs = self.mobiles
-        for m in mobs:
-            m.tick()
+        with metrics.span("tick.playfield"):
+            mobs = self.mobiles
+            for m in mobs:
+                with tracing.span("Mobile.tick", "sim"):
+                    m.tick()
 
     @property
     def player_character(self) -> Mobile:
@@ -271,35 +437,3 @@ class PlayField:
     @property
     def interface(self):
         return self._interface
-
-    def draw_overlap_animations(self, center_on: Tuple[int, int]):
-        """Tell the interface to make an animation for each cell with more than one top sigil."""
-        win_h, win_w = self.window
-        center_x, center_y = center_on
-
-        window_x0 = max(floor(center_x - 0.5 * self.window[0]), 0)
-        window_y0 = max(floor(center_y - 0.5 * self.window[1]), 0)
-
-        # Gather a 2D list of visible (x, y) pairs and then flatten it
-        visible_positions = sum([[(x, y)
-                                  for x in range(window_x0, win_w)]
-                                 for y in range(window_y0, win_h)],
-                                [])
-
-        # Gather a list of cells in those positions which have more than one top-priority sigil
-        cells = [c for c in self.get_cells(cells=visible_positions)
-                 if len(c.sigils) > 1]
-        for c in cells:
-            frames_per_item = 10
-            frames = [AnimationFrame(sig, frames_per_item)
-                      for sig in c.sigils]
-            anim = OverlappingSigilAnimation(frames, repeating=True)
-
-            # Add the animation at the cell's position, subtracting the window adjustment from each dimension.
-            cell_x, cell_y = c.position
-            anim_positions = [(x, y) for x, y, anim in self.interface.animations]
-
-            anim_x, anim_y = cell_x - window_x0, cell_y - window_y0
-
-            if not ((anim_x, anim_y) in anim_positions):
-                self.interface.add_animation(anim_x, anim_y, anim)
\ No newline at end of file
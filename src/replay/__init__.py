@@ -0,0 +1,3 @@
+__all__ = ["InputRecorder", "InputReplayer"]
+
+from .recording import InputRecorder, InputReplayer
@@ -0,0 +1,125 @@
+import gzip
+import json
+import tcod
+from time import time_ns
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Bumped whenever the recording format changes in a way older replayers can't read.
+FORMAT_VERSION = 1
+
+EventSource = Callable[[], Iterable[tcod.event.Event]]
+
+
+def _event_to_record(event: tcod.event.Event) -> Optional[dict]:
+    """Returns a JSON-able dict describing an input event, or None if it isn't one we replay."""
+    if isinstance(event, (tcod.event.KeyDown, tcod.event.KeyUp)):
+        return {"type": event.type,
+                "scancode": int(event.scancode),
+                "sym": int(event.sym),
+                "mod": int(event.mod),
+                "repeat": bool(event.repeat)}
+    elif isinstance(event, tcod.event.Quit):
+        return {"type": event.type}
+    else:
+        return None
+
+
+def _record_to_event(record: dict) -> tcod.event.Event:
+    """Rebuilds a tcod event from a dict made by _event_to_record."""
+    if record["type"] in ("KEYDOWN", "KEYUP"):
+        event_class = tcod.event.KeyDown if record["type"] == "KEYDOWN" else tcod.event.KeyUp
+        return event_class(scancode=tcod.event.Scancode(record["scancode"]),
+                           sym=tcod.event.KeySym(record["sym"]),
+                           mod=tcod.event.Modifier(record["mod"]),
+                           repeat=record["repeat"],
+                           pressed=record["type"] == "KEYDOWN")
+    elif record["type"] == "QUIT":
+        return tcod.event.Quit()
+    else:
+        raise ValueError("Unrecognized event type in recording: {}".format(record["type"]))
+
+
+class InputRecorder:
+    """Writes the input events handed to the interface, tagged with the tick they arrived on,
+    to a gzipped file of JSON lines. The first line is a header holding the RNG seed and level parameters.
+
+    Each call to the event source returned by .wrap() counts as one tick, matching Interface.tick()."""
+    def __init__(self, path: str, seed: int, level_params: Optional[dict] = None):
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._tick: int = 0
+        self._start_ns: int = time_ns()
+
+        header = {"version": FORMAT_VERSION,
+                  "seed": seed,
+                  "level": level_params or {}}
+        self._file.write(json.dumps(header) + "\n")
+
+    @property
+    def tick(self) -> int:
+        """The index of the next tick to be recorded."""
+        return self._tick
+
+    def record(self, events: Iterable[tcod.event.Event]) -> List[tcod.event.Event]:
+        """Writes one tick's worth of events, then returns them as a list so they can still be dispatched."""
+        events = list(events)
+        ms = (time_ns() - self._start_ns) // 1000000
+        for event in events:
+            record = _event_to_record(event)
+            if record is not None:
+                self._file.write(json.dumps([self._tick, ms, record]) + "\n")
+
+        self._tick += 1
+        return events
+
+    def wrap(self, source: EventSource = tcod.event.get) -> EventSource:
+        """Returns an event source which pulls from source and records everything it hands over."""
+        return lambda: self.record(source())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class InputReplayer:
+    """Reads a file written by InputRecorder and hands its events back, one tick per call to .next_events()."""
+    def __init__(self, path: str):
+        self._events: Dict[int, List[tcod.event.Event]] = {}
+        self._last_tick: int = -1
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != FORMAT_VERSION:
+                raise ValueError("Unsupported recording version {}, expected {}"
+                                 .format(str(header.get("version")), str(FORMAT_VERSION)))
+
+            for line in f:
+                tick, ms, record = json.loads(line)
+                self._events.setdefault(tick, []).append(_record_to_event(record))
+                self._last_tick = max(self._last_tick, tick)
+
+        self._seed: int = header["seed"]
+        self._level_params: dict = header["level"]
+        self._tick: int = 0
+
+    @property
+    def seed(self) -> int:
+        return self._seed
+
+    @property
+    def level_params(self) -> dict:
+        return self._level_params
+
+    @property
+    def tick(self) -> int:
+        """The index of the next tick to be replayed."""
+        return self._tick
+
+    @property
+    def finished(self) -> bool:
+        """True once every recorded event has been handed over."""
+        return self._tick > self._last_tick
+
+    def next_events(self) -> List[tcod.event.Event]:
+        """Returns the events recorded on the next tick, which may be none. Usable as an Interface event source."""
+        events = self._events.get(self._tick, [])
+        self._tick += 1
+        return events
@@ -0,0 +1,103 @@
+import unittest
+import numpy as np
+from src.map_generation.carving import CarvingEngine, DrunkArtist, CenterMindedArtist, CentroidMindedArtist, \
+    BRUSH_2x2, BRUSH_PLUS
+
+
+def _carve(seed: int) -> np.ndarray:
+    field = np.zeros((40, 60), dtype=bool)
+    engine = CarvingEngine(field, rng=np.random.default_rng(seed))
+    drunk = engine.add_kind(DrunkArtist(brush=BRUSH_PLUS, same_path_prob=.5))
+    centered = engine.add_kind(CenterMindedArtist(brush=BRUSH_2x2))
+    engine.spawn(drunk, [5, 50], [5, 30])
+    engine.spawn(centered, 0, 0)
+    engine.run(target_ratio=.3, max_steps=500)
+    return field
+
+
+class TestCarvingEngine(unittest.TestCase):
+    def test_deterministic(self):
+        """The same seed should carve the same field."""
+        assert (_carve(7) == _carve(7)).all()
+        assert not (_carve(7) == _carve(8)).all()
+
+    def test_carved_count(self):
+        """The running count should match the field, including tiles under overlapping brushes."""
+        field = np.zeros((20, 20), dtype=bool)
+        field[0, :5] = True
+        engine = CarvingEngine(field, rng=np.random.default_rng(1))
+        kind = engine.add_kind(DrunkArtist(brush=BRUSH_PLUS))
+        engine.spawn(kind, [3, 3, 4], [3, 3, 3])
+        for i in range(50):
+            engine.step()
+            assert engine.carved == np.count_nonzero(field)
+
+    def test_carve_value(self):
+        """Engines carving False should count False tiles."""
+        field = np.ones((10, 10), dtype=bool)
+        engine = CarvingEngine(field, carve_value=False, rng=np.random.default_rng(1))
+        engine.spawn(engine.add_kind(DrunkArtist()), 5, 5)
+        assert engine.carved == 4
+        assert engine.carved == np.count_nonzero(~field)
+
+    def test_in_bounds(self):
+        """Artists should never step off the field, even in a corner of a tiny one."""
+        field = np.zeros((3, 3), dtype=bool)
+        engine = CarvingEngine(field, rng=np.random.default_rng(2))
+        kind = engine.add_kind(DrunkArtist(same_path_prob=.9))
+        engine.spawn(kind, [0, 2, 2], [0, 0, 2])
+        for i in range(200):
+            engine.step()
+            assert ((0 <= engine.x) & (engine.x < 3)).all()
+            assert ((0 <= engine.y) & (engine.y < 3)).all()
+
+    def test_nowhere_to_go(self):
+        """Artists with no step on the field to take should stay where they are."""
+        field = np.zeros((1, 1), dtype=bool)
+        engine = CarvingEngine(field, rng=np.random.default_rng(4))
+        engine.spawn(engine.add_kind(DrunkArtist(same_path_prob=.5)), 0, 0)
+        engine.spawn(engine.add_kind(CentroidMindedArtist()), 0, 0, target=engine.add_target((5, 5)))
+        for i in range(10):
+            engine.step()
+        assert (engine.x == 0).all() and (engine.y == 0).all()
+        assert field[0, 0]
+
+    def test_targets(self):
+        """Strongly biased artists should end up near their target."""
+        field = np.zeros((50, 50), dtype=bool)
+        engine = CarvingEngine(field, rng=np.random.default_rng(3))
+        kind = engine.add_kind(CentroidMindedArtist(center_weight=1, not_center_weight=0))
+        engine.spawn(kind, [0, 49], [0, 49], target=engine.add_target((30, 10)))
+        for i in range(100):
+            engine.step()
+
+        assert (np.abs(engine.x - 30) <= 1).all()
+        assert (np.abs(engine.y - 10) <= 1).all()
+
+    def test_add_targets(self):
+        """Targets added in a batch should be numbered in order, with repeats sharing one index."""
+        engine = CarvingEngine(np.zeros((20, 20), dtype=bool))
+        assert engine.add_target((3, 4)) == 0
+        assert engine.add_targets([(5, 6), (3, 4), (7, 8), (5, 6)]).tolist() == [1, 0, 2, 1]
+        assert engine.add_target((7.0, 8.0)) == 2
+
+    def test_kill_keeps_one(self):
+        """Killing a whole group should spare one of it when asked to."""
+        engine = CarvingEngine(np.zeros((10, 10), dtype=bool), rng=np.random.default_rng(4))
+        a = engine.add_kind(DrunkArtist())
+        b = engine.add_kind(DrunkArtist())
+        engine.spawn(a, [1, 2], [1, 2])
+        engine.spawn(b, [3, 4], [3, 4])
+
+        engine.kill(np.ones(4, dtype=bool), keep_one_of=(engine.of_kinds(a),))
+        assert list(engine.kinds) == [a]
+
+    def test_run_reaches_target(self):
+        """Running should stop once the target ratio is met."""
+        field = np.zeros((30, 30), dtype=bool)
+        engine = CarvingEngine(field, rng=np.random.default_rng(5))
+        engine.spawn(engine.add_kind(CenterMindedArtist(brush=BRUSH_PLUS)), 15, 15)
+        steps = engine.run(target_ratio=.4, max_steps=100000)
+
+        assert steps < 100000
+        assert engine.carved_ratio >= .4
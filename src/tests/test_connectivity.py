@@ -0,0 +1,87 @@
+import unittest
+import numpy as np
+from collections import deque
+from src.map_generation.connectivity import label_components, Components, prune, connect, repair, PRUNE, CONNECT
+from src.map_generation.smoothing import cellular_automata
+from src.map_generation.map_generator import WholeDrunkMapGen
+
+
+def _flood_fill_labels(passable, diagonal):
+    """Labels components one tile at a time, breadth first, to check against."""
+    height, width = passable.shape
+    offsets = [(0, 1), (1, 0), (0, -1), (-1, 0)] + ([(1, 1), (1, -1), (-1, 1), (-1, -1)] if diagonal else [])
+    labels = np.zeros(passable.shape, dtype=int)
+    count = 0
+    for y in range(height):
+        for x in range(width):
+            if passable[y, x] and not labels[y, x]:
+                count += 1
+                labels[y, x] = count
+                queue = deque([(y, x)])
+                while queue:
+                    cy, cx = queue.popleft()
+                    for dy, dx in offsets:
+                        ny, nx = cy + dy, cx + dx
+                        if 0 <= ny < height and 0 <= nx < width and passable[ny, nx] and not labels[ny, nx]:
+                            labels[ny, nx] = count
+                            queue.append((ny, nx))
+    return labels, count
+
+
+class TestConnectivity(unittest.TestCase):
+    def test_labels_match_flood_fill(self):
+        for seed in range(3):
+            passable = np.random.default_rng(seed).random((30, 41)) < .5
+            for diagonal in (True, False):
+                labels, count = label_components(passable, diagonal)
+                expected, expected_count = _flood_fill_labels(passable, diagonal)
+                assert count == expected_count
+                assert (labels == expected).all()
+
+        labels, count = label_components(np.zeros((5, 5), dtype=bool))
+        assert count == 0 and not labels.any()
+
+    def test_stats(self):
+        passable = np.zeros((6, 8), dtype=bool)
+        passable[1:3, 1:4] = True
+        passable[4, 6] = True
+        passable[3, 5] = True  # Touches the lone tile at (6, 4) only diagonally
+        components = Components(passable)
+
+        assert components.count == 2
+        assert components.sizes[1:].tolist() == [6, 2]
+        assert components.largest == 1
+        assert components.centroids[2].tolist() == [5.5, 3.5]
+        assert components.stats()["reachable_ratio"] == .75
+        assert Components(passable, diagonal=False).count == 3
+
+    def test_repair(self):
+        """Pruning should keep only the largest region, and connecting should join every region up."""
+        passable = cellular_automata(np.random.default_rng(4).random((60, 80)) < .55, iterations=3)
+        components = Components(passable)
+        assert components.count > 1
+
+        pruned = prune(passable)
+        assert Components(pruned).count == 1
+        assert (pruned == components.mask(components.largest)).all()
+        assert (repair(passable, PRUNE) == pruned).all()
+
+        connected = connect(passable, rng=np.random.default_rng(0))
+        assert Components(connected).count == 1
+        assert (connected | ~passable).all(), "Connecting should only carve"
+        assert (repair(passable, CONNECT, rng=np.random.default_rng(0)) == connected).all()
+
+        with self.assertRaises(ValueError):
+            repair(passable, "teleport")
+
+    def test_whole_drunk_mapgen_is_connected(self):
+        mapgen = WholeDrunkMapGen(width=40, height=30,
+                                  num_centers=6,
+                                  passability_tgt=0.25,
+                                  wanderer_born_prob=0,
+                                  wanderer_die_prob=0,
+                                  centroidal_born_prob=0.10,
+                                  centroidal_die_prob=0.0125,
+                                  rng=np.random.default_rng(1))
+        assert Components(mapgen.field).count == 1
+        assert mapgen.component_sizes.sum() <= np.count_nonzero(mapgen.field)
@@ -0,0 +1,147 @@
+import os
+import tempfile
+import unittest
+import tcod
+from src.interface.game_log import LogEntry, GameLog
+from src.interface.interface_ import Interface, _blit
+
+
+class TestLogEntry(unittest.TestCase):
+    def test_as_rows(self):
+        """Text should be split into rows of the given width, and the result cached per width."""
+        entry = LogEntry("abcdefg", color=(10, 20, 30))
+
+        assert entry.as_rows(3) == ["abc", "def", "g"]
+        assert entry.as_rows(3) is entry.as_rows(3)
+        assert entry.as_rows(4) == ["abcd", "efg"]
+
+    def test_text_change_clears_rows(self):
+        """Assigning new text should drop any cached layouts."""
+        entry = LogEntry("abcdefg")
+        entry.as_rows(3)
+
+        entry.text = "xyz"
+        assert entry.as_rows(3) == ["xyz"]
+
+
+class TestGameLog(unittest.TestCase):
+    def test_render_buffer(self):
+        """Newest entries render at the top, with a margin row between entries."""
+        log = GameLog(width=4, height=6, interface=None)
+        log.add_entry("old", color=(1, 2, 3))
+        log.add_entry("newest", color=(4, 5, 6))
+        glyphs, colors = log.render_buffer()
+
+        assert "".join(chr(c) for c in glyphs[0]) == "newe"
+        assert "".join(chr(c) for c in glyphs[1][:2]) == "st"
+        assert not glyphs[2].any()
+        assert "".join(chr(c) for c in glyphs[3][:3]) == "old"
+        assert tuple(colors[3, 0]) == (1, 2, 3)
+
+    def test_buffer_only_redraws_on_change(self):
+        """The buffer should be reused between frames and redrawn on append or resize."""
+        log = GameLog(width=4, height=3, interface=None)
+        log.add_entry("abc")
+        log.render_buffer()
+        assert not log._dirty
+
+        log.add_entry("def")
+        assert log._dirty
+        glyphs, colors = log.render_buffer()
+        assert chr(glyphs[0, 0]) == "d"
+
+        log.shape = (2, 3)
+        glyphs, colors = log.render_buffer()
+        assert glyphs.shape == (3, 2)
+        assert "".join(chr(c) for c in glyphs[0]) == "de"
+        assert chr(glyphs[1, 0]) == "f"
+        assert glyphs[1, 1] == 0
+
+    def test_blit(self):
+        """Blitting should write glyphs onto an x-major console and skip empty tiles."""
+        log = GameLog(width=5, height=2, interface=None)
+        log.add_entry("hi", color=(9, 8, 7))
+        console = tcod.console.Console(10, 10, order="F")
+        console.ch[:] = ord("#")
+
+        _blit(console, 2, 3, *log.render_buffer())
+
+        assert chr(console.ch[2, 3]) == "h"
+        assert chr(console.ch[3, 3]) == "i"
+        assert tuple(console.fg[2, 3]) == (9, 8, 7)
+        assert chr(console.ch[4, 3]) == "#"
+
+    def test_independent_logs(self):
+        """Two logs created without initial entries shouldn't share a list."""
+        log_a = GameLog(width=10, height=5, interface=None)
+        log_b = GameLog(width=10, height=5, interface=None)
+        log_a.add_entry("Only in A")
+
+        assert len(log_b) == 0
+
+    def test_capacity_and_archive(self):
+        """Entries past capacity should be evicted to the archive and remain readable from it."""
+        log = GameLog(width=10, height=5, interface=None, capacity=4)
+        for i in range(100):
+            log.add_entry("Entry {}".format(i), color=(i, 0, 0))
+
+        assert len(log.log) == 4
+        assert len(log) == 100
+        assert log.log[0].text == "Entry 96"
+
+        archived = log.archived_entries(70, 3)
+        assert [e.text for e in archived] == ["Entry 70", "Entry 71", "Entry 72"]
+        assert archived[0].color == (70, 0, 0)
+        log.close()
+
+    def test_use_after_close(self):
+        """A closed log should stop reading and writing its archive, without truncating it."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "log.jsonl")
+            log = GameLog(width=10, height=3, interface=None, capacity=2, archive_path=path)
+            for i in range(10):
+                log.add_entry("E{}".format(i))
+            log.close()
+            size = os.path.getsize(path)
+
+            assert log.archived_entries(0, 5) == []
+            for i in range(10, 20):
+                log.add_entry("E{}".format(i))
+            assert os.path.getsize(path) == size
+
+            assert len(log) == 2
+            log.scroll(100)
+            glyphs, colors = log.render_buffer()
+            assert "".join(chr(c) for c in glyphs[0] if c) == "E18"
+
+    def test_replace_empty_log(self):
+        """Replacing a log with nothing in it yet should still close it."""
+        interface = Interface(None)
+        interface.new_game_log(width=10, height=3)
+        first = interface.game_log
+        assert len(first) == 0
+
+        interface.new_game_log(width=10, height=3)
+        assert first._closed
+        assert interface.game_log is not first
+        interface.game_log.close()
+
+    def test_scrollback(self):
+        """Scrolling back far enough should page archived entries into the panel."""
+        log = GameLog(width=10, height=1, interface=None, capacity=2)
+        for i in range(10):
+            log.add_entry("E{}".format(i))
+
+        log.scroll(5)
+        glyphs, colors = log.render_buffer()
+        assert "".join(chr(c) for c in glyphs[0] if c) == "E4"
+
+        # New entries shouldn't move a scrolled-back view.
+        log.add_entry("E10")
+        glyphs, colors = log.render_buffer()
+        assert "".join(chr(c) for c in glyphs[0] if c) == "E4"
+
+        log.scroll(-100)
+        glyphs, colors = log.render_buffer()
+        assert "".join(chr(c) for c in glyphs[0] if c) == "E10"
+        log.close()
@@ -0,0 +1,91 @@
+import json
+import os
+import tempfile
+import unittest
+import tcod
+from src.instrumentation import Metrics, RollingHistogram, Tracing, LatencyTracker
+
+
+class TestRollingHistogram(unittest.TestCase):
+    def test_summary(self):
+        """Percentiles and max should cover only the samples still in the buffer."""
+        hist = RollingHistogram(size=100)
+        for ms in range(1, 201):
+            hist.add(float(ms))
+
+        stats = hist.summary()
+        assert stats["count"] == 200
+        assert stats["last"] == 200.0
+        assert stats["max"] == 200.0
+        assert 150 <= stats["p50"] <= 151
+        assert list(hist.samples[:2]) == [101.0, 102.0]
+
+
+class TestMetrics(unittest.TestCase):
+    def test_disabled_spans_record_nothing(self):
+        m = Metrics(enabled=False)
+        with m.span("tick"):
+            pass
+        assert m.names == []
+
+    def test_spans(self):
+        """Enabled spans should each add one sample to their named histogram."""
+        m = Metrics(enabled=True)
+        for _ in range(3):
+            with m.span("tick"):
+                pass
+        with m.span("frame"):
+            pass
+
+        assert m.names == ["frame", "tick"]
+        assert m.summary()["tick"]["count"] == 3
+
+
+class TestTracing(unittest.TestCase):
+    def test_trace_file(self):
+        """A stopped trace should be a loadable JSON array, capped at max_events."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            tracing = Tracing()
+            with tracing.span("before start"):
+                pass
+
+            tracing.start(path, max_events=3)
+            for i in range(5):
+                with tracing.span("Mobile.tick", "sim"):
+                    pass
+            recorder = tracing.stop()
+            assert not tracing.active
+
+            with open(path) as f:
+                events = json.load(f)
+            complete = [e for e in events if e["ph"] == "X"]
+            assert len(complete) == 3
+            assert complete[0]["name"] == "Mobile.tick"
+            assert complete[0]["dur"] >= 0
+            assert recorder.dropped == 2
+
+
+class TestLatencyTracker(unittest.TestCase):
+    def test_latency(self):
+        """Only state changes marked while handling an event should be recorded, once presented."""
+        m = Metrics(enabled=True)
+        tracker = LatencyTracker(m)
+
+        tracker.mark("move_pc")  # Outside of any event; ignored
+        with tracker.handling(tcod.event.Quit()):
+            tracker.mark("move_pc")
+        assert m.names == []
+
+        tracker.presented()
+        tracker.presented()
+        assert m.summary()["latency.move_pc"]["count"] == 1
+        assert m.summary()["latency.input"]["count"] == 1
+
+    def test_disabled(self):
+        m = Metrics(enabled=False)
+        tracker = LatencyTracker(m)
+        with tracker.handling(tcod.event.Quit()):
+            tracker.mark("move_pc")
+        tracker.presented()
+        assert m.names == []
@@ -0,0 +1,131 @@
+import copy
+import os
+import tempfile
+import unittest
+import numpy as np
+from src.layers import BitLayer, LayerStore
+from src.map_generation.smoothing import neighbor_counts, walls_of
+
+
+class TestBitLayer(unittest.TestCase):
+    def setUp(self):
+        # Widths on and off byte boundaries
+        rng = np.random.default_rng(0)
+        self.arrays = [rng.random((11, width)) < .5 for width in (1, 7, 8, 13, 64, 67)]
+
+    def test_round_trip(self):
+        for array in self.arrays:
+            layer = BitLayer.from_array(array)
+            assert layer.shape == array.shape
+            assert layer.nbytes == array.shape[0] * ((array.shape[1] + 7) // 8)
+            assert (np.asarray(layer) == array).all()
+            assert layer.count() == np.count_nonzero(array)
+            assert (np.asarray(copy.deepcopy(layer)) == array).all()
+
+        assert BitLayer.zeros(3, 9).count() == 0 and BitLayer.ones(3, 9).all()
+        with self.assertRaises(ValueError):
+            BitLayer(np.zeros((3, 1), dtype=np.uint8), 9)
+
+    def test_boolean_ops(self):
+        """Operators should match bool arrays', with either a layer or an array on the other side."""
+        a, b = self.arrays[3], ~np.roll(self.arrays[3], 3)
+        layer = BitLayer.from_array(a)
+        assert ((layer & b) == (a & b)).all()
+        assert ((layer | BitLayer.from_array(b)) == (a | b)).all()
+        assert ((b ^ layer) == (a ^ b)).all()
+        assert (np.asarray(~layer) == ~a).all()
+        assert (~layer).count() == a.size - np.count_nonzero(a), "Inverting shouldn't set the padding bits"
+        assert (layer != a).count() == 0
+
+        with self.assertRaises(ValueError):
+            layer & self.arrays[4]
+        with self.assertRaises(ValueError):
+            bool(layer)
+
+    def test_indexing(self):
+        for array in self.arrays:
+            layer = BitLayer.from_array(array)
+            width = array.shape[1]
+            assert layer[2, -1] == array[2, -1]
+            assert (layer[4] == array[4]).all() and (layer[:, 0] == array[:, 0]).all()
+            ys, xs = np.array([0, 5, 10]), np.array([0, width // 2, width - 1])
+            assert (layer[ys, xs] == array[ys, xs]).all()
+            for x0 in range(width):
+                for x1 in range(x0, width + 1):
+                    assert (np.asarray(layer[1:9, x0:x1]) == array[1:9, x0:x1]).all()
+
+            with self.assertRaises(IndexError):
+                layer[0, width]
+
+    def test_setting(self):
+        array = self.arrays[5].copy()
+        layer = BitLayer.from_array(array)
+        for key, value in (((slice(2, 5), slice(3, 60)), True),
+                           (6, False),
+                           ((np.array([0, 1, 9]), np.array([66, 0, 8])), np.array([True, False, True])),
+                           ((3, 2), True)):
+            array[key] = value
+            layer[key] = value
+            assert (np.asarray(layer) == array).all()
+
+    def test_neighborhoods(self):
+        """Shifts, dilation and neighbor counts should match the unpacked versions."""
+        for array in self.arrays:
+            layer = BitLayer.from_array(array)
+            assert (layer.neighbor_counts() == neighbor_counts(array)).all()
+            assert (walls_of(layer) == walls_of(array)).all()
+            assert (layer.dilate() == (array | (neighbor_counts(array) > 0))).all()
+            assert (layer.erode() == (array & (neighbor_counts(~np.pad(array, 1))[1:-1, 1:-1] == 0))).all()
+
+            shifted = np.zeros_like(array)
+            shifted[2:, :-3] = array[:-2, 3:]
+            assert (layer.shifted(-3, 2) == shifted).all()
+            assert (layer.shifted(np.int64(-3), np.int64(2)) == shifted).all()
+
+
+class TestLayerStore(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.directory = self._dir.name
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_round_trip(self):
+        """Saved layers should come back mapped from their files, in a fresh store over the same directory."""
+        bits = BitLayer.from_array(np.random.default_rng(0).random((20, 13)) < .5)
+        glyphs = np.arange(60, dtype=np.int32).reshape(6, 10)
+
+        store = LayerStore(self.directory)
+        assert isinstance(store.save("bits", bits).packed, np.memmap)
+        assert isinstance(store.save("glyphs", glyphs), np.memmap)
+        assert store.names == ["bits", "glyphs"]
+
+        store = LayerStore(self.directory)
+        loaded = store.load("bits")
+        assert isinstance(loaded.packed, np.memmap)
+        assert (loaded == bits).all()
+        assert (store.load("glyphs") == glyphs).all()
+        assert store.shape("bits") == (20, 13) and store.shape("glyphs") == (6, 10)
+        assert store.save("bits", loaded) is loaded, "Saving a layer over its own file should leave it be"
+
+        store.remove("glyphs")
+        assert "glyphs" not in store and not os.path.exists(os.path.join(self.directory, "glyphs.npy"))
+        with self.assertRaises(ValueError):
+            store.load("glyphs")
+        with self.assertRaises(ValueError):
+            store.create("../outside", (2, 2))
+
+    def test_writes_persist(self):
+        """Writing to a mapped layer and flushing should be all it takes to save it."""
+        store = LayerStore(self.directory)
+        explored = store.create("explored", (8, 8), bool)
+        explored[2:4, 3] = True
+        store.flush()
+
+        readonly = LayerStore(self.directory, readonly=True)
+        assert readonly.load("explored").sum() == 2
+        with self.assertRaises(ValueError):
+            readonly.save("explored", np.zeros((8, 8), dtype=bool))
+        with self.assertRaises(ValueError):
+            readonly.load("explored")[0, 0] = True
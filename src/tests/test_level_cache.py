@@ -0,0 +1,94 @@
+import os
+import random
+import tempfile
+import time
+import unittest
+import numpy as np
+from src.map_generation import LevelCache
+
+
+class TestLevelCache(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.directory = self._dir.name
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_key(self):
+        """Keys should be stable, ignore parameter order, and differ by class, parameters and seed."""
+        key = LevelCache.key(LevelCache, {"a": 1, "b": 2}, 5)
+        assert key == LevelCache.key(LevelCache, {"b": 2, "a": 1}, 5)
+        assert key != LevelCache.key(LevelCache, {"a": 1, "b": 2}, 6)
+        assert key != LevelCache.key(LevelCache, {"a": 1, "b": 3}, 5)
+        assert key != LevelCache.key(dict, {"a": 1, "b": 2}, 5)
+
+    def test_round_trip(self):
+        """Stored arrays should come back equal, and unknown keys should miss."""
+        cache = LevelCache(self.directory)
+        walls = np.eye(5, dtype=bool)
+        cache.put("level", {"walls": walls, "spawn": np.array([1, 2])})
+
+        arrays = cache.get("level")
+        assert (arrays["walls"] == walls).all()
+        assert list(arrays["spawn"]) == [1, 2]
+        assert cache.get("missing") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_corrupt_file(self):
+        """An unreadable file should count as a miss and be removed."""
+        cache = LevelCache(self.directory)
+        with open(os.path.join(self.directory, "bad.npz"), "wb") as file:
+            file.write(b"not a zip")
+
+        assert cache.get("bad") is None
+        assert "bad" not in cache
+
+    def test_lru_eviction(self):
+        """Going over max_bytes should evict the least recently used level first."""
+        noise = np.random.default_rng(0).random(1000)
+        cache = LevelCache(self.directory)
+        cache.put("sizing", {"noise": noise})
+        one_level = cache.size
+        cache.clear()
+
+        cache = LevelCache(self.directory, max_bytes=int(2.5 * one_level))
+        cache.put("a", {"noise": noise})
+        time.sleep(.01)
+        cache.put("b", {"noise": noise})
+        time.sleep(.01)
+        cache.get("a")
+        time.sleep(.01)
+        cache.put("c", {"noise": noise})
+
+        assert "a" in cache and "c" in cache
+        assert "b" not in cache
+        assert cache.size <= cache.max_bytes
+
+    def test_get_or_generate(self):
+        """Misses should generate from the given seed; hits shouldn't generate at all. Neither should touch
+        global random state."""
+        cache = LevelCache(self.directory)
+        calls = []
+
+        def generate(seed):
+            calls.append(seed)
+            return {"roll": np.random.default_rng(seed).random(2)}
+
+        random.seed(7)
+        np.random.seed(7)
+        first = cache.get_or_generate(LevelCache, {"depth": 1}, 42, generate)
+        after_miss = (random.random(), np.random.random())
+
+        random.seed(7)
+        np.random.seed(7)
+        second = cache.get_or_generate(LevelCache, {"depth": 1}, 42, generate)
+        after_hit = (random.random(), np.random.random())
+
+        assert calls == [42]
+        assert (first["roll"] == second["roll"]).all()
+        assert after_miss == after_hit
+
+        # Regenerating elsewhere with the same seed should give the same level
+        other = LevelCache(os.path.join(self.directory, "other"))
+        assert (other.get_or_generate(LevelCache, {"depth": 1}, 42, generate)["roll"] == first["roll"]).all()
@@ -0,0 +1,248 @@
+import unittest
+import numpy as np
+from unittest import mock
+from src.map_generation.rng import RngService
+from src.map_generation.doors import distance_transform, DoorPlacer, rank_by_corridor_length
+from src.map_generation.sampling import farthest_point_sample, sample_centroids, inner_bounds
+from src.map_generation.smoothing import neighbor_counts, cellular_automata, walls_of
+from src.map_generation.cellulose import composite, UNION, SUBTRACT, OVERWRITE
+from src.map_generation.cellulose.hallway import HallwayCellulose, l_path, monotone_path, bresenham_path, \
+    L_SHAPED, MONOTONE, BRESENHAM
+from src.map_generation.map_generator import MapGenerator
+from src.map_generation.cellulose.drunk_walk import SmallDrunkRoom, MediumDrunkRoom
+
+
+class TestSmoothing(unittest.TestCase):
+    def test_neighbor_counts(self):
+        alive = np.zeros((4, 5), dtype=bool)
+        alive[1, 1] = alive[1, 2] = True
+        counts = neighbor_counts(alive)
+
+        assert counts[1, 1] == 1
+        assert counts[0, 0] == 1
+        assert counts[2, 2] == 2
+        assert counts[3, 4] == 0
+
+    def test_cellular_automata(self):
+        """Lone walls should crumble, open tiles walled in on most sides should fill, and borders become walls."""
+        field = np.ones((7, 7), dtype=bool)
+        field[3, 3] = False
+        smoothed = cellular_automata(field)
+
+        assert smoothed[3, 3]
+        assert not smoothed[0].any() and not smoothed[:, 6].any()
+        assert field[0].all(), "The input shouldn't be modified"
+
+        field = np.zeros((7, 7), dtype=bool)
+        field[3, 3] = True
+        assert not cellular_automata(field)[3, 3]
+
+
+class TestSampling(unittest.TestCase):
+    def test_farthest_point_sample(self):
+        """After the first pick, each pick should be the point farthest from all earlier picks."""
+        points = np.random.default_rng(0).integers(0, 100, size=(200, 2))
+        picks = farthest_point_sample(points, 20, np.random.default_rng(1))
+
+        assert len(set(picks.tolist())) == 20
+        for i in range(1, 20):
+            nearest = np.min(np.sum((points[:, np.newaxis] - points[picks[:i]]) ** 2, axis=2), axis=1)
+            assert nearest[picks[i]] == nearest.max()
+
+        assert len(farthest_point_sample(points, 0, np.random.default_rng(1))) == 0
+
+    def test_sample_centroids(self):
+        """Centroids should stay in the inner 80% and be better spread than the same number picked at random."""
+        centroids = sample_centroids(80, 60, 12, np.random.default_rng(2))
+        min_x, max_x, min_y, max_y = inner_bounds(80, 60)
+
+        assert centroids.shape == (12, 2)
+        assert (min_x <= centroids[:, 0]).all() and (centroids[:, 0] <= max_x).all()
+        assert (min_y <= centroids[:, 1]).all() and (centroids[:, 1] <= max_y).all()
+
+        def min_spacing(points):
+            distances = np.sum((points[:, np.newaxis] - points[np.newaxis]) ** 2, axis=2)
+            return distances[~np.eye(len(points), dtype=bool)].min()
+
+        rng = np.random.default_rng(3)
+        uniform = np.stack((rng.integers(min_x, max_x, 12), rng.integers(min_y, max_y, 12)), axis=1)
+        assert min_spacing(centroids) > min_spacing(uniform)
+
+
+class TestComposite(unittest.TestCase):
+    def test_modes(self):
+        src = np.array([[True, False],
+                        [False, True]])
+        tgt = np.zeros((4, 4), dtype=bool)
+        tgt[1, 2] = True
+
+        composite(src, tgt, 1, 1, UNION)
+        assert tgt[1, 1] and tgt[1, 2] and tgt[2, 2] and not tgt[2, 1]
+
+        composite(src, tgt, 1, 1, SUBTRACT)
+        assert not tgt[1, 1] and tgt[1, 2] and not tgt[2, 2]
+
+        composite(src, tgt, 1, 1, OVERWRITE)
+        assert tgt[1, 1] and not tgt[1, 2] and tgt[2, 2]
+
+        with self.assertRaises(ValueError):
+            composite(src, tgt, 0, 0, "xor")
+
+    def test_clipping(self):
+        """Offsets should apply to the right axes, and anything off the target should be clipped."""
+        src = np.ones((3, 2), dtype=bool)
+        tgt = np.zeros((5, 6), dtype=bool)
+        composite(src, tgt, 4, 1)
+        assert np.count_nonzero(tgt) == 6 and tgt[1:4, 4:6].all()
+
+        tgt[:] = False
+        composite(src, tgt, -1, 3)
+        assert np.count_nonzero(tgt) == 2 and tgt[3:5, 0].all()
+
+        composite(src, tgt, 10, 10)
+        assert np.count_nonzero(tgt) == 2
+
+
+class TestHallways(unittest.TestCase):
+    def test_paths(self):
+        """Every path should run from origin to destination in steps of one tile."""
+        origin, destination = (3, 9), (11, 2)
+        paths = [l_path(origin, destination), l_path(origin, destination, horizontal_first=False),
+                 monotone_path(origin, destination, np.random.default_rng(0)),
+                 bresenham_path(origin, destination)]
+
+        for xs, ys in paths:
+            assert (xs[0], ys[0]) == origin and (xs[-1], ys[-1]) == destination
+            assert (np.abs(np.diff(xs)) <= 1).all() and (np.abs(np.diff(ys)) <= 1).all()
+
+        # Orthogonal paths take one step per tile of Manhattan distance; Bresenham lines one per tile of the longer axis
+        for xs, ys in paths[:3]:
+            assert len(xs) == 8 + 7 + 1
+            assert (np.abs(np.diff(xs)) + np.abs(np.diff(ys)) == 1).all()
+        assert len(paths[3][0]) == 8 + 1
+
+    def test_hallway(self):
+        """Carving into a map and compositing the hallway's own field should mark the same tiles."""
+        for style in (L_SHAPED, MONOTONE, BRESENHAM):
+            hall = HallwayCellulose((2, 12), (14, 3), brush_size=2, style=style, rng=np.random.default_rng(1))
+            carved, composited = np.zeros((20, 20), dtype=bool), np.zeros((20, 20), dtype=bool)
+            hall.carve_into(carved)
+            hall.apply_to(0, 0, composited)
+
+            assert (carved == composited).all()
+            assert carved[12:14, 2:4].all() and carved[3:5, 14:16].all()
+            assert np.count_nonzero(carved) == len(hall.xs)
+
+        with self.assertRaises(ValueError):
+            HallwayCellulose((0, 0), (1, 1), style="spiral")
+
+
+class TestDoors(unittest.TestCase):
+    def test_distance_transform(self):
+        """Distances and nearest tiles should match a brute-force search."""
+        passable = np.random.default_rng(0).random((9, 13)) < .1
+        distance, nearest_x, nearest_y = distance_transform(passable)
+        points = np.argwhere(passable)
+
+        for y in range(9):
+            for x in range(13):
+                expected = np.min(np.abs(points[:, 0] - y) + np.abs(points[:, 1] - x))
+                assert distance[y, x] == expected
+                assert passable[nearest_y[y, x], nearest_x[y, x]]
+                assert abs(nearest_x[y, x] - x) + abs(nearest_y[y, x] - y) == expected
+
+    def test_best_door(self):
+        """The best door should be behind the thinnest wall, nearest the midpoint."""
+        field = np.zeros((15, 15), dtype=bool)
+        field[5:10, 4:12] = True
+        field[2:5, 10] = True  # A nook reaching toward the top edge
+        placer = DoorPlacer(field)
+
+        assert placer.best_door("top", 7) == (10, 2)
+        assert placer.best_door("left", 7) == (4, 7)
+        assert placer.best_door("right", 7) == (11, 7)
+        assert placer.nearest_passable(0, 0) == (4, 5)
+        assert DoorPlacer(np.zeros((15, 15), dtype=bool)).best_door("bottom", 7) == (7, 14)
+
+    def test_rank_by_corridor_length(self):
+        ranked = rank_by_corridor_length([(0, 0), (10, 0)], [(12, 1), (30, 30)])
+        assert ranked[0] == (1, 0, 3)
+        assert ranked[-1] == (0, 1, 60)
+
+    def test_door_points_start_no_processes(self):
+        mapgen = TestMapGenerator._mapgen()
+        room = mapgen.generate_room(2, 2)
+        with mock.patch("multiprocessing.Pool", side_effect=AssertionError("Door placement started a pool")):
+            doors = room.door_points
+
+        assert len(doors) > 0
+        for door in doors:
+            x, y = door["door_pt"]
+            assert room.field[y, x]
+
+
+class TestMapGenerator(unittest.TestCase):
+    @staticmethod
+    def _mapgen():
+        return MapGenerator(7, 7,
+                            candidates=[SmallDrunkRoom, MediumDrunkRoom],
+                            candidate_weights=[.5, .5],
+                            max_grid_openness=.5,
+                            rngs=RngService(21))
+
+    def test_parallel_rooms_match_serial(self):
+        """Rooms planned and generated in a pool should match rooms generated one at a time."""
+        serial, parallel = self._mapgen(), self._mapgen()
+        for x, y in ((0, 0), (3, 0), (0, 3), (3, 3)):
+            serial.generate_room(x, y)
+            assert parallel.plan_room(x, y).pending
+
+        parallel.generate_rooms(processes=2)
+
+        assert not any(r.pending for r in parallel.rooms)
+        for a, b in zip(serial.rooms, parallel.rooms):
+            assert type(a) is type(b)
+            assert (a.field == b.field).all()
+
+    def test_generate(self):
+        """Generating should stop, link every room after the first to one before it, and render the result,
+        the same whether the rooms are generated in a pool or not."""
+        mapgen, serial = self._mapgen(), self._mapgen()
+        mapgen._generate(processes=2)
+        serial._generate(processes=1)
+        assert (mapgen.field == serial.field).all()
+
+        assert len(mapgen.rooms) > 1
+        assert len(mapgen.halls) == len(mapgen.rooms) - 1
+        assert not any(r.pending for r in mapgen.rooms)
+        assert mapgen.field.shape == (105, 105)
+        assert (mapgen.walls == walls_of(mapgen.field)).all()
+
+    def test_room_ids(self):
+        """Rooms should be numbered from 1 on the grid and found by id or cell, with 0 meaning empty."""
+        mapgen = self._mapgen()
+        room = mapgen.generate_room(3, 3)
+
+        assert room.room_id == 1
+        assert mapgen.room_by_id(room.room_id) is room
+        assert mapgen.room_in_grid_cell(*room.grid_position) is room
+        assert mapgen.room_in_grid_cell(0, 0) is None
+        with self.assertRaises(ValueError):
+            mapgen.room_in_grid_cell(7, 0)
+
+    def test_openness_and_free_doors(self):
+        """The running openness and free door set should match a scan of the grid."""
+        mapgen = self._mapgen()
+        for x, y in ((0, 0), (2, 0), (4, 4), (2, 3)):
+            mapgen.plan_room(x, y)
+
+            assert mapgen._grid_openness() == np.count_nonzero(mapgen.grid == 0) / mapgen.grid.size
+            height, width = mapgen.grid.shape
+            expected = {((ox, oy), (ox + dx, oy + dy))
+                        for oy, ox in np.argwhere(mapgen.grid)
+                        for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                        if 0 <= ox + dx < width and 0 <= oy + dy < height
+                        and mapgen.grid[oy + dy, ox + dx] == 0}
+            assert set(mapgen.free_doors) == expected
+            assert len(mapgen.free_doors) == len(expected)
+            assert all(mapgen._free_door_index[door] == i for i, door in enumerate(mapgen.free_doors))
@@ -1,6 +1,7 @@
 import unittest
 from src.menus import Menu, MenuOption
 from src.menus.menu import RenderableArray, RenderableItem
+from src.inputs import PositionDelta
 
 
 class TestMenusOption(unittest.TestCase):
@@ -139,6 +140,26 @@ class TestMenusOption(unittest.TestCase):
         assert a[0] == "A"
         assert a[1] == (200, 200, 200)
 
+    def test_tiles(self):
+        """Tests that the pre-rendered tiles are reused, and re-rendered when the option's appearance changes."""
+        opt = MenuOption("AB",
+                         width=6,
+                         height=3,
+                         on_select=lambda x: print("AB!"),
+                         color=(200, 200, 200))
+        glyphs, colors = opt.tiles
+        assert opt.tiles[0] is glyphs
+        assert chr(glyphs[1, 3]) == "A"
+        assert chr(glyphs[0, 0]) == "┌"
+
+        opt.on_gets_cursor()
+        assert opt.highlighted
+        glyphs, colors = opt.tiles
+        assert tuple(colors[1, 3]) == (25, 230, 25)
+
+        opt.text = "CD"
+        assert chr(opt.tiles[0][1, 3]) == "C"
+
 
 class TestMenu(unittest.TestCase):
     def test_contents(self):
@@ -259,4 +280,26 @@ class TestMenu(unittest.TestCase):
         with self.assertRaises(Exception):
             menu.color = (4, "beef", 99)  # One invalid arg
         with self.assertRaises(Exception):
-            menu.color = (-4, 192, 94)  # One negative argument
\ No newline at end of file
+            menu.color = (-4, 192, 94)  # One negative argument
+
+    def test_virtualised_layout(self):
+        """A virtualised menu should only lay out the options inside a window that follows the selection."""
+        menu = Menu(width=20, height=14, interface=None, spacing=1, virtualised=True)
+        for i in range(1000):
+            menu.add_option(MenuOption("Opt {}".format(i), width=10, height=3,
+                                       on_select=lambda x: None))
+
+        # 12 usable rows inside the padding fit three 3-row options with one row of spacing between each
+        assert menu.visible_range() == (0, 3)
+        assert [y for x, y, opt in menu.layout(0, 0)] == [1, 5, 9]
+
+        # Moving past the bottom of the window scrolls it just far enough to show the selection
+        for _ in range(3):
+            menu.change_selection(PositionDelta(0, 1))
+        assert menu.visible_range() == (1, 4)
+        assert menu.layout(0, 0)[-1][2] is menu.contents[3]
+
+        # Wrapping backwards from the top should land on the last option
+        menu.change_selection(PositionDelta(0, -4))
+        assert menu.selected == 999
+        assert menu.visible_range() == (997, 1000)
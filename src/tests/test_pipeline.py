@@ -0,0 +1,91 @@
+import io
+import tempfile
+import unittest
+import numpy as np
+from contextlib import redirect_stdout
+from src.map_generation import LevelCache, RngService
+from src.map_generation.pipeline import Pipeline, Stage
+from src.map_generation.smoothing import walls_of
+from src.map_generation.map_generator import WholeDrunkMapGen
+from src.map_generation.map_generator.whole_drunk_mapgen import whole_drunk_pipeline
+
+PARAMS = {"width": 40, "height": 30,
+          "num_centers": 6,
+          "passability_tgt": 0.25,
+          "wanderer_born_prob": 0,
+          "wanderer_die_prob": 0,
+          "centroidal_born_prob": 0.10,
+          "centroidal_die_prob": 0.0125}
+
+
+class TestPipeline(unittest.TestCase):
+    def test_run(self):
+        pipeline = whole_drunk_pipeline(**PARAMS, rngs=RngService(5))
+        layers = pipeline.run()
+
+        assert layers["field"].shape == (30, 40) and layers["field"].any()
+        assert (layers["walls"] == walls_of(layers["field"])).all()
+        assert list(pipeline.timings) == ["centroids", "carve", "smooth", "connect", "walls"]
+        assert pipeline.cached == []
+
+    def test_rerun_after_change(self):
+        """Changing a stage should rerun only it and the stages downstream of it."""
+        pipeline = whole_drunk_pipeline(**PARAMS, rngs=RngService(5))
+        first = pipeline.run()
+        assert pipeline.run()["field"] is first["field"]
+        assert pipeline.cached == ["centroids", "carve", "smooth", "connect", "walls"]
+
+        pipeline.set_params("smooth", iterations=0)
+        third = pipeline.run()
+        assert pipeline.cached == ["centroids", "carve"]
+        assert pipeline["smooth"].params["iterations"] == 0
+        assert not (third["field"] == first["field"]).all()
+        assert (third["walls"] == walls_of(third["field"])).all()
+
+    def test_unchanged_output_stops_reruns(self):
+        """A stage whose inputs come out the same as last time shouldn't rerun, even downstream of a change."""
+        pipeline = whole_drunk_pipeline(**PARAMS, rngs=RngService(5))
+        pipeline.run()
+        pipeline.set_params("smooth", iterations=20)
+        pipeline.run()
+        pipeline.set_params("smooth", iterations=21)
+        pipeline.run()
+        assert pipeline.cached == ["centroids", "carve", "connect", "walls"]
+
+    def test_persistent_cache(self):
+        """A fresh pipeline with the same seed should be served entirely from a LevelCache."""
+        cache = LevelCache(tempfile.mkdtemp())
+        first = whole_drunk_pipeline(**PARAMS, rngs=RngService(8), cache=cache).run()
+
+        pipeline = whole_drunk_pipeline(**PARAMS, rngs=RngService(8), cache=cache)
+        second = pipeline.run()
+        assert pipeline.cached == ["centroids", "carve", "smooth", "connect", "walls"]
+        assert (first["field"] == second["field"]).all()
+
+        pipeline = whole_drunk_pipeline(**PARAMS, rngs=RngService(9), cache=cache)
+        pipeline.run()
+        assert pipeline.cached == []
+
+    def test_editing_stages(self):
+        pipeline = Pipeline([Stage("double", lambda x: {"x": 2 * x}, requires=("x",), provides=("x",))])
+        assert pipeline.run({"x": np.arange(3)})["x"].tolist() == [0, 2, 4]
+
+        pipeline.append(Stage("negate", lambda x: {"y": -x}, requires=("x",), provides=("y",)))
+        pipeline.replace("double", Stage("triple", lambda x: {"x": 3 * x}, requires=("x",), provides=("x",)))
+        assert pipeline.run({"x": np.arange(3)})["y"].tolist() == [0, -3, -6]
+
+        pipeline.remove("triple")
+        assert len(pipeline) == 1
+        with self.assertRaises(ValueError):
+            pipeline.append(Stage("negate", lambda x: {"y": x}, requires=("x",), provides=("y",)))
+        with self.assertRaises(ValueError):
+            pipeline.run()
+
+    def test_whole_drunk_mapgen_is_quiet(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            mapgen = WholeDrunkMapGen(**PARAMS, rng=np.random.default_rng(0))
+
+        assert out.getvalue() == ""
+        assert (mapgen.walls == walls_of(mapgen.field)).all()
+        assert len(mapgen.centroids) == 6
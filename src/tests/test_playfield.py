@@ -1,9 +1,17 @@
+import os
+import tempfile
 import unittest
+import numpy as np
 
 from typing import List
-from src.playfield import PlayField, Cell
+from src.playfield import PlayField, Cell, FLOOR, WALL
+from src.interface import Interface
+from src.layers import BitLayer, LayerStore
 from src.entity import Entity
 from src.entity.entities import Mobile, Static
+from src.entity.landscape import WalkableTerrain, Wall
+from src.map_generation.level_cache import CachedMap
+from src.map_generation.level_generator.level_generator_ import LevelGenerator
 from src.sigil import Sigil
 
 
@@ -194,4 +202,135 @@ class TestPlayField(unittest.TestCase):
         b = mob.cooldown
 
         assert a > b
-        assert a == b + 1
\ No newline at end of file
+        assert a == b + 1
+
+
+class TestFromLayers(unittest.TestCase):
+    @staticmethod
+    def _layers():
+        field = np.zeros((6, 8), dtype=bool)
+        field[1:5, 1:7] = True
+        walls = ~field
+        walls[0, 0] = False
+        return walls, field
+
+    def test_terrain(self):
+        """Walls and floors should be drawn and block movement like placed entities, without being placed."""
+        walls, field = self._layers()
+        floor, wall = WalkableTerrain(), Wall()
+        mob = Mobile(4, Sigil("m", priority=3))
+        pf = PlayField.from_layers(Interface(None), walls, field,
+                                   terrain_palette={FLOOR: floor, WALL: wall},
+                                   contents=[(3, 2, mob)])
+
+        assert pf.shape == (8, 6)
+        assert pf.terrain[2, 3] == FLOOR and pf.terrain[0, 3] == WALL and pf.terrain[0, 0] == 0
+        assert pf.terrain_at(3, 0) is wall and pf.terrain_at(0, 0) is None
+
+        assert pf.get_cell(3, 1).passable and not pf.get_cell(3, 0).passable
+        assert pf.get_cell(3, 1).sigils == [floor.sigil]
+        assert pf.get_cell(3, 0).sigils == [wall.sigil]
+        assert pf.get_cell(3, 2).sigils == [mob.sigil]
+        assert pf.get_cell(0, 0).sigils == []
+        assert pf.entities == [mob]
+
+        with self.assertRaises(ValueError):
+            PlayField.from_layers(Interface(None), walls, field[1:])
+
+    def test_passability(self):
+        """The passability layer should block only the impassable terrain, and take packed layers to build from."""
+        walls, field = self._layers()
+        pf = PlayField.from_layers(Interface(None), BitLayer.from_array(walls), BitLayer.from_array(field))
+
+        assert (pf.terrain[1:5, 1:7] == FLOOR).all()
+        assert (pf.passability == ~walls).all()
+        assert pf.passability[0, 0] and not pf.passability[0, 3]
+
+        # Painting updates the layer in place, and Cell.passable reads it
+        packed = pf._passable.packed
+        pf.paint_terrain(np.array([[WALL, WALL]]), {WALL: Wall()}, 2, 2)
+        assert pf._passable.packed is packed
+        assert not pf.passability[2, 3] and not pf.get_cell(3, 2).passable
+        assert pf.passability[2, 4] and pf.get_cell(4, 2).passable
+
+        # Making a code passable that's already painted counts for every tile painted with it
+        pf.paint_terrain(np.zeros((0, 0), dtype=np.uint8), {WALL: WalkableTerrain()})
+        assert pf.passability.all()
+
+        with self.assertRaises(ValueError):
+            pf.passability[0, 0] = False
+
+    def test_layer_store(self):
+        """Terrain kept in a layer store should save with a flush and load back by mapping it."""
+        walls, field = self._layers()
+        with tempfile.TemporaryDirectory() as directory:
+            pf = PlayField.from_layers(Interface(None), walls, field, layer_store=LayerStore(directory))
+            pf.flush()
+
+            wall = Wall()
+            loaded = PlayField.from_store(Interface(None), LayerStore(directory),
+                                          terrain_palette={FLOOR: WalkableTerrain(), WALL: wall})
+            assert loaded.shape == (8, 6)
+            assert (loaded.terrain == pf.terrain).all()
+            assert loaded.terrain_at(3, 0) is wall and not loaded.get_cell(3, 0).passable
+
+            with self.assertRaises(ValueError):
+                PlayField.from_store(Interface(None), LayerStore(os.path.join(directory, "empty")), {})
+
+    def test_lazy_cells(self):
+        """Cells should be made once, when first asked for."""
+        walls, field = self._layers()
+        pf = PlayField.from_layers(Interface(None), walls, field)
+        cell = pf.get_cell(4, 4)
+
+        assert pf.get_cell(4, 4) is cell
+        assert pf.has_cell(cell)
+        assert not pf.has_cell(PlayField(8, 6, interface=Interface(None)).get_cell(4, 4))
+        assert len(pf.get_cells()) == 48
+
+    def test_paint_terrain(self):
+        pf = PlayField(5, 4, interface=Interface(None))
+        pf.paint_terrain(np.full((3, 3), 7), {7: Wall()}, x0=3, y0=-1)
+
+        assert (pf.terrain[0:2, 3:5] == 7).all()
+        assert np.count_nonzero(pf.terrain) == 4
+        assert not pf.get_cell(4, 1).passable
+
+        with self.assertRaises(ValueError):
+            pf.paint_terrain(np.ones((1, 1)), {0: Wall()})
+
+    def test_level_generator(self):
+        """A generated level's walls should become terrain, and only its content should be placed."""
+        walls, field = self._layers()
+        mob = Mobile(4, Sigil("m"))
+        pc = Mobile(4, Sigil("@"))
+        level = LevelGenerator(8, 6,
+                               map_generator=CachedMap(walls, field),
+                               content_generator=lambda walls, field, spawns: [(2, 2, mob)],
+                               player_spawn_generator=lambda: (4, 3))
+        pf = level.get_playfield(Interface(None), pc)
+
+        assert set(pf.entities) == {mob, pc}
+        assert pc.position == (4, 3)
+        assert not pf.get_cell(7, 5).passable
+        assert pf.get_cell(7, 5).sigils[0].character == "#"
+
+
+class TestDrawables(unittest.TestCase):
+    def test_tied_sigils_cycle(self):
+        """A cell with several tied top sigils should show each in turn, for overlap_period frames apiece."""
+        pf = PlayField(4, 4, interface=Interface(None), window_width=4, window_height=4)
+        first = Static(size=1, sigil=Sigil("a", priority=3))
+        second = Static(size=1, sigil=Sigil("b", priority=3))
+        first.introduce_at(1, 1, pf)
+        second.introduce_at(1, 1, pf)
+
+        def drawn(frame):
+            # Drawables are offset by one for the console border
+            return [d["character"] for d in pf.drawables(center_on=(1, 1), frame=frame)
+                    if (d["x"], d["y"]) == (2, 2)]
+
+        assert drawn(0) == ["a"]
+        assert drawn(pf.overlap_period - 1) == ["a"]
+        assert drawn(pf.overlap_period) == ["b"]
+        assert drawn(2 * pf.overlap_period) == ["a"]
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+import tcod
+from src.replay import InputRecorder, InputReplayer
+
+
+def _key_down(sym) -> tcod.event.KeyDown:
+    return tcod.event.KeyDown(scancode=tcod.event.Scancode(0),
+                              sym=tcod.event.KeySym(sym),
+                              mod=tcod.event.Modifier(0),
+                              pressed=True)
+
+
+class TestReplay(unittest.TestCase):
+    def test_round_trip(self):
+        """Events should come back out of a replay on the same ticks they were recorded on."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "session.jsonl.gz")
+
+            recorder = InputRecorder(path, seed=1234, level_params={"width": 20, "height": 10})
+            source = recorder.wrap(iter([[], [_key_down(tcod.event.K_UP)], [], [tcod.event.Quit()]]).__next__)
+            for _ in range(4):
+                source()
+            recorder.close()
+
+            replayer = InputReplayer(path)
+            assert replayer.seed == 1234
+            assert replayer.level_params == {"width": 20, "height": 10}
+
+            assert replayer.next_events() == []
+            up, = replayer.next_events()
+            assert isinstance(up, tcod.event.KeyDown)
+            assert up.sym == tcod.event.K_UP
+            assert replayer.next_events() == []
+            assert not replayer.finished
+
+            quit_, = replayer.next_events()
+            assert isinstance(quit_, tcod.event.Quit)
+            assert replayer.finished
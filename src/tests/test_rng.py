@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+from src.map_generation.rng import RngService
+from src.map_generation.map_generator import MapGenerator
+from src.map_generation.cellulose.drunk_walk import SmallDrunkRoom
+
+
+class TestRngService(unittest.TestCase):
+    def test_streams_are_reproducible(self):
+        """A stream should depend only on the master seed and its path."""
+        a, b = RngService(11), RngService(11)
+        b.stream("unrelated").random(100)
+
+        assert (a.stream("level", 1).random(5) == b.stream("level", 1).random(5)).all()
+        assert (a.level(1).room(2, 3).stream("artists").random(5)
+                == b.stream("level", 1, "room", 2, 3, "artists").random(5)).all()
+
+    def test_streams_are_independent(self):
+        """Different paths and different seeds should give different streams."""
+        service = RngService(11)
+        assert not (service.stream("level", 1).random(5) == service.stream("level", 2).random(5)).all()
+        assert not (service.stream(1).random(5) == service.stream("1").random(5)).all()
+        assert not (service.stream("x").random(5) == RngService(12).stream("x").random(5)).all()
+
+    def test_bad_path(self):
+        with self.assertRaises(ValueError):
+            RngService(1).stream(-1)
+
+    def test_rooms_ignore_generation_order(self):
+        """A room should come out the same whichever order the rooms are generated in."""
+        def generate(order):
+            mapgen = MapGenerator(5, 4,
+                                  candidates=[SmallDrunkRoom],
+                                  candidate_weights=[1.0],
+                                  max_grid_openness=.5,
+                                  rngs=RngService(3))
+            return {position: mapgen.generate_room(*position).field for position in order}
+
+        forward = generate([(0, 0), (2, 1)])
+        backward = generate([(2, 1), (0, 0)])
+        assert all((forward[position] == backward[position]).all() for position in forward)
+        assert not (forward[(0, 0)] == forward[(2, 1)]).all()
@@ -0,0 +1,93 @@
+import unittest
+import numpy as np
+from src.map_generation.spawn_index import SpawnIndex, alias_table, distance_from_walls, distance_from
+from src.map_generation.level_cache import CachedMap
+from src.map_generation.rng import RngService
+from src.map_generation.level_generator.level_generator_ import LevelGenerator
+
+
+def _field():
+    field = np.zeros((20, 30), dtype=bool)
+    field[2:18, 2:12] = True
+    field[5:15, 18:28] = True
+    return field
+
+
+class TestSpawnIndex(unittest.TestCase):
+    def test_alias_table(self):
+        """The table should give every column exactly its share of the draws."""
+        rng = np.random.default_rng(0)
+        for weights in (rng.random(500), rng.random(500) ** 8, np.r_[1e6, np.ones(999)], np.r_[0, 0, 1.0, 3.0]):
+            prob, alias = alias_table(weights)
+            shares = prob.copy()
+            np.add.at(shares, alias, 1 - prob)
+            assert np.allclose(shares / len(weights), weights / weights.sum())
+
+    def test_sample(self):
+        field = _field()
+        weights = np.zeros(field.shape)
+        weights[:, :15] = 1
+        weights[:, 15:] = 3
+        index = SpawnIndex(field, weights)
+        xs, ys = index.sample(20000, np.random.default_rng(1))
+
+        assert field[ys, xs].all()
+        # Both halves hold 160 and 100 tiles, so the right should get 300 / 460 of the draws
+        assert abs(np.mean(xs >= 15) - 300 / 460) < .02
+
+        xs, ys = SpawnIndex(field, weights * (np.indices(field.shape)[1] != 20)).sample(5000)
+        assert not (xs == 20).any(), "Tiles weighted 0 shouldn't be drawn"
+
+    def test_sample_distinct(self):
+        index = SpawnIndex(_field())
+        xs, ys = index.sample_distinct(len(index), np.random.default_rng(2))
+        assert len(set(zip(xs.tolist(), ys.tolist()))) == len(index)
+
+        with self.assertRaises(ValueError):
+            index.sample_distinct(len(index) + 1)
+        with self.assertRaises(ValueError):
+            SpawnIndex(np.zeros((3, 3), dtype=bool)).sample(1)
+
+    def test_sample_spaced(self):
+        index = SpawnIndex(_field())
+        xs, ys = index.sample_spaced(1000, 3, np.random.default_rng(3))
+
+        assert 0 < len(xs) < 1000, "The field should fill up before a thousand fit"
+        assert index.mask[ys, xs].all()
+        distances = (xs[:, np.newaxis] - xs) ** 2 + (ys[:, np.newaxis] - ys) ** 2
+        np.fill_diagonal(distances, 9)
+        assert distances.min() >= 9
+
+    def test_weights_and_masks(self):
+        field = _field()
+        walls = distance_from_walls(field)
+        assert walls[2, 2] == 1 and walls[9, 6] == 5 and walls[0, 0] == 0
+
+        near = SpawnIndex(field).weighted(1 / (1 + distance_from(field.shape, 20, 10)))
+        xs, ys = near.sample(4000, np.random.default_rng(4))
+        assert np.mean(xs >= 15) > .5
+
+        right = np.zeros(field.shape, dtype=bool)
+        right[:, 15:] = True
+        assert len(SpawnIndex(field).within(right)) == 100
+        assert len(SpawnIndex(field).without(np.array([2, 3]), np.array([2, 2]))) == 258
+
+    def test_level_generator(self):
+        """Content generators should get the spawn index, and the player should spawn in the largest region."""
+        field = _field()
+        given = []
+
+        def content(walls, field, spawns):
+            given.append(spawns)
+            return []
+
+        level = LevelGenerator(30, 20, CachedMap(~field, field), content)
+        assert given[0] is level.spawns
+        assert len(level.spawns) == 160
+        x, y = level.place_player_spawn()
+        assert x < 15 and field[y, x]
+
+        # The same seed should give the same spawn
+        spawns = [LevelGenerator(30, 20, CachedMap(~field, field), content, rngs=RngService(7)).place_player_spawn()
+                  for i in range(2)]
+        assert spawns[0] == spawns[1]